@@ -143,14 +143,17 @@ const SensorDetail = () => {
   useEffect(() => {
     setLoading(true);
     const fetchSensorDetails = apiClient.get(`/user/sensors/${sensorId}/`);
-    const fetchHistory = apiClient.get(`/user/sensor/${sensorId}/data/`); 
+    // Format kolumnowy: { ts: [...], power: [...] } zamiast listy obiektów
+    const fetchHistory = apiClient.get(`/user/sensor/${sensorId}/data/`, {
+      params: { format: 'columnar', fields: 'power' }
+    });
 
     Promise.all([fetchSensorDetails, fetchHistory])
       .then(([detailsRes, historyRes]) => {
         setSensor(detailsRes.data);
         
-        const labels = historyRes.data.map(d => new Date(d.timestamp).toLocaleTimeString());
-        const powerData = historyRes.data.map(d => d.power);
+        const labels = historyRes.data.ts.map(ts => new Date(ts).toLocaleTimeString());
+        const powerData = historyRes.data.power;
         
         setHistoricalData({
           labels,
@@ -30,6 +30,8 @@ DATA_UPLOAD_MAX_NUMBER_FIELDS = 20000
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'sensors.middleware.ResponseCompressionMiddleware',
+    'sensors.middleware.RequestDecompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -96,6 +98,130 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Cache (statystyki domów itp.). LocMemCache jest osobny dla każdego procesu -
+# przy wielu workerach warto przejść na wspólny backend (np. Redis/Memcached).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'energy-monitor',
+    }
+}
+
+# Cache statystyk domu (UserHouseViewSet.statistics, comparison_view)
+STATISTICS_CACHE_TTL = 60          # [s] wpis świeży
+STATISTICS_CACHE_STALE_TTL = 300   # [s] wpis nieświeży, zwracany i odświeżany w tle
+
+# Profil zużycia 7x24 (sensors.profiles): maks. zakres zapytania [dni]
+LOAD_PROFILE_MAX_DAYS = 366
+
+# Okres uznajemy za zamknięty (i zapamiętujemy jego zużycie w EnergyPeriodCache),
+# gdy skończył się co najmniej tyle sekund temu. Odczyty starsze niż ten próg
+# traktujemy jako spóźnione i unieważniamy nimi cache.
+ENERGY_CACHE_GRACE_SECONDS = 15 * 60
+
+# Tryb przyjmowania odczytów:
+#  'direct'   - żądanie zapisuje odczyty od razu do bazy,
+#  'buffered' - żądanie dopisuje odczyty do bufora (osobny plik SQLite WAL),
+#               a do bazy przenosi je jeden proces: manage.py drain_ingest_buffer
+INGEST_MODE = 'direct'
+INGEST_BUFFER_PATH = BASE_DIR / 'ingest_buffer.sqlite3'
+INGEST_BUFFER_MAX_DEPTH = 500000       # max. odczytów w buforze (potem 503)
+INGEST_BUFFER_SYNCHRONOUS = 'FULL'     # 'FULL' = fsync przy każdym zapisie, 'NORMAL' = szybciej
+
+# Odczyty z czasem późniejszym niż teraz + tyle sekund są odrzucane (zły zegar urządzenia)
+READING_MAX_FUTURE_SECONDS = 5 * 60
+
+# Maksymalna liczba odczytów w jednym fragmencie wgrywania zaległych danych
+BACKFILL_MAX_CHUNK = 5000
+
+# Strumieniowe przyjmowanie odczytów NDJSON (admin/sensor/readings/stream/)
+NDJSON_CHUNK_SIZE = 500             # odczytów walidowanych i zapisywanych naraz
+NDJSON_MAX_LINE_BYTES = 64 * 1024   # dłuższe linie są odrzucane
+NDJSON_MAX_ERRORS = 100             # max. błędnych linii opisanych w odpowiedzi
+
+# Kompresja API (sensors.middleware): żądania gzip/zstd i kompresja odpowiedzi
+# Limit rozpakowanej treści strumienia NDJSON; pozostałe widoki: DATA_UPLOAD_MAX_MEMORY_SIZE
+REQUEST_MAX_DECOMPRESSED_BYTES = 64 * 1024 * 1024   # większa rozpakowana treść -> 413
+RESPONSE_COMPRESSION_MIN_BYTES = 1024               # mniejszych odpowiedzi nie kompresujemy
+RESPONSE_ZSTD_LEVEL = 3
+
+# Co ile sekund worker alertów (run_alert_worker) wysyła oczekujące maile
+ALERT_EMAIL_DISPATCH_INTERVAL = 30
+# [s] dzierżawa workera alertów - kolejkę przetwarza naraz tylko jedna instancja,
+# po awarii jej dzierżawę przejmuje inna po tym czasie
+ALERT_WORKER_LEASE_SECONDS = 120
+
+# Klucze urządzeń (DeviceKey): cache zweryfikowanych kluczy w pamięci procesu
+DEVICE_KEY_CACHE_TTL = 30               # [s] - po tym czasie unieważnienie działa we wszystkich procesach
+DEVICE_KEY_CACHE_SIZE = 4096            # max. kluczy w cache (LRU)
+DEVICE_SIGNATURE_MAX_AGE_SECONDS = 300  # max. różnica czasu podpisu paczki HMAC
+
+# Kontrola przyjmowania odczytów (sensors.throttling) - kubełki tokenów w pamięci procesu
+INGEST_SENSOR_RATE = 1.0             # [odczyty/s] średnio na czujnik
+INGEST_SENSOR_BURST = 300            # [odczyty] zapas na czujnik (paczki z bramek)
+INGEST_CREDENTIAL_RATE = 10.0        # [żądania/s] na klucz urządzenia / token
+INGEST_CREDENTIAL_BURST = 50         # [żądania] zapas na klucz urządzenia / token
+INGEST_BUCKETS_MAX = 10000           # po przekroczeniu zapominamy pełne kubełki
+# Gdy opóźnienie przetwarzania odczytów przekracza próg, dashboard dostaje
+# mniej zapytań (429 ponad DASHBOARD_DEGRADED_READ_RATE na użytkownika)
+INGEST_LAG_READ_THRESHOLD = 30       # [s]
+INGEST_LAG_CHECK_INTERVAL = 2        # [s] jak często sprawdzać opóźnienie
+DASHBOARD_DEGRADED_READ_RATE = 0.2   # [żądania/s]
+DASHBOARD_DEGRADED_READ_BURST = 3
+
+# Raport floty (compute_fleet_report): domy liczone równolegle w procesach
+FLEET_REPORT_WORKERS = None   # None = liczba rdzeni
+FLEET_REPORT_KEEP = 30        # ile ostatnich raportów trzymać
+
+# Harmonogram zadań (run_scheduler): interwał 'every' [s] albo 'cron' (czas lokalny),
+# 'jitter' [s] - losowe opóźnienie; zadania spoza listy nie są uruchamiane
+SCHEDULER_JOBS = {
+    'check_offline_sensors': {'every': 60, 'jitter': 5},
+    'refresh_hourly_rollups': {'every': 300, 'jitter': 30},
+    'compute_fleet_report': {'cron': '*/30 * * * *', 'jitter': 60},
+    'warm_energy_cache': {'cron': '20 0 * * *', 'jitter': 600},
+    'apply_retention': {'cron': '30 3 * * *', 'jitter': 900},
+}
+SCHEDULER_POLL_SECONDS = 15   # max. przerwa między sprawdzeniami terminów (i przedłużeniem dzierżaw)
+SCHEDULER_MAX_THREADS = 4     # ile zadań może trwać naraz w jednej instancji
+
+# Agregaty godzinowe (SensorHourlyRollup): ile ostatnich godzin przeliczać przy odświeżeniu
+ROLLUP_REFRESH_HOURS = 3
+
+# Jakość zasilania (PowerQualityDaily): względny błąd kwantyli szkiców DDSketch
+# (0.0005 = ±0,12 V przy 230 V, ±0,025 Hz przy 50 Hz)
+POWER_QUALITY_SKETCH_ACCURACY = 0.0005
+
+# Wykrywanie włączeń/wyłączeń urządzeń (sensors.events)
+APPLIANCE_STEP_MIN_WATTS = 40          # min. skok mocy uznawany za zdarzenie [W]
+APPLIANCE_STEP_CONFIRM_READINGS = 2    # ile odczytów na nowym poziomie potwierdza skok
+APPLIANCE_LEVEL_SMOOTHING = 0.2        # EWMA poziomu przy stabilnym poborze
+APPLIANCE_EVENTS_MAX_RESULTS = 1000    # max. zdarzeń w odpowiedzi API
+
+# Moc szczytowa (sensors.demand): długość okresu rozliczeniowego [min] (musi dzielić 60)
+# i ile najwyższych okresów miesiąca pamiętać dla domu i każdego czujnika
+DEMAND_INTERVAL_MINUTES = 15
+MONTHLY_PEAKS_TOP_N = 5
+
+# Progi mocy/prądu (sensors.alert_rules): domyślny próg zwolnienia jako ułamek progu alertu
+ALERT_CLEAR_RATIO = 0.9
+BACKTEST_MAX_ALERTS = 500   # max. alertów jednej reguły w odpowiedzi symulacji
+
+# Nietypowe zużycie (sensors.anomaly): wzorzec mocy dla każdej godziny tygodnia
+ANOMALY_SEED_WEEKS = 8              # ile tygodni agregatów godzinowych wczytać przy starcie workera
+ANOMALY_MIN_WEEKS = 3               # min. liczba tygodni historii danej godziny przed alertem
+ANOMALY_EWMA_ALPHA = 0.25           # waga najnowszego tygodnia we wzorcu
+ANOMALY_SMOOTHING_SECONDS = 300     # stała czasowa wygładzania bieżącej mocy [s]
+ANOMALY_Z_ON = 4.0                  # z-score otwierający alert
+ANOMALY_Z_OFF = 2.0                 # z-score, poniżej którego alert jest rozwiązywany
+ANOMALY_MIN_STD_WATTS = 30          # min. odchylenie wzorca [W] (godziny o stałym poborze)
+ANOMALY_MIN_STD_RATIO = 0.25        # min. odchylenie jako ułamek średniej
+
+# Retencja danych (zadanie apply_retention) [dni]; None = bez limitu
+ACTIVITY_LOG_RETENTION_DAYS = 365
+RESOLVED_ALERT_RETENTION_DAYS = 180
+SENSOR_DATA_RETENTION_DAYS = None   # surowe odczyty; agregaty godzinowe zostają
+
 # Klucz do podpisywania danych z czujników
 SENSOR_DATA_SECRET = 'klucz-do-podpisywania-danych-ZMIEN-NA-PRODUKCJI'
 
@@ -2,7 +2,10 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import House, Sensor, SensorData, Alert, UserSettings, ActivityLog
+from .models import (
+    House, Sensor, SensorData, Alert, UserSettings, ActivityLog, DeviceKey, FleetReport, FleetHouseStat,
+    ScheduledJob
+)
 from django.db.models import Avg, Max
 from django.contrib.admin import SimpleListFilter
 from django.utils import timezone
@@ -187,8 +190,9 @@ class SensorAdmin(admin.ModelAdmin):
         }),
         ('Alerty (Reguły)', {
             'fields': (
-                'power_threshold', 
-                'current_max_threshold',
+                ('power_threshold', 'power_clear_threshold'),
+                ('current_max_threshold', 'current_clear_threshold'),
+                ('alert_duration_seconds', 'alert_cooldown_seconds'),
                 ('voltage_min_threshold', 'voltage_max_threshold'),
                 'offline_threshold_seconds'
             )
@@ -328,7 +332,7 @@ class AlertAdmin(admin.ModelAdmin):
             'fields': ('message', 'value', 'threshold')
         }),
         ('Status', {
-            'fields': ('is_read', 'is_resolved', 'email_sent')
+            'fields': ('is_read', 'is_resolved', 'email_sent', 'email_pending')
         }),
         ('Meta', {
             'fields': ('created_at',)
@@ -404,12 +408,116 @@ class AlertAdmin(admin.ModelAdmin):
     mark_as_resolved.short_description = "Oznacz jako rozwiązane"
 
 
+@admin.register(DeviceKey)
+class DeviceKeyAdmin(admin.ModelAdmin):
+    list_display = ('name', 'short_key', 'sensor_list', 'require_signature', 'is_active', 'created_at')
+    list_filter = ('is_active', 'require_signature')
+    search_fields = ('name', 'sensors__sensor_id', 'sensors__name')
+    filter_horizontal = ('sensors',)
+    readonly_fields = ('key', 'created_at', 'revoked_at')
+
+    fieldsets = (
+        ('Urządzenie', {
+            'fields': ('name', 'key', 'sensors')
+        }),
+        ('Bezpieczeństwo', {
+            'fields': ('require_signature', 'is_active', 'revoked_at')
+        }),
+        ('Meta', {
+            'fields': ('created_at',)
+        }),
+    )
+
+    actions = ['revoke_keys']
+
+    def short_key(self, obj):
+        return f"{obj.key[:8]}…"
+
+    short_key.short_description = 'Klucz'
+
+    def sensor_list(self, obj):
+        return ", ".join(sensor.sensor_id for sensor in obj.sensors.all())
+
+    sensor_list.short_description = 'Czujniki'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('sensors')
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Lista czujników zmienia się po save() modelu - odświeżamy cache jeszcze raz
+        form.instance.forget_cached()
+
+    def revoke_keys(self, request, queryset):
+        keys = list(queryset.filter(is_active=True))
+        for device_key in keys:
+            device_key.revoke()
+        self.message_user(request, f"Unieważniono {len(keys)} kluczy")
+
+    revoke_keys.short_description = "Unieważnij klucze"
+
+
+class FleetHouseStatInline(admin.TabularInline):
+    model = FleetHouseStat
+    fields = ('house', 'user', 'sensors', 'online_sensors', 'readings', 'kwh', 'cost', 'previous_kwh')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(FleetReport)
+class FleetReportAdmin(admin.ModelAdmin):
+    list_display = ('period_end', 'total_houses', 'online_sensors', 'total_sensors', 'total_kwh',
+                    'previous_kwh', 'workers', 'duration_seconds')
+    readonly_fields = [field.name for field in FleetReport._meta.fields]
+    inlines = [FleetHouseStatInline]
+
+    def has_add_permission(self, request):
+        # Raporty tworzy polecenie compute_fleet_report
+        return False
+
+
+@admin.register(ScheduledJob)
+class ScheduledJobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'schedule', 'is_enabled', 'status_badge', 'next_run_at', 'last_success_at',
+                    'last_duration_seconds', 'last_result', 'run_count', 'failure_count')
+    list_filter = ('is_enabled',)
+    readonly_fields = ('name', 'schedule', 'lease_owner', 'lease_expires_at', 'last_started_at', 'last_finished_at',
+                       'last_success_at', 'last_success_started_at', 'last_duration_seconds', 'last_result', 'last_error',
+                       'run_count', 'failure_count')
+    actions = ['run_now']
+
+    def has_add_permission(self, request):
+        # Wiersze zakłada run_scheduler na podstawie SCHEDULER_JOBS (i run_alert_worker dla swojej dzierżawy)
+        return False
+
+    def status_badge(self, obj):
+        if obj.is_running:
+            return format_html('<span style="color: #3b82f6;">{}</span>', f"trwa ({obj.lease_owner})")
+        if obj.last_error:
+            return format_html('<span style="color: #ef4444;">{}</span>', "błąd")
+        if obj.last_success_at:
+            return format_html('<span style="color: #10b981;">{}</span>', "OK")
+        return "-"
+
+    status_badge.short_description = 'Status'
+
+    def run_now(self, request, queryset):
+        updated = queryset.update(next_run_at=timezone.now())
+        self.message_user(request, f"Zaplanowano {updated} zadań")
+
+    run_now.short_description = "Uruchom przy najbliższym sprawdzeniu"
+
+
 @admin.register(UserSettings)
 class UserSettingsAdmin(admin.ModelAdmin):
     list_display = ('user', 'theme', 'email_alerts', 'alert_frequency', 'show_predictions', 'updated_at')
     list_filter = ('theme', 'email_alerts', 'show_predictions')
     search_fields = ('user__username', 'user__email')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'last_alert_email_at')
 
     fieldsets = (
         ('Użytkownik', {
@@ -419,7 +527,7 @@ class UserSettingsAdmin(admin.ModelAdmin):
             'fields': ('theme', 'live_refresh_interval')
         }),
         ('Alerty', {
-            'fields': ('email_alerts', 'alert_frequency')
+            'fields': ('email_alerts', 'alert_frequency', 'last_alert_email_at')
         }),
         ('Cele i predykcje', {
             'fields': ('show_predictions', 'monthly_goal_kwh')
@@ -0,0 +1,157 @@
+"""
+Reguły progowe mocy i prądu z czasem trwania i histerezą.
+
+Reguła zgłasza alert, gdy wartość jest powyżej progu nieprzerwanie przez
+alert_duration_seconds (przerwa w danych zeruje licznik), i kończy go
+dopiero po spadku do progu zwolnienia. Kolejny alert tej samej reguły
+powstaje najwcześniej alert_cooldown_seconds po poprzednim. Krótkie
+szpilki (np. prąd rozruchowy silnika) nie dają więc alertów.
+
+Warunek "powyżej progu przez N sekund" w oknie przesuwnym sprowadza się do
+czasu pierwszego odczytu bieżącej serii ponad progiem, więc stan reguły ma
+kilka pól. Worker alertów trzyma stany w pamięci procesu; baza jest pytana
+tylko przy starcie (otwarte alerty) i przy zmianie stanu alertu.
+"""
+from django.conf import settings
+from django.db.models import Count, Max, Q
+
+from .models import Alert
+
+# (typ alertu, pole odczytu, pole progu, pole progu zwolnienia, ważność, wiadomość)
+THRESHOLD_RULES = (
+    ('power_high', 'power', 'power_threshold', 'power_clear_threshold', 'warning',
+     "Czujnik '{name}' przekroczył próg mocy!"),
+    ('current_high', 'current', 'current_max_threshold', 'current_clear_threshold', 'critical',
+     "KRYTYCZNE: Czujnik '{name}' przekroczył próg prądu!"),
+)
+
+
+class ThresholdRule:
+    __slots__ = (
+        'threshold', 'clear', 'duration', 'cooldown', 'max_gap',
+        'above_since', 'peak', 'last_ts', 'active', 'last_fired',
+    )
+
+    def __init__(self, threshold, clear=None, duration=0, cooldown=0, max_gap=None):
+        self.configure(threshold, clear, duration, cooldown, max_gap)
+        self.above_since = self.peak = self.last_ts = self.last_fired = None
+        self.active = False
+
+    def configure(self, threshold, clear=None, duration=0, cooldown=0, max_gap=None):
+        """Ustawia parametry bez utraty stanu (progi mogą się zmienić między paczkami)."""
+        if clear is None:
+            clear = threshold * settings.ALERT_CLEAR_RATIO
+        self.threshold = threshold
+        self.clear = min(clear, threshold)
+        self.duration = duration
+        self.cooldown = cooldown
+        self.max_gap = max_gap
+
+    def feed(self, ts, value):
+        """Przetwarza kolejny odczyt; zwraca 'start' / 'end' przy zmianie stanu, inaczej None."""
+        if value is None or (self.last_ts is not None and ts <= self.last_ts):
+            return None
+        if self.last_ts is not None and self.max_gap and (ts - self.last_ts).total_seconds() >= self.max_gap:
+            self.above_since = None  # przerwa w danych przerywa serię
+        self.last_ts = ts
+
+        if value > self.threshold:
+            if self.above_since is None:
+                self.above_since, self.peak = ts, value
+            elif value > self.peak:
+                self.peak = value
+            if (
+                not self.active
+                and (ts - self.above_since).total_seconds() >= self.duration
+                and (self.last_fired is None or (ts - self.last_fired).total_seconds() >= self.cooldown)
+            ):
+                self.active = True
+                self.last_fired = ts
+                return 'start'
+        elif value <= self.clear:
+            # Między progiem zwolnienia a progiem alertu stan się nie zmienia
+            self.above_since = None
+            if self.active:
+                self.active = False
+                return 'end'
+        return None
+
+
+def rule_for_sensor(sensor, threshold_field, clear_field, **overrides):
+    """Reguła z ustawień czujnika (overrides - np. proponowane progi); None gdy próg nie jest ustawiony."""
+    params = {
+        'threshold': getattr(sensor, threshold_field),
+        'clear': getattr(sensor, clear_field),
+        'duration': sensor.alert_duration_seconds,
+        'cooldown': sensor.alert_cooldown_seconds,
+    }
+    params.update(overrides)
+    if not params['threshold']:
+        return None
+    return ThresholdRule(max_gap=sensor.offline_threshold_seconds + 60, **params)
+
+
+# Stany reguł workera: id czujnika -> {typ alertu: ThresholdRule}
+_states = {}
+
+
+def _seeded_states(sensor):
+    """Stan początkowy: otwarte alerty są aktywne, cooldown liczony od ostatniego alertu."""
+    seeds = Alert.objects.filter(
+        sensor=sensor, alert_type__in=[rule[0] for rule in THRESHOLD_RULES]
+    ).values('alert_type').annotate(last=Max('created_at'), open=Count('id', filter=Q(is_resolved=False)))
+    return {seed['alert_type']: seed for seed in seeds}
+
+
+def check_threshold_rules(sensor, readings):
+    """
+    Przepuszcza nowe odczyty (SensorData, rosnąco) przez reguły progowe
+    czujnika. Tworzy alert dla każdego wejścia w stan alarmowy (alert
+    zakończony w tej samej paczce od razu jest rozwiązany) i rozwiązuje
+    otwarte alerty po spadku poniżej progu zwolnienia. Zwraca utworzone alerty.
+    """
+    states = _states.get(sensor.id)
+    seeds = None
+    if states is None:
+        states = _states[sensor.id] = {}
+        seeds = _seeded_states(sensor)
+
+    alerts = []
+    for alert_type, field, threshold_field, clear_field, severity, message in THRESHOLD_RULES:
+        threshold = getattr(sensor, threshold_field)
+        if not threshold:
+            states.pop(alert_type, None)
+            continue
+        rule = states.get(alert_type)
+        if rule is None:
+            rule = states[alert_type] = rule_for_sensor(sensor, threshold_field, clear_field)
+            seed = (seeds or {}).get(alert_type)
+            if seed:
+                rule.active, rule.last_fired = bool(seed['open']), seed['last']
+        else:
+            rule.configure(
+                threshold, getattr(sensor, clear_field), sensor.alert_duration_seconds,
+                sensor.alert_cooldown_seconds, sensor.offline_threshold_seconds + 60,
+            )
+
+        episodes, resolve_open = [], False
+        for reading in readings:
+            change = rule.feed(reading.timestamp, getattr(reading, field))
+            if change == 'start':
+                episodes.append([rule.peak, False])
+            elif change == 'end':
+                if episodes:
+                    episodes[-1][1] = True
+                else:
+                    resolve_open = True
+
+        if resolve_open:
+            Alert.objects.filter(sensor=sensor, alert_type=alert_type, is_resolved=False).update(is_resolved=True)
+        for peak, resolved in episodes:
+            alerts.append(Alert.objects.create(
+                house=sensor.house, sensor=sensor,
+                alert_type=alert_type, severity=severity,
+                message=message.format(name=sensor.name),
+                value=peak, threshold=threshold, is_resolved=resolved,
+            ))
+    return alerts
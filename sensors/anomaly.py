@@ -0,0 +1,178 @@
+"""
+Wykrywanie nietypowego zużycia (alert 'anomaly').
+
+Detektor czujnika trzyma wykładniczo ważoną średnią i wariancję (EWMA)
+średniej mocy godzinowej osobno dla każdej ze 168 godzin tygodnia (czas
+lokalny). Stan początkowy daje SensorHourlyRollup z ostatnich
+ANOMALY_SEED_WEEKS tygodni, potem każda zakończona godzina aktualizuje
+swoją komórkę. Moc wygładzona krótką EWMA (ANOMALY_SMOOTHING_SECONDS) jest
+porównywana z komórką bieżącej godziny (z-score): alert powstaje po
+przekroczeniu ANOMALY_Z_ON i jest rozwiązywany dopiero poniżej
+ANOMALY_Z_OFF (histereza).
+
+Stan ma stały rozmiar niezależnie od historii, a odczyt to kilka działań
+arytmetycznych - baza jest pytana tylko przy starcie detektora i zmianie
+stanu alertu. Detektory żyją w pamięci procesu workera alertów.
+"""
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Alert, SensorHourlyRollup
+from .rollups import floor_hour
+
+HOURS_PER_WEEK = 7 * 24
+
+
+def hour_of_week(moment):
+    """Godzina tygodnia w czasie lokalnym: 0 = poniedziałek 0:00, 167 = niedziela 23:00."""
+    local = timezone.localtime(moment)
+    return local.weekday() * 24 + local.hour
+
+
+class HourOfWeekBaseline:
+    """EWMA średniej i wariancji mocy godzinowej dla każdej godziny tygodnia."""
+    __slots__ = ('alpha', 'mean', 'var', 'count')
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.mean = [0.0] * HOURS_PER_WEEK
+        self.var = [0.0] * HOURS_PER_WEEK
+        self.count = [0] * HOURS_PER_WEEK
+
+    def update(self, slot, value):
+        if self.count[slot]:
+            diff = value - self.mean[slot]
+            increment = self.alpha * diff
+            self.mean[slot] += increment
+            self.var[slot] = (1 - self.alpha) * (self.var[slot] + diff * increment)
+        else:
+            self.mean[slot] = value
+        self.count[slot] += 1
+
+
+class AnomalyDetector:
+    __slots__ = (
+        'baseline', 'max_gap', 'tau', 'z_on', 'z_off', 'min_weeks', 'min_std', 'min_std_ratio',
+        'level', 'last_ts', 'active',
+        'hour_end', 'slot', 'slot_mean', 'slot_std', 'hour_sum', 'hour_count', 'hour_partial',
+    )
+
+    def __init__(self, max_gap_seconds):
+        self.baseline = HourOfWeekBaseline(settings.ANOMALY_EWMA_ALPHA)
+        self.max_gap = max_gap_seconds
+        self.tau = settings.ANOMALY_SMOOTHING_SECONDS
+        self.z_on = settings.ANOMALY_Z_ON
+        self.z_off = settings.ANOMALY_Z_OFF
+        self.min_weeks = settings.ANOMALY_MIN_WEEKS
+        self.min_std = settings.ANOMALY_MIN_STD_WATTS
+        self.min_std_ratio = settings.ANOMALY_MIN_STD_RATIO
+        self.level = 0.0
+        self.last_ts = self.hour_end = self.slot = self.slot_mean = self.slot_std = None
+        self.active = False
+        self.hour_sum, self.hour_count, self.hour_partial = 0.0, 0, True
+
+    def feed(self, ts, power):
+        """Przetwarza kolejny odczyt; zwraca 'start' / 'end' przy zmianie stanu anomalii, inaczej None."""
+        if self.last_ts is not None and ts <= self.last_ts:
+            return None  # odczyt starszy niż już przetworzone
+        if self.hour_end is None or ts >= self.hour_end:
+            self._next_hour(ts)
+
+        if power is not None:
+            # Średnia godziny jak avg_power w SensorHourlyRollup (bez odczytów bez mocy)
+            self.hour_sum += power
+            self.hour_count += 1
+        power = power or 0.0
+        if self.last_ts is None or (ts - self.last_ts).total_seconds() >= self.max_gap:
+            self.level = power
+        else:
+            dt_seconds = (ts - self.last_ts).total_seconds()
+            self.level += (1 - math.exp(-dt_seconds / self.tau)) * (power - self.level)
+        self.last_ts = ts
+
+        if self.slot_std is None:
+            return None  # za mało tygodni historii dla tej godziny
+        z = abs(self.level - self.slot_mean) / self.slot_std
+        if not self.active and z >= self.z_on:
+            self.active = True
+            return 'start'
+        if self.active and z <= self.z_off:
+            self.active = False
+            return 'end'
+        return None
+
+    def _next_hour(self, ts):
+        # Pierwsza godzina po starcie jest niepełna - nie trafia do wzorca
+        if self.hour_count and not self.hour_partial:
+            self.baseline.update(self.slot, self.hour_sum / self.hour_count)
+        hour = floor_hour(ts)
+        self.hour_end = hour + timedelta(hours=1)
+        self.slot = hour_of_week(hour)
+        self.hour_sum, self.hour_count = 0.0, 0
+        self.hour_partial = self.last_ts is None
+
+        baseline = self.baseline
+        if baseline.count[self.slot] < self.min_weeks:
+            self.slot_mean = self.slot_std = None
+        else:
+            self.slot_mean = baseline.mean[self.slot]
+            self.slot_std = max(
+                math.sqrt(baseline.var[self.slot]), self.min_std, self.min_std_ratio * abs(self.slot_mean)
+            )
+
+
+# Detektory workera: id czujnika -> AnomalyDetector
+_detectors = {}
+
+
+def _seeded_detector(sensor, before):
+    """Detektor ze wzorcem z agregatów godzinowych sprzed `before` i stanem otwartego alertu."""
+    detector = AnomalyDetector(sensor.offline_threshold_seconds + 60)
+    until = floor_hour(before)
+    rollups = SensorHourlyRollup.objects.filter(
+        sensor=sensor, hour_start__gte=until - timedelta(weeks=settings.ANOMALY_SEED_WEEKS),
+        hour_start__lt=until, avg_power__isnull=False,
+    ).order_by('hour_start').values_list('hour_start', 'avg_power')
+    for hour_start, avg_power in rollups.iterator(chunk_size=2000):
+        detector.baseline.update(hour_of_week(hour_start), avg_power)
+    detector.active = Alert.objects.filter(sensor=sensor, alert_type='anomaly', is_resolved=False).exists()
+    return detector
+
+
+def detect_power_anomaly(sensor, readings):
+    """
+    Przepuszcza nowe odczyty (SensorData, rosnąco) przez detektor czujnika.
+    Liczy się stan na koniec paczki: wejście w anomalię tworzy alert,
+    powrót do normy rozwiązuje otwarty alert. Zwraca utworzone alerty.
+    """
+    if not readings:
+        return []
+    detector = _detectors.get(sensor.id)
+    if detector is None:
+        detector = _detectors[sensor.id] = _seeded_detector(sensor, readings[0].timestamp)
+
+    was_active = detector.active
+    started = None
+    for reading in readings:
+        if detector.feed(reading.timestamp, reading.power) == 'start':
+            started = (detector.level, detector.slot_mean, detector.slot_std)
+
+    if was_active and not detector.active:
+        Alert.objects.filter(sensor=sensor, alert_type='anomaly', is_resolved=False).update(is_resolved=True)
+    if detector.active and not was_active:
+        level, mean, std = started
+        above = level > mean
+        alert = Alert.objects.create(
+            house=sensor.house, sensor=sensor,
+            alert_type='anomaly', severity='warning',
+            message=(
+                f"Nietypowe zużycie na '{sensor.name}': {level:.0f} W, "
+                f"zwykle o tej porze {mean:.0f} W ({'więcej' if above else 'mniej'} niż zwykle)."
+            ),
+            value=level, threshold=mean + detector.z_on * std if above else max(mean - detector.z_on * std, 0.0),
+        )
+        return [alert]
+    return []
@@ -0,0 +1,181 @@
+"""
+Asynchroniczne wersje najczęściej odpytywanych endpointów (dane live, dane
+wykresu, live domów) dla uruchomienia pod ASGI (project.asgi, np. uvicorn).
+
+Czekanie na bazę nie blokuje wątku workera - jeden proces obsługuje wiele
+równoległych połączeń odpytujących (polling). Odpowiedzi mają ten sam kształt
+co widoki synchroniczne (renderowane JSONRendererem DRF), uwierzytelnianie
+to token DRF albo sesja.
+"""
+import asyncio
+import functools
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+
+from .models import House, Sensor, SensorData
+from .serializers import SensorDataSerializer
+from .throttling import DashboardReadThrottle, retry_after_header
+from .utils import (
+    build_live_summary,
+    columns_from_rows,
+    etag_matches,
+    parse_columnar_fields,
+    payload_etag,
+    with_latest_reading
+)
+
+
+def json_response(data, status_code=status.HTTP_200_OK, headers=None):
+    return HttpResponse(
+        JSONRenderer().render(data), content_type='application/json',
+        status=status_code, headers=headers
+    )
+
+
+async def _authenticate(request):
+    """Użytkownik z nagłówka "Authorization: Token ..." albo z sesji (lub None)."""
+    auth = request.headers.get('Authorization', '').split()
+    if auth and auth[0].lower() == 'token':
+        if len(auth) != 2:
+            return None
+        try:
+            token = await Token.objects.select_related('user').aget(key=auth[1])
+        except Token.DoesNotExist:
+            return None
+        return token.user if token.user.is_active else None
+
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+def async_api_view(view):
+    """Tylko GET, zalogowany użytkownik i DashboardReadThrottle - jak widoki DRF."""
+    @require_GET
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await _authenticate(request)
+        if user is None:
+            return json_response(
+                {'detail': "Nie podano danych uwierzytelniających."},
+                status.HTTP_401_UNAUTHORIZED, headers={'WWW-Authenticate': 'Token'}
+            )
+        request.user = user
+
+        throttle = DashboardReadThrottle()
+        if not await sync_to_async(throttle.allow_request)(request, None):
+            return json_response(
+                {'detail': "Zbyt wiele żądań."}, status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={'Retry-After': retry_after_header(throttle.wait())}
+            )
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def live_json_response(request, payload):
+    etag = payload_etag(payload)
+    if etag_matches(request.META.get('HTTP_IF_NONE_MATCH'), etag):
+        return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    return json_response(payload, headers={'ETag': etag})
+
+
+@async_api_view
+async def async_live_data_view(request, sensor_id):
+    """Async odpowiednik live_data_view."""
+    # Czujnik i ostatni odczyt to niezależne zapytania - wysyłamy je równolegle
+    sensor, latest = await asyncio.gather(
+        Sensor.objects.select_related('house').filter(id=sensor_id).afirst(),
+        SensorData.objects.filter(sensor_id=sensor_id).order_by('-timestamp').afirst(),
+    )
+    if sensor is None:
+        return json_response({'detail': "Nie znaleziono."}, status.HTTP_404_NOT_FOUND)
+    if sensor.house.user_id != request.user.id:
+        return json_response({'error': 'Brak dostępu'}, status.HTTP_403_FORBIDDEN)
+
+    is_online = bool(
+        latest and (timezone.now() - latest.timestamp) < timedelta(seconds=sensor.offline_threshold_seconds)
+    )
+    if not latest:
+        return json_response({'power': 0, 'voltage': 0, 'current': 0, 'pf': 0,
+                              'is_online': is_online, 'cost_per_hour': 0, 'timestamp': None})
+
+    cost_per_hour = (latest.power / 1000.0) * sensor.house.price_per_kwh if latest.power else 0
+    return json_response({
+        'timestamp': latest.timestamp,
+        'power': latest.power,
+        'voltage': latest.voltage,
+        'current': latest.current,
+        'pf': latest.pf,
+        'is_online': is_online,
+        'cost_per_hour': cost_per_hour
+    })
+
+
+@async_api_view
+async def async_sensor_data_view(request, sensor_id):
+    """Async odpowiednik sensor_data_view (ostatnia doba, także ?format=columnar&fields=...)."""
+    sensor = await Sensor.objects.select_related('house').filter(id=sensor_id).afirst()
+    if sensor is None:
+        return json_response({'detail': "Nie znaleziono."}, status.HTTP_404_NOT_FOUND)
+    if sensor.house.user_id != request.user.id:
+        return json_response({'error': 'Brak dostępu'}, status.HTTP_403_FORBIDDEN)
+
+    qs = SensorData.objects.filter(
+        sensor=sensor,
+        timestamp__gte=timezone.now() - timedelta(days=1)
+    ).order_by('timestamp')
+
+    if request.GET.get('format') == 'columnar':
+        fields, unknown = parse_columnar_fields(request.GET.get('fields'))
+        if unknown:
+            return json_response({'error': f"Nieznane pola: {', '.join(unknown)}"},
+                                 status.HTTP_400_BAD_REQUEST)
+        # values_list().aiterator() wykonuje zapytanie synchronicznie (Django 5.2),
+        # więc pobieramy wiersze przez async for na samym QuerySecie
+        rows = [row async for row in qs.values_list('timestamp', *fields)]
+        return json_response(columns_from_rows(rows, fields))
+
+    readings = [reading async for reading in qs.aiterator(chunk_size=2000)]
+    return json_response(SensorDataSerializer(readings, many=True).data)
+
+
+async def _live_sensors(sensors_queryset):
+    # Jedno zapytanie z podzapytaniami ostatniego odczytu (with_latest_reading)
+    # zamiast osobnego afirst() na czujnik
+    return [sensor async for sensor in with_latest_reading(sensors_queryset)]
+
+
+@async_api_view
+async def async_house_live_view(request, house_id):
+    """Async odpowiednik UserHouseViewSet.live."""
+    house, sensors = await asyncio.gather(
+        House.objects.filter(id=house_id, user=request.user).afirst(),
+        _live_sensors(Sensor.objects.filter(house_id=house_id, house__user=request.user)),
+    )
+    if house is None:
+        return json_response({'detail': "Nie znaleziono."}, status.HTTP_404_NOT_FOUND)
+
+    houses = build_live_summary(sensors)
+    if not houses:
+        houses = [{
+            'house_id': house.id, 'name': house.name, 'price_per_kwh': house.price_per_kwh,
+            'total_power': 0.0, 'cost_per_hour': 0.0, 'online_count': 0, 'sensors': [],
+        }]
+    return live_json_response(request, houses[0])
+
+
+@async_api_view
+async def async_houses_live_view(request):
+    """Async odpowiednik UserHouseViewSet.live_all."""
+    houses = build_live_summary(await _live_sensors(Sensor.objects.filter(house__user=request.user)))
+    return live_json_response(request, {
+        'total_power': sum(h['total_power'] for h in houses),
+        'cost_per_hour': sum(h['cost_per_hour'] for h in houses),
+        'houses': houses,
+    })
@@ -0,0 +1,134 @@
+"""
+Uwierzytelnianie urządzeń (czujników/bramek) kluczami DeviceKey.
+
+Zweryfikowane klucze trzymane są w cache LRU w pamięci procesu
+z krótkim TTL, więc w stanie ustalonym uwierzytelnienie nie wykonuje
+żadnego zapytania do bazy. Zmiana lub unieważnienie klucza czyści cache
+procesu, który ją wykonał; pozostałe procesy widzą zmianę najpóźniej
+po DEVICE_KEY_CACHE_TTL sekundach.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+from .models import DeviceKey
+from .utils import verify_signature
+
+# Dane klucza potrzebne przy przyjmowaniu odczytów (request.auth)
+DeviceIdentity = namedtuple('DeviceIdentity', ['id', 'name', 'key', 'sensor_ids', 'require_signature'])
+
+_cache = OrderedDict()  # klucz -> (ważny_do, DeviceIdentity lub None)
+_cache_lock = threading.Lock()
+
+
+def _load_device(key):
+    device = DeviceKey.objects.filter(key=key, is_active=True).first()
+    if device is None:
+        return None
+    return DeviceIdentity(
+        id=device.id,
+        name=device.name,
+        key=device.key,
+        sensor_ids=frozenset(device.sensors.values_list('sensor_id', flat=True)),
+        require_signature=device.require_signature,
+    )
+
+
+def get_device_identity(key):
+    """
+    Zwraca DeviceIdentity dla aktywnego klucza albo None.
+    Wynik (także negatywny) jest zapamiętywany na DEVICE_KEY_CACHE_TTL sekund.
+    """
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] > now:
+            _cache.move_to_end(key)
+            return entry[1]
+
+    device = _load_device(key)
+    with _cache_lock:
+        _cache[key] = (now + settings.DEVICE_KEY_CACHE_TTL, device)
+        _cache.move_to_end(key)
+        while len(_cache) > settings.DEVICE_KEY_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return device
+
+
+def forget_device_key(key):
+    """Usuwa klucz z cache (po zmianie lub unieważnieniu)."""
+    with _cache_lock:
+        _cache.pop(key, None)
+
+
+class DeviceKeyAuthentication(BaseAuthentication):
+    """
+    Nagłówek "Authorization: Device <klucz>".
+
+    Opcjonalnie paczka może być podpisana: X-Signature-Timestamp (unix, sekundy)
+    i X-Signature = sign_data(sha256(treść).hexdigest(), timestamp, secret=klucz).
+    Podpis jest sprawdzany, gdy został wysłany albo klucz go wymaga.
+
+    request.user to AnonymousUser, request.auth to DeviceIdentity.
+    """
+    keyword = 'Device'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed("Niepoprawny nagłówek klucza urządzenia.")
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed("Niepoprawny nagłówek klucza urządzenia.")
+
+        device = get_device_identity(key)
+        if device is None:
+            raise AuthenticationFailed("Nieznany lub unieważniony klucz urządzenia.")
+
+        signature = request.META.get('HTTP_X_SIGNATURE')
+        if signature or device.require_signature:
+            self.check_signature(request, device, signature)
+        return (AnonymousUser(), device)
+
+    def check_signature(self, request, device, signature):
+        timestamp = request.META.get('HTTP_X_SIGNATURE_TIMESTAMP', '')
+        if not signature or not timestamp:
+            raise AuthenticationFailed("Wymagany podpis paczki (X-Signature, X-Signature-Timestamp).")
+        try:
+            age = abs(time.time() - int(timestamp))
+        except ValueError:
+            raise AuthenticationFailed("Niepoprawny X-Signature-Timestamp.")
+        if age > settings.DEVICE_SIGNATURE_MAX_AGE_SECONDS:
+            raise AuthenticationFailed("Podpis paczki wygasł.")
+
+        digest = hashlib.sha256(request.body).hexdigest()
+        if not verify_signature(digest, timestamp, signature, secret=device.key):
+            raise AuthenticationFailed("Niepoprawny podpis paczki.")
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+class StreamingDeviceKeyAuthentication(DeviceKeyAuthentication):
+    """
+    Klucz urządzenia dla wysyłki strumieniowej (NDJSON).
+
+    Podpis obejmuje całą treść, a strumień jest zapisywany fragmentami przed
+    jej końcem - nie da się go sprawdzić bez wczytania całości do pamięci.
+    Podpisane wysyłki (lub klucze wymagające podpisu) są więc odrzucane;
+    takie urządzenia wysyłają paczki JSON.
+    """
+
+    def check_signature(self, request, device, signature):
+        raise AuthenticationFailed(
+            "Wysyłka strumieniowa nie obsługuje podpisu - wyślij paczkę na /api/admin/sensor/readings/."
+        )
@@ -0,0 +1,208 @@
+"""
+Symulacja reguł alertów czujnika na historii (np. przed zmianą progów).
+
+Odczyty mocy i prądu są przepuszczane przez te same ThresholdRule co
+w workerze alertów, a napięcie odtwarza zasady check_alerts (jeden typ
+'voltage_anomaly' dla obu progów, ponowny alert co godzinę, bez
+rozwiązywania), więc wynik odpowiada alertom, które dałyby proponowane progi.
+Żeby nie czytać całego miesiąca surowych danych, agregaty godzinowe
+(SensorHourlyRollup: max_power, max_current, min/max_voltage) wskazują
+godziny, w których któraś reguła mogła przekroczyć próg. Pozostałe godziny
+są pomijane, o ile wszystkie reguły są w spoczynku (brak serii ponad
+progiem i otwartego alertu) - wtedy ich odczyty i tak niczego nie zmieniają.
+Godziny bez agregatu (np. ostatnie, jeszcze nieprzeliczone) są czytane zawsze.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .alert_rules import ThresholdRule
+from .models import SensorData, SensorHourlyRollup
+from .rollups import floor_hour
+
+# Odstęp kolejnych alertów napięcia - jak w check_alerts
+VOLTAGE_COOLDOWN_SECONDS = 3600
+
+
+class _Backtest:
+    """Reguła progowa z polem odczytu i zebranymi alertami."""
+
+    def __init__(self, name, field, rule):
+        self.name, self.field, self.rule = name, field, rule
+        self.rollup_fields = (f'max_{field}',)
+        self.alerts = []
+
+    def feed(self, ts, value):
+        if value is None:
+            return
+        change = self.rule.feed(ts, value)
+        if change == 'start':
+            self.alerts.append({'start': ts, 'end': None})
+        elif change == 'end':
+            self.alerts[-1]['end'] = ts
+        if self.rule.active:
+            self.alerts[-1]['peak'] = self.rule.peak
+
+    def may_trigger(self, rollup):
+        """Czy godzina o danym agregacie może przekroczyć próg (brak wartości - może)."""
+        value = rollup[self.rollup_fields[0]]
+        return value is None or value > self.rule.threshold
+
+    @property
+    def idle(self):
+        return not self.rule.active and self.rule.above_since is None
+
+    def summary(self):
+        return {
+            'threshold': self.rule.threshold,
+            'clear_threshold': self.rule.clear,
+            'duration_seconds': self.rule.duration,
+            'cooldown_seconds': self.rule.cooldown,
+        }
+
+
+class _VoltageBacktest:
+    """
+    Anomalia napięcia jak w check_alerts: odczyt poza [min, max] daje alert,
+    chyba że poprzedni powstał mniej niż VOLTAGE_COOLDOWN_SECONDS wcześniej.
+    Alerty nie są rozwiązywane (end = None).
+    """
+    name = 'voltage_anomaly'
+    field = 'voltage'
+    rollup_fields = ('min_voltage', 'max_voltage')
+    idle = True  # stan to tylko czas ostatniego alertu - odczyty w normie niczego nie zmieniają
+
+    def __init__(self, low, high):
+        self.low, self.high = low, high
+        self.alerts = []
+
+    def _outside(self, value):
+        return (self.low is not None and value < self.low) or (self.high is not None and value > self.high)
+
+    def feed(self, ts, value):
+        if value is None or not self._outside(value):
+            return
+        if self.alerts and (ts - self.alerts[-1]['start']).total_seconds() < VOLTAGE_COOLDOWN_SECONDS:
+            return
+        self.alerts.append({'start': ts, 'end': None, 'peak': value})
+
+    def may_trigger(self, rollup):
+        low, high = rollup['min_voltage'], rollup['max_voltage']
+        return low is None or high is None or self._outside(low) or self._outside(high)
+
+    def summary(self):
+        return {
+            'min_threshold': self.low,
+            'max_threshold': self.high,
+            'cooldown_seconds': VOLTAGE_COOLDOWN_SECONDS,
+        }
+
+
+def _rules(sensor, params):
+    """Reguły z proponowanych parametrów; brakujące biorą wartości z czujnika."""
+    def value(name):
+        return params[name] if name in params else getattr(sensor, name)
+
+    duration = value('alert_duration_seconds')
+    cooldown = value('alert_cooldown_seconds')
+    max_gap = sensor.offline_threshold_seconds + 60
+    rules = []
+    if value('power_threshold'):
+        rules.append(_Backtest('power_high', 'power', ThresholdRule(
+            value('power_threshold'), value('power_clear_threshold'), duration, cooldown, max_gap)))
+    if value('current_max_threshold'):
+        rules.append(_Backtest('current_high', 'current', ThresholdRule(
+            value('current_max_threshold'), value('current_clear_threshold'), duration, cooldown, max_gap)))
+    if value('voltage_min_threshold') or value('voltage_max_threshold'):
+        rules.append(_VoltageBacktest(value('voltage_min_threshold') or None, value('voltage_max_threshold') or None))
+    return rules
+
+
+def _candidate_spans(sensor, rules, start, end):
+    """Scalone zakresy [od, do) godzin, w których któraś reguła może przekroczyć próg."""
+    fields = sorted({field for rule in rules for field in rule.rollup_fields})
+    rollups = {
+        row[0]: dict(zip(fields, row[1:]))
+        for row in SensorHourlyRollup.objects.filter(
+            sensor=sensor, hour_start__gte=floor_hour(start), hour_start__lt=end
+        ).values_list('hour_start', *fields)
+    }
+    spans = []
+    hour = floor_hour(start)
+    while hour < end:
+        rollup = rollups.get(hour)
+        if rollup is None or any(rule.may_trigger(rollup) for rule in rules):
+            span_start = max(hour, start)
+            if spans and spans[-1][1] == span_start:
+                spans[-1][1] = min(hour + timedelta(hours=1), end)
+            else:
+                spans.append([span_start, min(hour + timedelta(hours=1), end)])
+        hour += timedelta(hours=1)
+    return spans
+
+
+def _readings(sensor, low, high):
+    return SensorData.objects.filter(sensor=sensor, timestamp__gte=low, timestamp__lt=high).order_by(
+        'timestamp'
+    ).values_list('timestamp', 'power', 'current', 'voltage').iterator(chunk_size=10000)
+
+
+def backtest_alert_rules(sensor, params, days=30, now=None):
+    """
+    Alerty mocy, prądu i napięcia, które dałyby parametry `params` (pola
+    Sensor, np. power_threshold, alert_duration_seconds) w ostatnich `days`
+    dniach: liczba, początek, koniec i czas trwania każdego alertu.
+    """
+    end = now or timezone.now()
+    start = end - timedelta(days=days)
+    rules = _rules(sensor, params)
+    spans = _candidate_spans(sensor, rules, start, end) if rules else []
+    columns = {'power': 1, 'current': 2, 'voltage': 3}
+    plan = [(rule, columns[rule.field]) for rule in rules]
+    scanned = 0
+
+    def feed(rows):
+        nonlocal scanned
+        for row in rows:
+            scanned += 1
+            for rule, column in plan:
+                rule.feed(row[0], row[column])
+
+    # Po każdym zakresie trwająca seria lub otwarty alert wymaga dalszych
+    # odczytów, aż wszystkie reguły wrócą do spoczynku
+    for index, (low, high) in enumerate(spans):
+        feed(_readings(sensor, low, high))
+        cursor = high
+        limit = spans[index + 1][0] if index + 1 < len(spans) else end
+        step = timedelta(hours=1)
+        while cursor < limit and not all(rule.idle for rule in rules):
+            chunk_end = min(cursor + step, limit)
+            feed(_readings(sensor, cursor, chunk_end))
+            cursor, step = chunk_end, step * 2
+
+    max_alerts = settings.BACKTEST_MAX_ALERTS
+    result = {
+        'from': start,
+        'to': end,
+        'readings_scanned': scanned,
+        'rules': {},
+    }
+    for rule in rules:
+        alerts = [
+            {
+                'start': alert['start'],
+                'end': alert['end'],
+                'duration_seconds': (alert['end'] - alert['start']).total_seconds() if alert['end'] else None,
+                'peak': alert.get('peak'),
+            }
+            for alert in rule.alerts
+        ]
+        result['rules'][rule.name] = {
+            **rule.summary(),
+            'count': len(alerts),
+            'total_seconds': sum(alert['duration_seconds'] or 0 for alert in alerts),
+            'truncated': len(alerts) > max_alerts,
+            'alerts': alerts[:max_alerts],
+        }
+    return result
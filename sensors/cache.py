@@ -0,0 +1,90 @@
+import logging
+import threading
+import time
+import weakref
+
+from django.core.cache import cache
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Jedna blokada na klucz - równoległe żądania o ten sam klucz czekają
+# na jedno obliczenie zamiast liczyć to samo kilka razy (singleflight).
+# Słownik trzyma blokady słabo: wpis znika, gdy nikt jej nie trzyma ani
+# na nią nie czeka, więc nie rośnie z liczbą kluczy.
+_key_locks = weakref.WeakValueDictionary()
+_key_locks_guard = threading.Lock()
+
+
+class _KeyLock:
+    """threading.Lock, do którego można mieć słabą referencję."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquire = self._lock.acquire
+        self.release = self._lock.release
+
+    def __enter__(self):
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+
+def _lock_for(key):
+    with _key_locks_guard:
+        lock = _key_locks.get(key)
+        if lock is None:
+            lock = _key_locks[key] = _KeyLock()
+        return lock
+
+
+def _store(key, value, ttl, stale_ttl):
+    entry = {'value': value, 'fresh_until': time.time() + ttl}
+    cache.set(key, entry, ttl + stale_ttl)
+
+
+def _refresh_in_background(key, compute, ttl, stale_ttl):
+    """Odświeża wpis w osobnym wątku, o ile nikt inny już go nie odświeża."""
+    lock = _lock_for(key)
+    if not lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            _store(key, compute(), ttl, stale_ttl)
+        except Exception:
+            logger.exception(f"Błąd odświeżania cache '{key}'")
+        finally:
+            lock.release()
+            # Wątek ma własne połączenie z bazą - zamykamy je po pracy
+            connection.close()
+
+    threading.Thread(target=run, name=f"cache-refresh:{key}", daemon=True).start()
+
+
+def get_or_compute(key, compute, ttl, stale_ttl=0):
+    """
+    Zwraca wartość z cache lub oblicza ją funkcją compute().
+
+    - świeży wpis (młodszy niż ttl) jest zwracany od razu,
+    - nieświeży wpis (do ttl + stale_ttl) jest zwracany od razu, a odświeżenie
+      startuje w tle (stale-while-revalidate),
+    - przy braku wpisu równoległe wywołania dla tego samego klucza czekają
+      na jedno obliczenie (singleflight).
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        if entry['fresh_until'] <= time.time():
+            _refresh_in_background(key, compute, ttl, stale_ttl)
+        return entry['value']
+
+    with _lock_for(key):
+        # Ktoś mógł policzyć wartość, gdy czekaliśmy na blokadę
+        entry = cache.get(key)
+        if entry is not None:
+            return entry['value']
+        value = compute()
+        _store(key, value, ttl, stale_ttl)
+        return value
@@ -0,0 +1,12 @@
+class UploadIdConverter:
+    """
+    ID wgrywania zaległych danych (BackfillUpload.upload_id): 1-64 znaki
+    z [A-Za-z0-9._-]. Dłuższe lub z innymi znakami nie pasują do adresu (404).
+    """
+    regex = r'[A-Za-z0-9._-]{1,64}'
+
+    def to_python(self, value):
+        return value
+
+    def to_url(self, value):
+        return value
@@ -0,0 +1,203 @@
+"""
+Moc 15-minutowa (okresy rozliczeniowe) i szczyty miesięczne.
+
+Okresy są wyrównane do zegara (:00, :15, :30, :45), jak w licznikach
+rozliczeniowych. Energia przedziału między odczytami należy do okresu
+późniejszego odczytu, z tymi samymi przerwami co w calculate_energy_for_period.
+
+Worker alertów (i wgrywanie zaległych danych) przelicza tylko okresy,
+w które trafiły nowe odczyty: zapisuje je dla czujnika, dodaje różnicę do
+sumy domu i poprawia w miejscu listę MONTHLY_PEAKS_TOP_N szczytów miesiąca.
+Zapytanie o szczyt to odczyt kilku wierszy MonthlyPeak.
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import HouseDemandInterval, MonthlyPeak, SensorData, SensorDemandInterval
+
+
+def interval_length():
+    return timedelta(minutes=settings.DEMAND_INTERVAL_MINUTES)
+
+
+def interval_start(moment):
+    """Początek okresu zawierającego `moment` (DEMAND_INTERVAL_MINUTES musi dzielić 60)."""
+    minutes = settings.DEMAND_INTERVAL_MINUTES
+    return moment.replace(minute=moment.minute - moment.minute % minutes, second=0, microsecond=0)
+
+
+def billing_month(moment):
+    """Miesiąc rozliczeniowy (pierwszy dzień) okresu - w czasie lokalnym."""
+    return timezone.localtime(moment).date().replace(day=1)
+
+
+def month_bounds(month):
+    start = timezone.make_aware(datetime.combine(month, time.min))
+    next_month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+    return start, timezone.make_aware(datetime.combine(next_month, time.min))
+
+
+def _interval_energy(sensor, start, end):
+    """{początek okresu: Wh} z odczytów czujnika w [start, end)."""
+    readings = SensorData.objects.filter(sensor=sensor)
+    last_ts = readings.filter(timestamp__lt=start).order_by('-timestamp').values_list(
+        'timestamp', flat=True
+    ).first()
+    max_gap = sensor.offline_threshold_seconds + 60
+
+    energy = {}
+    for ts, power in readings.filter(timestamp__gte=start, timestamp__lt=end).order_by(
+        'timestamp'
+    ).values_list('timestamp', 'power').iterator(chunk_size=5000):
+        key = interval_start(ts)
+        energy.setdefault(key, 0.0)
+        if last_ts is not None:
+            dt_seconds = (ts - last_ts).total_seconds()
+            if 0 < dt_seconds < max_gap:
+                energy[key] += (float(power) if power else 0) * (dt_seconds / 3600.0)
+        last_ts = ts
+    return energy
+
+
+def update_demand(sensor, low, high):
+    """
+    Przelicza okresy czujnika, które zmieniły odczyty z [low, high] (także
+    okres następnego odczytu), sumy domu i szczyty miesięcy. Zwraca liczbę
+    zmienionych okresów.
+    """
+    length = interval_length()
+    to_hours = 3600.0 / length.total_seconds()
+    start = interval_start(low)
+    end = interval_start(high + timedelta(seconds=sensor.offline_threshold_seconds + 60)) + length
+    energy = _interval_energy(sensor, start, end)
+
+    with transaction.atomic():
+        old = dict(
+            SensorDemandInterval.objects.select_for_update().filter(
+                sensor=sensor, interval_start__gte=start, interval_start__lt=end
+            ).values_list('interval_start', 'energy_wh')
+        )
+        deltas = {
+            key: energy.get(key, 0.0) - old.get(key, 0.0)
+            for key in energy.keys() | old.keys()
+            if key not in old or abs(energy.get(key, 0.0) - old[key]) > 1e-9
+        }
+        if not deltas:
+            return 0
+
+        SensorDemandInterval.objects.bulk_create(
+            [SensorDemandInterval(sensor=sensor, interval_start=key, energy_wh=wh, avg_power=wh * to_hours)
+             for key, wh in energy.items() if key in deltas],
+            update_conflicts=True, unique_fields=['sensor', 'interval_start'], update_fields=['energy_wh', 'avg_power'],
+        )
+        SensorDemandInterval.objects.filter(
+            sensor=sensor, interval_start__in=[key for key in deltas if key not in energy]
+        ).delete()
+
+        house_energy = dict(
+            HouseDemandInterval.objects.select_for_update().filter(
+                house_id=sensor.house_id, interval_start__in=list(deltas)
+            ).values_list('interval_start', 'energy_wh')
+        )
+        house_rows = []
+        for key, delta in deltas.items():
+            wh = max(house_energy.get(key, 0.0) + delta, 0.0)
+            house_energy[key] = wh
+            house_rows.append(HouseDemandInterval(
+                house_id=sensor.house_id, interval_start=key, energy_wh=wh, avg_power=wh * to_hours
+            ))
+        HouseDemandInterval.objects.bulk_create(
+            house_rows, update_conflicts=True,
+            unique_fields=['house', 'interval_start'], update_fields=['energy_wh', 'avg_power'],
+        )
+
+        by_month = {}
+        for key in deltas:
+            by_month.setdefault(billing_month(key), []).append(key)
+        for month, keys in by_month.items():
+            _update_peaks(sensor.house_id, sensor.id, month, {k: energy.get(k, 0.0) * to_hours for k in keys})
+            _update_peaks(sensor.house_id, None, month, {k: house_energy[k] * to_hours for k in keys})
+    return len(deltas)
+
+
+def _update_peaks(house_id, sensor_id, month, changed):
+    """
+    Poprawia listę szczytów miesiąca po zmianie okresów `changed` ({początek: W}).
+    Gdy żaden zmieniony okres nie jest ani nie wchodzi do listy, nic nie robi.
+    """
+    top_n = settings.MONTHLY_PEAKS_TOP_N
+    peaks = MonthlyPeak.objects.filter(house_id=house_id, sensor_id=sensor_id, month=month)
+    current = list(peaks.order_by('rank').values_list('interval_start', 'avg_power'))
+    current_starts = {start for start, _ in current}
+    if (
+        len(current) == top_n
+        and not current_starts & changed.keys()
+        and max(changed.values()) <= current[-1][1]
+    ):
+        return
+
+    start, end = month_bounds(month)
+    if sensor_id is None:
+        source = HouseDemandInterval.objects.filter(house_id=house_id)
+    else:
+        source = SensorDemandInterval.objects.filter(sensor_id=sensor_id)
+    top = list(
+        source.filter(interval_start__gte=start, interval_start__lt=end, avg_power__gt=0)
+        .order_by('-avg_power', 'interval_start').values_list('interval_start', 'avg_power')[:top_n]
+    )
+
+    contributors = {}
+    if sensor_id is None and top:
+        for interval, contributor, power in SensorDemandInterval.objects.filter(
+            sensor__house_id=house_id, interval_start__in=[interval for interval, _ in top], avg_power__gt=0
+        ).order_by('-avg_power').values_list('interval_start', 'sensor_id', 'avg_power'):
+            contributors.setdefault(interval, []).append({'sensor_id': contributor, 'avg_power': power})
+
+    peaks.delete()
+    MonthlyPeak.objects.bulk_create([
+        MonthlyPeak(
+            house_id=house_id, sensor_id=sensor_id, month=month, rank=rank,
+            interval_start=interval, avg_power=power, contributors=contributors.get(interval, []),
+        )
+        for rank, (interval, power) in enumerate(top, start=1)
+    ])
+
+
+def monthly_peak_summary(house, month):
+    """
+    Szczyty domu i jego czujników w miesiącu rozliczeniowym - tylko odczyt
+    wierszy MonthlyPeak. Moce w W, okres jako [interval_start, interval_end).
+    """
+    length = interval_length()
+    names = dict(house.sensors.values_list('id', 'name'))
+
+    def interval(row):
+        return {
+            'interval_start': row.interval_start,
+            'interval_end': row.interval_start + length,
+            'avg_power': round(row.avg_power, 1),
+        }
+
+    house_peaks, sensor_peaks = [], []
+    for row in MonthlyPeak.objects.filter(house=house, month=month).order_by('rank'):
+        if row.sensor_id is None:
+            house_peaks.append({'rank': row.rank, **interval(row), 'contributors': [
+                {'sensor_id': item['sensor_id'], 'sensor_name': names.get(item['sensor_id']),
+                 'avg_power': round(item['avg_power'], 1)}
+                for item in row.contributors
+            ]})
+        elif row.rank == 1:
+            sensor_peaks.append({'sensor_id': row.sensor_id, 'sensor_name': names.get(row.sensor_id), **interval(row)})
+
+    sensor_peaks.sort(key=lambda item: item['avg_power'], reverse=True)
+    return {
+        'house_id': house.id,
+        'month': f"{month:%Y-%m}",
+        'interval_minutes': settings.DEMAND_INTERVAL_MINUTES,
+        'peak': house_peaks[0] if house_peaks else None,
+        'top': house_peaks,
+        'sensors': sensor_peaks,
+    }
@@ -0,0 +1,142 @@
+"""
+Wykrywanie włączeń i wyłączeń urządzeń ze skokowych zmian mocy czynnej.
+
+Detektor krawędzi z potwierdzeniem: odczyt różniący się od bieżącego
+poziomu o co najmniej APPLIANCE_STEP_MIN_WATTS zaczyna kandydata na nowy
+poziom; APPLIANCE_STEP_CONFIRM_READINGS kolejnych odczytów na tym poziomie
+daje zdarzenie (ΔP, ΔQ z reactive_power). Pojedyncze szpilki (powrót do
+starego poziomu) nie są zdarzeniami, a poziom śledzi powolny dryf (EWMA).
+
+Stan detektora ma stałą liczbę pól niezależnie od historii. Worker alertów
+trzyma po jednym detektorze na czujnik w pamięci procesu; historia jest
+przetwarzana tym samym detektorem (backfill_appliance_events), więc oba
+tryby dają te same zdarzenia.
+"""
+from django.conf import settings
+
+from .models import ApplianceEvent, SensorData
+
+
+class StepDetector:
+    __slots__ = (
+        'min_step', 'confirm', 'smoothing', 'max_gap',
+        'level_p', 'level_q', 'stable_ts', 'last_ts',
+        'pending_n', 'pending_p', 'pending_q', 'pending_first',
+    )
+
+    def __init__(self, max_gap_seconds, min_step=None, confirm=None, smoothing=None):
+        self.min_step = min_step if min_step is not None else settings.APPLIANCE_STEP_MIN_WATTS
+        self.confirm = confirm if confirm is not None else settings.APPLIANCE_STEP_CONFIRM_READINGS
+        self.smoothing = smoothing if smoothing is not None else settings.APPLIANCE_LEVEL_SMOOTHING
+        self.max_gap = max_gap_seconds
+        self.level_p = self.level_q = 0.0
+        self.stable_ts = self.last_ts = self.pending_first = None
+        self.pending_n = 0
+        self.pending_p = self.pending_q = 0.0
+
+    def feed(self, ts, power, reactive_power):
+        """Przetwarza kolejny odczyt; zwraca słownik zdarzenia albo None."""
+        power = power or 0.0
+        reactive_power = reactive_power or 0.0
+        if self.last_ts is not None and ts <= self.last_ts:
+            return None  # odczyt starszy niż już przetworzone
+
+        if self.last_ts is None or (ts - self.last_ts).total_seconds() >= self.max_gap:
+            # Początek albo przerwa w danych - nowy poziom bez zdarzenia
+            self.level_p, self.level_q = power, reactive_power
+            self.stable_ts = self.last_ts = ts
+            self.pending_n = 0
+            return None
+
+        self.last_ts = ts
+        if abs(power - self.level_p) < self.min_step:
+            self.pending_n = 0
+            self.level_p += self.smoothing * (power - self.level_p)
+            self.level_q += self.smoothing * (reactive_power - self.level_q)
+            self.stable_ts = ts
+            return None
+
+        if self.pending_n and abs(power - self.pending_p) < self.min_step:
+            self.pending_n += 1
+            self.pending_p += (power - self.pending_p) / self.pending_n
+            self.pending_q += (reactive_power - self.pending_q) / self.pending_n
+        else:
+            # Nowy kandydat (także gdy po szpilce rozruchowej moc ustala się na innym poziomie)
+            self.pending_n = 1
+            self.pending_p, self.pending_q = power, reactive_power
+            self.pending_first = ts
+
+        if self.pending_n < self.confirm:
+            return None
+
+        delta_p = self.pending_p - self.level_p
+        event = {
+            'kind': 'on' if delta_p > 0 else 'off',
+            'started_at': self.stable_ts,
+            'ended_at': self.pending_first,
+            'delta_power': delta_p,
+            'delta_reactive_power': self.pending_q - self.level_q,
+            'power_before': self.level_p,
+            'power_after': self.pending_p,
+        }
+        self.level_p, self.level_q = self.pending_p, self.pending_q
+        self.stable_ts = ts
+        self.pending_n = 0
+        return event
+
+
+def _max_gap(sensor):
+    return sensor.offline_threshold_seconds + 60
+
+
+# Detektory workera: id czujnika -> StepDetector
+_detectors = {}
+
+
+def detect_appliance_events(sensor, readings):
+    """Przepuszcza nowe odczyty (SensorData, rosnąco) przez detektor czujnika i zapisuje zdarzenia."""
+    if not readings:
+        return 0
+    detector = _detectors.get(sensor.id)
+    if detector is None:
+        detector = _detectors[sensor.id] = StepDetector(_max_gap(sensor))
+        # Po starcie workera poziom początkowy daje odczyt sprzed paczki
+        previous = SensorData.objects.filter(
+            sensor=sensor, timestamp__lt=readings[0].timestamp
+        ).order_by('-timestamp').values_list('timestamp', 'power', 'reactive_power').first()
+        if previous:
+            detector.feed(*previous)
+    detector.max_gap = _max_gap(sensor)
+
+    events = []
+    for reading in readings:
+        event = detector.feed(reading.timestamp, reading.power, reading.reactive_power)
+        if event:
+            events.append(ApplianceEvent(sensor=sensor, **event))
+    ApplianceEvent.objects.bulk_create(events, ignore_conflicts=True)
+    return len(events)
+
+
+def backfill_appliance_events(sensor, start, end, batch_size=2000):
+    """
+    Wykrywa od nowa zdarzenia czujnika z odczytów [start, end): usuwa stare
+    zdarzenia z zakresu, czyta odczyty strumieniowo i zapisuje paczkami.
+    Zwraca liczbę zdarzeń.
+    """
+    ApplianceEvent.objects.filter(sensor=sensor, ended_at__gte=start, ended_at__lt=end).delete()
+    detector = StepDetector(_max_gap(sensor))
+    readings = SensorData.objects.filter(
+        sensor=sensor, timestamp__gte=start, timestamp__lt=end
+    ).order_by('timestamp').values_list('timestamp', 'power', 'reactive_power')
+
+    batch, total = [], 0
+    for ts, power, reactive_power in readings.iterator(chunk_size=10000):
+        event = detector.feed(ts, power, reactive_power)
+        if event:
+            batch.append(ApplianceEvent(sensor=sensor, **event))
+            if len(batch) >= batch_size:
+                ApplianceEvent.objects.bulk_create(batch, ignore_conflicts=True)
+                total += len(batch)
+                batch = []
+    ApplianceEvent.objects.bulk_create(batch, ignore_conflicts=True)
+    return total + len(batch)
@@ -0,0 +1,188 @@
+"""
+Statystyki całej floty domów liczone równolegle w procesach.
+
+Domy są dzielone na paczki i rozdzielane między procesy ProcessPoolExecutor.
+Każdy proces ma własne połączenie z bazą; na PostgreSQL liczy swoje domy
+w jednej transakcji tylko do odczytu (REPEATABLE READ - stały snapshot).
+Na SQLite długa transakcja trzymałaby blokadę SHARED i wstrzymywała zapis
+odczytów, więc zapytania idą bez niej - spójność daje i tak wspólny
+moment `period_end`, do którego liczą wszystkie procesy.
+
+Wynik trafia do FleetReport/FleetHouseStat, skąd czyta go panel administratora.
+
+Modele są importowane wewnątrz funkcji - proces potomny uruchomiony metodą
+"spawn" (Windows, macOS, a także z wielowątkowego run_scheduler) importuje
+ten moduł przed django.setup().
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import timedelta
+from itertools import repeat
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+
+def month_bounds(now):
+    """Początek bieżącego i poprzedniego miesiąca (jak w get_comparison_data)."""
+    period_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    previous_start = (period_start - timedelta(days=1)).replace(day=1)
+    return previous_start, period_start
+
+
+def _init_worker():
+    if not apps.ready:
+        django.setup()
+
+
+def _sensor_usage(rows, period_start, max_gap_seconds):
+    """
+    Całkuje moc czujnika jak calculate_energy_for_period, osobno dla
+    poprzedniego i bieżącego miesiąca (przerwy między okresami nie liczą się
+    do żadnego z nich). Zwraca (Wh poprzedni, Wh bieżący, odczyty bieżące, ostatni czas).
+    """
+    previous_wh = current_wh = 0.0
+    current_count = 0
+    last_ts = None
+    for ts, power in rows:
+        in_current = ts >= period_start
+        if in_current:
+            current_count += 1
+        if last_ts is not None and (last_ts >= period_start) == in_current:
+            dt_seconds = (ts - last_ts).total_seconds()
+            if 0 < dt_seconds < max_gap_seconds:
+                wh = (float(power) if power else 0) * (dt_seconds / 3600.0)
+                if in_current:
+                    current_wh += wh
+                else:
+                    previous_wh += wh
+        last_ts = ts
+    return previous_wh, current_wh, current_count, last_ts
+
+
+def compute_houses(house_ids, previous_start, period_start, period_end):
+    """Statystyki podanych domów (jeden wiersz na dom) do momentu period_end."""
+    from .models import House, Sensor, SensorData
+
+    rows = []
+    snapshot = connection.vendor == 'postgresql'
+    with transaction.atomic() if snapshot else nullcontext():
+        if snapshot:
+            with connection.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+
+        houses = House.objects.filter(id__in=house_ids).values_list('id', 'user_id', 'price_per_kwh')
+        sensors_by_house = {}
+        for sensor_id, house_id, threshold in Sensor.objects.filter(house_id__in=house_ids).values_list(
+            'id', 'house_id', 'offline_threshold_seconds'
+        ):
+            sensors_by_house.setdefault(house_id, []).append((sensor_id, threshold))
+
+        for house_id, user_id, price_per_kwh in houses:
+            stat = {
+                'house_id': house_id, 'user_id': user_id, 'sensors': 0, 'online_sensors': 0,
+                'readings': 0, 'kwh': 0.0, 'cost': 0.0, 'previous_kwh': 0.0,
+            }
+            for sensor_id, threshold in sensors_by_house.get(house_id, ()):
+                readings = SensorData.objects.filter(
+                    sensor_id=sensor_id, timestamp__gte=previous_start, timestamp__lt=period_end
+                ).order_by('timestamp').values_list('timestamp', 'power').iterator(chunk_size=5000)
+                previous_wh, current_wh, count, last_ts = _sensor_usage(readings, period_start, threshold + 60)
+
+                stat['sensors'] += 1
+                if last_ts and (period_end - last_ts) < timedelta(seconds=threshold):
+                    stat['online_sensors'] += 1
+                stat['readings'] += count
+                stat['kwh'] += current_wh / 1000.0
+                stat['previous_kwh'] += previous_wh / 1000.0
+            stat['cost'] = stat['kwh'] * price_per_kwh
+            rows.append(stat)
+    return rows
+
+
+def _partition(houses, parts):
+    """Dzieli [(id domu, liczba czujników)] na `parts` list o zbliżonej liczbie czujników."""
+    chunks = [[] for _ in range(parts)]
+    loads = [0] * parts
+    for house_id, sensor_count in sorted(houses, key=lambda h: -h[1]):
+        lightest = loads.index(min(loads))
+        chunks[lightest].append(house_id)
+        loads[lightest] += sensor_count or 1
+    return [chunk for chunk in chunks if chunk]
+
+
+def compute_fleet_stats(workers=None, now=None):
+    """
+    Liczy statystyki wszystkich domów w `workers` procesach (1 - w bieżącym
+    procesie). Zwraca (wiersze domów, (previous_start, period_start, period_end)).
+    """
+    from django.db.models import Count
+
+    from .models import House
+
+    workers = workers or settings.FLEET_REPORT_WORKERS or os.cpu_count() or 1
+    period_end = now or timezone.now()
+    previous_start, period_start = month_bounds(period_end)
+    houses = list(House.objects.annotate(sensor_count=Count('sensors')).values_list('id', 'sensor_count'))
+    bounds = (previous_start, period_start, period_end)
+
+    if workers == 1 or len(houses) <= 1:
+        return compute_houses([h[0] for h in houses], *bounds), bounds
+
+    # Kilka paczek na proces wyrównuje obciążenie, gdy domy mają różną liczbę odczytów
+    chunks = _partition(houses, workers * 4)
+    # Procesy potomne (fork) nie mogą współdzielić połączenia rodzica
+    connections.close_all()
+    # fork z procesu z wieloma wątkami (run_scheduler) może skopiować zajęte blokady
+    mp_context = multiprocessing.get_context('spawn') if threading.active_count() > 1 else None
+    rows = []
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(chunks)), mp_context=mp_context, initializer=_init_worker
+    ) as pool:
+        for chunk_rows in pool.map(compute_houses, chunks, *(repeat(b) for b in bounds)):
+            rows.extend(chunk_rows)
+    return rows, bounds
+
+
+def build_fleet_report(workers=None, now=None):
+    """Liczy i zapisuje raport floty; usuwa raporty starsze niż FLEET_REPORT_KEEP ostatnich."""
+    from .models import FleetHouseStat, FleetReport
+
+    workers = workers or settings.FLEET_REPORT_WORKERS or os.cpu_count() or 1
+    started = time.perf_counter()
+    rows, (previous_start, period_start, period_end) = compute_fleet_stats(workers, now)
+    duration = time.perf_counter() - started
+
+    with transaction.atomic():
+        report = FleetReport.objects.create(
+            period_start=period_start,
+            period_end=period_end,
+            previous_period_start=previous_start,
+            total_houses=len(rows),
+            total_sensors=sum(r['sensors'] for r in rows),
+            online_sensors=sum(r['online_sensors'] for r in rows),
+            total_kwh=sum(r['kwh'] for r in rows),
+            total_cost=sum(r['cost'] for r in rows),
+            previous_kwh=sum(r['previous_kwh'] for r in rows),
+            workers=workers,
+            duration_seconds=duration,
+        )
+        FleetHouseStat.objects.bulk_create(
+            [FleetHouseStat(report=report, **row) for row in rows], batch_size=1000
+        )
+        stale = FleetReport.objects.values_list('id', flat=True)[settings.FLEET_REPORT_KEEP:]
+        FleetReport.objects.filter(id__in=list(stale)).delete()
+    return report
+
+
+def latest_fleet_report():
+    from .models import FleetReport
+
+    return FleetReport.objects.first()
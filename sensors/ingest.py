@@ -0,0 +1,188 @@
+import logging
+
+from django.db import transaction
+from django.db.models import Q
+
+from .demand import update_demand
+from .events import detect_appliance_events
+from .models import Sensor, SensorData, PendingReadingBatch
+from .power_quality import rebuild_power_quality, update_power_quality
+from .rollups import refresh_rollups_for_range
+from .utils import (
+    calculate_reactive_power,
+    check_alerts,
+    is_closed_period,
+    invalidate_energy_cache,
+    invalidate_house_statistics
+)
+
+logger = logging.getLogger(__name__)
+
+
+def store_readings(readings, realtime=True):
+    """
+    Zapisuje zwalidowane odczyty (słowniki jak z SensorReadingSerializer).
+
+    W jednej transakcji: odczyty trafiają do SensorData (bulk_create),
+    a dla każdego czujnika do kolejki PendingReadingBatch, z której alerty
+    liczy w tle run_alert_worker. Po zatwierdzeniu spóźnione odczyty
+    unieważniają cache zużycia zamkniętych okresów i statystyk domu oraz
+    przeliczają agregaty godzinowe (i z nimi profile zużycia).
+
+    realtime=False (wgrywanie zaległych danych) pomija kolejkę alertów -
+    alerty ze starych odczytów nie mają sensu.
+
+    Zapis jest idempotentny: odczyty o istniejącej parze (czujnik, czas)
+    - np. ponowiona wysyłka po timeoucie - są pomijane i liczone jako duplikaty.
+
+    Zwraca słownik {'created': n, 'duplicates': n, 'unknown_sensors': [...]}.
+    """
+    sensor_ids = {reading['sensor_id'] for reading in readings}
+    sensors = {
+        sensor.sensor_id: sensor
+        for sensor in Sensor.objects.filter(sensor_id__in=sensor_ids)
+    }
+    unknown_sensors = sorted(sensor_ids - sensors.keys())
+    for sensor_id in unknown_sensors:
+        logger.warning(f"Sensor {sensor_id} nie istnieje.")
+
+    # Odczyty znanych czujników bez duplikatów wewnątrz paczki
+    unique = {}
+    for reading in readings:
+        sensor = sensors.get(reading['sensor_id'])
+        if sensor is not None:
+            unique.setdefault((sensor.id, reading['timestamp']), (sensor, reading))
+    known_count = sum(1 for reading in readings if reading['sensor_id'] in sensors)
+
+    ranges = _time_ranges((sensor, reading['timestamp']) for sensor, reading in unique.values())
+    if ranges:
+        # Jedno zapytanie o już zapisane pary (czujnik, czas) z zakresu paczki
+        existing_filter = Q()
+        for sensor, (low, high) in ranges.items():
+            existing_filter |= Q(sensor=sensor, timestamp__gte=low, timestamp__lte=high)
+        existing = set(SensorData.objects.filter(existing_filter).values_list('sensor_id', 'timestamp'))
+    else:
+        existing = set()
+
+    objects = [
+        SensorData(
+            sensor=sensor, timestamp=reading['timestamp'], voltage=reading['voltage'],
+            current=reading['current'], power=reading['power'], energy=reading['energy'],
+            frequency=reading['frequency'], pf=reading['pf'],
+            reactive_power=calculate_reactive_power(reading['power'], reading['pf'])
+        )
+        for key, (sensor, reading) in unique.items() if key not in existing
+    ]
+    new_ranges = _time_ranges((obj.sensor, obj.timestamp) for obj in objects)
+
+    with transaction.atomic():
+        # ignore_conflicts chroni przed wyścigiem dwóch równoległych ponowień
+        SensorData.objects.bulk_create(objects, ignore_conflicts=True)
+        if realtime:
+            PendingReadingBatch.objects.bulk_create([
+                PendingReadingBatch(sensor=sensor, ts_from=low, ts_to=high)
+                for sensor, (low, high) in new_ranges.items()
+            ])
+        # Przeliczenia po zatwierdzeniu (także transakcji wywołującego, np. backfillu) -
+        # nie trzymają blokady zapisu SQLite, a ich błąd nie cofa zapisanych odczytów
+        for sensor, (low, high) in new_ranges.items():
+            transaction.on_commit(
+                lambda sensor=sensor, low=low, high=high: _recompute_range(sensor, low, high, realtime), robust=True
+            )
+
+    return {
+        'created': len(objects),
+        'duplicates': known_count - len(objects),
+        'unknown_sensors': unknown_sensors,
+    }
+
+
+def _recompute_range(sensor, low, high, realtime):
+    """Przelicza dane pochodne czujnika, które zmieniły nowe odczyty z [low, high]."""
+    if not realtime:
+        # Zaległe dane omijają worker - ich dni jakości zasilania i moc 15-minutową liczymy od razu
+        rebuild_power_quality(sensor, low, high)
+        update_demand(sensor, low, high)
+    if is_closed_period(low):
+        invalidate_energy_cache(sensor, low, high)
+        invalidate_house_statistics(sensor.house_id)
+        refresh_rollups_for_range(sensor, low, high)
+
+
+def _time_ranges(pairs):
+    """Zakres czasu [min, max] dla każdego czujnika z par (czujnik, czas)."""
+    ranges = {}
+    for sensor, timestamp in pairs:
+        bounds = ranges.get(sensor)
+        if bounds is None:
+            ranges[sensor] = [timestamp, timestamp]
+        elif timestamp < bounds[0]:
+            bounds[0] = timestamp
+        elif timestamp > bounds[1]:
+            bounds[1] = timestamp
+    return ranges
+
+
+def process_pending_batches(limit=500, keep_lease=None):
+    """
+    Przetwarza do `limit` paczek z kolejki PendingReadingBatch.
+
+    Paczki są grupowane po czujniku - dla każdego czujnika odczyty z całego
+    zakresu pobierane są jednym zapytaniem, a alerty, podsumowania jakości
+    zasilania, zdarzenia urządzeń i moc 15-minutowa liczone raz dla całości.
+
+    `keep_lease` (opcjonalnie) jest wywoływane przed każdym czujnikiem
+    i przedłuża dzierżawę workera. Gdy zwróci False, przebieg się kończy,
+    a z kolejki znikają tylko paczki czujników już przetworzonych - resztą
+    zajmie się instancja, która przejęła dzierżawę.
+    Zwraca liczbę przetworzonych wierszy kolejki.
+    """
+    batches = list(PendingReadingBatch.objects.order_by('id')[:limit])
+    if not batches:
+        return 0
+
+    ranges = {}
+    for batch in batches:
+        bounds = ranges.get(batch.sensor_id)
+        if bounds is None:
+            ranges[batch.sensor_id] = [batch.ts_from, batch.ts_to]
+        else:
+            bounds[0] = min(bounds[0], batch.ts_from)
+            bounds[1] = max(bounds[1], batch.ts_to)
+
+    sensors = Sensor.objects.select_related('house').in_bulk(ranges.keys())
+    done = []
+    for sensor_id, (low, high) in ranges.items():
+        if keep_lease is not None and not keep_lease():
+            logger.warning("Utracono dzierżawę workera alertów - przerywam przetwarzanie kolejki")
+            break
+        done.append(sensor_id)
+        sensor = sensors.get(sensor_id)
+        if sensor is None:
+            continue
+        readings = list(
+            sensor.data.filter(timestamp__gte=low, timestamp__lte=high).order_by('timestamp')
+        )
+        try:
+            check_alerts(sensor, readings)
+        except Exception:
+            # Błąd jednego czujnika nie może blokować kolejki
+            logger.exception(f"Błąd sprawdzania alertów czujnika {sensor.sensor_id}")
+        try:
+            update_power_quality(sensor, readings)
+        except Exception:
+            logger.exception(f"Błąd aktualizacji jakości zasilania czujnika {sensor.sensor_id}")
+        try:
+            detect_appliance_events(sensor, readings)
+        except Exception:
+            logger.exception(f"Błąd wykrywania zdarzeń urządzeń czujnika {sensor.sensor_id}")
+        try:
+            update_demand(sensor, low, high)
+        except Exception:
+            logger.exception(f"Błąd aktualizacji mocy 15-minutowej czujnika {sensor.sensor_id}")
+
+    if len(done) < len(ranges):
+        done = set(done)
+        batches = [batch for batch in batches if batch.sensor_id in done]
+    PendingReadingBatch.objects.filter(id__in=[batch.id for batch in batches]).delete()
+    return len(batches)
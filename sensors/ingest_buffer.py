@@ -0,0 +1,130 @@
+"""
+Bufor zapisu (write-behind) dla odczytów z czujników.
+
+W trybie INGEST_MODE = 'buffered' żądania HTTP nie piszą do głównej bazy,
+tylko dopisują odczyty do osobnego pliku SQLite w trybie WAL. Jeden proces
+(polecenie drain_ingest_buffer) przenosi je dużymi transakcjami do SensorData,
+więc workerzy gunicorna nie walczą o blokadę zapisu głównej bazy.
+
+Trwałość: odczyt jest potwierdzany klientowi dopiero po COMMIT w buforze
+(synchronous=FULL -> fsync). Po awarii drenującego procesu paczka może zostać
+przeniesiona ponownie - duplikaty pomija unikalność (sensor, timestamp).
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+READING_COLUMNS = ('sensor_id', 'timestamp', 'voltage', 'current', 'power', 'energy', 'frequency', 'pf')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS readings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    enqueued_at REAL NOT NULL,
+    sensor_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    voltage REAL, current REAL, power REAL, energy REAL, frequency REAL, pf REAL
+)
+"""
+
+
+class IngestBufferFull(Exception):
+    """Bufor osiągnął INGEST_BUFFER_MAX_DEPTH - klient powinien ponowić później."""
+
+
+_local = threading.local()
+
+
+def _connection():
+    """Połączenie z plikiem bufora (osobne dla każdego wątku)."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(str(settings.INGEST_BUFFER_PATH), timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={settings.INGEST_BUFFER_SYNCHRONOUS}")
+        conn.execute(SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def _depth(conn):
+    # Identyfikatory są ciągłe (AUTOINCREMENT, usuwamy od najstarszych),
+    # więc MIN/MAX po kluczu głównym daje głębokość bez COUNT(*)
+    low, high = conn.execute("SELECT MIN(id), MAX(id) FROM readings").fetchone()
+    return 0 if low is None else high - low + 1
+
+
+def enqueue(readings):
+    """
+    Dopisuje zwalidowane odczyty do bufora. Wraca dopiero po trwałym zapisie.
+    Rzuca IngestBufferFull, gdy bufor jest pełny.
+    """
+    now = time.time()
+    rows = [
+        (now, r['sensor_id'], r['timestamp'].isoformat(), r['voltage'], r['current'],
+         r['power'], r['energy'], r['frequency'], r['pf'])
+        for r in readings
+    ]
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if _depth(conn) + len(rows) > settings.INGEST_BUFFER_MAX_DEPTH:
+            raise IngestBufferFull()
+        conn.executemany(
+            "INSERT INTO readings (enqueued_at, sensor_id, timestamp, voltage, current, "
+            "power, energy, frequency, pf) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return len(rows)
+
+
+def drain(limit=5000):
+    """
+    Przenosi do `limit` najstarszych odczytów z bufora do bazy (store_readings).
+    Zwraca liczbę przeniesionych odczytów.
+    """
+    from .ingest import store_readings
+
+    conn = _connection()
+    rows = conn.execute(
+        "SELECT id, sensor_id, timestamp, voltage, current, power, energy, frequency, pf "
+        "FROM readings ORDER BY id LIMIT ?",
+        (limit,)
+    ).fetchall()
+    if not rows:
+        return 0
+
+    readings = []
+    for row in rows:
+        reading = dict(zip(READING_COLUMNS, row[1:]))
+        reading['timestamp'] = datetime.fromisoformat(reading['timestamp'])
+        readings.append(reading)
+
+    store_readings(readings)
+    conn.execute("DELETE FROM readings WHERE id <= ?", (rows[-1][0],))
+    return len(rows)
+
+
+def stats():
+    """Metryki bufora: głębokość, wiek najstarszego odczytu (opóźnienie) i limit."""
+    if not os.path.exists(settings.INGEST_BUFFER_PATH):
+        return {'mode': settings.INGEST_MODE, 'depth': 0,
+                'max_depth': settings.INGEST_BUFFER_MAX_DEPTH, 'lag_seconds': 0.0}
+    conn = _connection()
+    oldest = conn.execute("SELECT enqueued_at FROM readings ORDER BY id LIMIT 1").fetchone()
+    return {
+        'mode': settings.INGEST_MODE,
+        'depth': _depth(conn),
+        'max_depth': settings.INGEST_BUFFER_MAX_DEPTH,
+        'lag_seconds': round(time.time() - oldest[0], 3) if oldest else 0.0,
+    }
@@ -0,0 +1,125 @@
+"""
+Zadania okresowe uruchamiane przez run_scheduler (harmonogram w settings.SCHEDULER_JOBS).
+
+Każde zadanie to funkcja bez argumentów; zwracany napis trafia do
+ScheduledJob.last_result.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .fleet import build_fleet_report
+from .models import ActivityLog, Alert, House, Sensor, SensorData
+from .rollups import refresh_hourly_rollups
+from .scheduler import scheduled_job
+from .utils import calculate_energy_for_period, comparison_bounds, is_closed_period, monthly_periods
+
+logger = logging.getLogger(__name__)
+
+
+def check_offline_sensors():
+    """
+    Tworzy alert 'sensor_offline' dla aktywnych czujników bez pomiaru dłużej
+    niż ich offline_threshold_seconds i rozwiązuje go, gdy czujnik wróci.
+    """
+    now = timezone.now()
+    result = {'online': 0, 'offline': 0, 'went_offline': [], 'back_online': []}
+
+    for sensor in Sensor.objects.filter(is_active=True).select_related('house'):
+        last_reading = sensor.data.order_by('-timestamp').first()
+        is_offline = not (
+            last_reading and now - last_reading.timestamp < timedelta(seconds=sensor.offline_threshold_seconds)
+        )
+
+        if is_offline:
+            result['offline'] += 1
+            active_alert_exists = Alert.objects.filter(
+                sensor=sensor, alert_type='sensor_offline', is_resolved=False
+            ).exists()
+            if not active_alert_exists:
+                # Czujnik właśnie przeszedł w stan offline
+                Alert.objects.create(
+                    house=sensor.house,
+                    sensor=sensor,
+                    alert_type='sensor_offline',
+                    severity='critical',
+                    message=f"Czujnik '{sensor.name}' jest offline! (Brak danych przez ponad {sensor.offline_threshold_seconds}s)"
+                )
+                result['went_offline'].append(sensor.name)
+        else:
+            result['online'] += 1
+            resolved = Alert.objects.filter(
+                sensor=sensor, alert_type='sensor_offline', is_resolved=False
+            ).update(is_resolved=True, is_read=True)
+            if resolved:
+                result['back_online'].append(sensor.name)
+    return result
+
+
+@scheduled_job('check_offline_sensors', lease_seconds=300)
+def check_offline_sensors_job():
+    result = check_offline_sensors()
+    return (f"online: {result['online']}, offline: {result['offline']}, "
+            f"nowe offline: {len(result['went_offline'])}, powroty: {len(result['back_online'])}")
+
+
+@scheduled_job('refresh_hourly_rollups', lease_seconds=1800)
+def refresh_hourly_rollups_job():
+    return f"agregatów: {refresh_hourly_rollups()}"
+
+
+@scheduled_job('compute_fleet_report', lease_seconds=3600)
+def compute_fleet_report_job():
+    report = build_fleet_report()
+    return f"domów: {report.total_houses}, {report.total_kwh:.2f} kWh, {report.duration_seconds:.1f} s"
+
+
+@scheduled_job('warm_energy_cache', lease_seconds=3600)
+def warm_energy_cache_job():
+    """
+    Liczy z góry zużycie zamkniętych okresów, o które pytają statystyki domu
+    i porównanie miesięcy (poprzedni dzień, tydzień, miesiąc i 12 miesięcy
+    historii). Wyniki zostają w EnergyPeriodCache, wspólnym dla wszystkich
+    procesów - pierwsze wejście na stronę po północy nie liczy ich od zera.
+    """
+    now = timezone.now()
+    periods = {comparison_bounds(period, now)[1:] for period in ('day', 'week', 'month')}
+    periods.update(monthly_periods(now))
+    periods = [(start, end) for start, end in periods if is_closed_period(end, now)]
+
+    for house in House.objects.all():
+        for start, end in periods:
+            calculate_energy_for_period(house, start, end)
+    return f"domów: {House.objects.count()}, okresów na dom: {len(periods)}"
+
+
+def _delete_in_batches(queryset, batch_size=5000):
+    """Usuwa partiami, żeby nie trzymać długo blokad przy dużych tabelach."""
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += queryset.model.objects.filter(id__in=ids).delete()[1].get(queryset.model._meta.label, 0)
+
+
+@scheduled_job('apply_retention', lease_seconds=3600)
+def apply_retention_job():
+    """Usuwa dane starsze niż okresy retencji z ustawień (None - bez limitu)."""
+    now = timezone.now()
+    rules = (
+        (ActivityLog.objects, 'created_at', settings.ACTIVITY_LOG_RETENTION_DAYS),
+        (Alert.objects.filter(is_resolved=True), 'created_at', settings.RESOLVED_ALERT_RETENTION_DAYS),
+        (SensorData.objects, 'timestamp', settings.SENSOR_DATA_RETENTION_DAYS),
+    )
+    summary = []
+    for queryset, field, days in rules:
+        if days is None:
+            continue
+        deleted = _delete_in_batches(queryset.filter(**{f"{field}__lt": now - timedelta(days=days)}))
+        summary.append(f"{queryset.model._meta.verbose_name_plural}: {deleted}")
+        if deleted:
+            logger.info(f"Retencja: usunięto {deleted} wierszy {queryset.model.__name__}")
+    return ', '.join(summary)
@@ -0,0 +1,52 @@
+import gzip
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from sensors.middleware import zstandard
+
+from .bench_ingest_formats import fake_readings
+
+
+class Command(BaseCommand):
+    help = 'Benchmark kompresji paczek odczytów (JSON): rozmiar i CPU kompresji/dekompresji'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000],
+                            help='Liczby odczytów w paczce')
+        parser.add_argument('--repeat', type=int, default=20, help='Ile razy powtórzyć pomiar CPU')
+
+    def measure(self, function, payload, repeat):
+        started = time.process_time()
+        for _ in range(repeat):
+            result = function(payload)
+        return result, (time.process_time() - started) / repeat * 1e6
+
+    def handle(self, *args, **options):
+        codecs = [
+            ('gzip-1', lambda data: gzip.compress(data, compresslevel=1), gzip.decompress),
+            ('gzip-6', lambda data: gzip.compress(data, compresslevel=6), gzip.decompress),
+        ]
+        if zstandard is not None:
+            for level in (1, 3):
+                compressor = zstandard.ZstdCompressor(level=level)
+                codecs.append((f'zstd-{level}', compressor.compress, zstandard.ZstdDecompressor().decompress))
+        else:
+            self.stdout.write(self.style.WARNING("Brak pakietu zstandard - pomijam zstd."))
+
+        self.stdout.write(
+            f"{'Odczytów':>9}{'Kodek':>9}{'JSON [B]':>11}{'Po [B]':>10}{'Stopień':>9}"
+            f"{'Kompr. [µs]':>13}{'Dekompr. [µs]':>15}"
+        )
+        for size in options['sizes']:
+            payload = json.dumps(
+                [{**r, 'timestamp': r['timestamp'].isoformat()} for r in fake_readings(size, 4)]
+            ).encode('utf-8')
+            for name, compress, decompress in codecs:
+                compressed, compress_us = self.measure(compress, payload, options['repeat'])
+                _, decompress_us = self.measure(decompress, compressed, options['repeat'])
+                self.stdout.write(
+                    f"{size:>9}{name:>9}{len(payload):>11}{len(compressed):>10}"
+                    f"{len(payload) / len(compressed):>8.1f}x{compress_us:>13.0f}{decompress_us:>15.0f}"
+                )
@@ -0,0 +1,35 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from sensors.fleet import compute_fleet_stats
+
+
+class Command(BaseCommand):
+    help = 'Benchmark raportu floty: czas liczenia przy rosnącej liczbie procesów (bez zapisu raportu)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, nargs='+',
+                            default=sorted({1, 2, 4, 8, os.cpu_count() or 1}),
+                            help='Liczby procesów do porównania')
+        parser.add_argument('--repeat', type=int, default=3, help='Ile razy powtórzyć pomiar (liczy się najlepszy)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'Procesy':>8}{'Czas [s]':>10}{'Domy/s':>10}{'Przyspieszenie':>16}{'kWh':>14}")
+        # Ten sam moment końcowy we wszystkich przebiegach - wyniki muszą być identyczne
+        now = timezone.now()
+        baseline = None
+        for workers in options['workers']:
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                rows, _ = compute_fleet_stats(workers, now)
+                timings.append(time.perf_counter() - started)
+            best = min(timings)
+            baseline = baseline or best
+            total_kwh = sum(row['kwh'] for row in rows)
+            self.stdout.write(
+                f"{workers:>8}{best:>10.2f}{len(rows) / best:>10.1f}{baseline / best:>15.1f}x{total_kwh:>14.2f}"
+            )
@@ -0,0 +1,72 @@
+import io
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+
+from sensors.parsers import MessagePackParser, PackedReadingsParser, encode_packed_readings, msgpack
+from sensors.serializers import SensorReadingSerializer
+
+
+def fake_readings(count, sensors):
+    start = datetime.now(timezone.utc) - timedelta(seconds=count * 5)
+    return [
+        {
+            'sensor_id': f"sensor-{i % sensors}",
+            'timestamp': start + timedelta(seconds=5 * (i // sensors)),
+            'voltage': round(random.uniform(220.0, 240.0), 1),
+            'current': round(random.uniform(0.5, 10.0), 3),
+            'power': round(random.uniform(100.0, 2000.0), 1),
+            'energy': round(random.uniform(0.1, 5000.0), 3),
+            'frequency': round(random.uniform(49.8, 50.2), 1),
+            'pf': round(random.uniform(0.8, 1.0), 2),
+        }
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark formatów przyjmowania odczytów: bajty na odczyt i CPU parsowania + walidacji (bez bazy)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readings', type=int, default=1000, help='Liczba odczytów w paczce')
+        parser.add_argument('--sensors', type=int, default=4, help='Liczba czujników w paczce')
+        parser.add_argument('--repeat', type=int, default=20, help='Ile razy powtórzyć pomiar CPU')
+
+    def handle(self, *args, **options):
+        count = options['readings']
+        readings = fake_readings(count, options['sensors'])
+
+        def validate(data):
+            serializer = SensorReadingSerializer(data=data, many=True)
+            serializer.is_valid(raise_exception=True)
+            return serializer.validated_data
+
+        json_payload = json.dumps(
+            [{**r, 'timestamp': r['timestamp'].isoformat()} for r in readings]
+        ).encode('utf-8')
+        formats = [
+            ('JSON + serializer', json_payload,
+             lambda body: validate(JSONParser().parse(io.BytesIO(body)))),
+        ]
+        if msgpack is not None:
+            msgpack_payload = msgpack.packb(readings, datetime=True)
+            formats.append(('MessagePack + serializer', msgpack_payload,
+                            lambda body: validate(MessagePackParser().parse(io.BytesIO(body)))))
+        else:
+            self.stdout.write(self.style.WARNING("Brak pakietu msgpack - pomijam MessagePack."))
+        formats.append(('Packed (binarny)', encode_packed_readings(readings),
+                        lambda body: PackedReadingsParser().parse(io.BytesIO(body))))
+
+        self.stdout.write(f"Paczka: {count} odczytów, {options['sensors']} czujniki, powtórzeń: {options['repeat']}")
+        self.stdout.write(f"{'Format':<28}{'Bajty':>10}{'B/odczyt':>10}{'µs CPU/odczyt':>16}")
+        for name, payload, decode in formats:
+            decode(payload)  # rozgrzewka
+            started = time.process_time()
+            for _ in range(options['repeat']):
+                decode(payload)
+            cpu_us = (time.process_time() - started) / (options['repeat'] * count) * 1e6
+            self.stdout.write(f"{name:<28}{len(payload):>10}{len(payload) / count:>10.1f}{cpu_us:>16.2f}")
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from sensors.serializers import SensorReadingSerializer
+from sensors.validation import validate_readings
+
+from .bench_ingest_formats import fake_readings
+
+
+class Command(BaseCommand):
+    help = 'Benchmark walidacji paczek odczytów: SensorReadingSerializer vs validate_readings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                            help='Rozmiary paczek')
+        parser.add_argument('--repeat', type=int, default=5, help='Ile razy powtórzyć pomiar')
+
+    def handle(self, *args, **options):
+        def serializer_validate(data):
+            serializer = SensorReadingSerializer(data=data, many=True)
+            serializer.is_valid(raise_exception=True)
+            return serializer.validated_data
+
+        def fast_validate(data):
+            readings, errors = validate_readings(data)
+            assert errors is None
+            return readings
+
+        self.stdout.write(f"{'Odczytów':>10}{'Serializer [ms]':>18}{'Szybka [ms]':>14}{'Przyspieszenie':>16}")
+        for size in options['sizes']:
+            # Dane jak z JSONParser: znaczniki czasu jako napisy ISO
+            data = [{**r, 'timestamp': r['timestamp'].isoformat()} for r in fake_readings(size, 4)]
+            timings = []
+            for validate in (serializer_validate, fast_validate):
+                validate(data)  # rozgrzewka
+                started = time.perf_counter()
+                for _ in range(options['repeat']):
+                    validate(data)
+                timings.append((time.perf_counter() - started) / options['repeat'] * 1000)
+            self.stdout.write(
+                f"{size:>10}{timings[0]:>18.2f}{timings[1]:>14.2f}{timings[0] / timings[1]:>15.1f}x"
+            )
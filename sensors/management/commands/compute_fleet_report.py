@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from sensors.fleet import build_fleet_report
+
+
+class Command(BaseCommand):
+    help = 'Liczy statystyki wszystkich domów równolegle w procesach i zapisuje raport floty dla panelu administratora'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Liczba procesów (domyślnie FLEET_REPORT_WORKERS lub liczba rdzeni)')
+
+    def handle(self, *args, **options):
+        report = build_fleet_report(workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Raport floty: {report.total_houses} domów, {report.total_kwh:.2f} kWh w miesiącu, "
+            f"{report.workers} procesów, {report.duration_seconds:.2f} s"
+        ))
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from sensors.events import backfill_appliance_events
+from sensors.models import Sensor
+
+
+class Command(BaseCommand):
+    help = 'Wykrywa od nowa włączenia/wyłączenia urządzeń w historii odczytów (zastępuje zdarzenia z zakresu)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Ile ostatnich dni przetworzyć')
+        parser.add_argument('--sensor', type=int, action='append', help='ID czujnika (można podać kilka razy)')
+
+    def handle(self, *args, **options):
+        end = timezone.now()
+        start = end - timedelta(days=options['days'])
+        sensors = Sensor.objects.all()
+        if options['sensor']:
+            sensors = sensors.filter(id__in=options['sensor'])
+
+        for sensor in sensors:
+            found = backfill_appliance_events(sensor, start, end)
+            self.stdout.write(f"{sensor.name}: {found} zdarzeń")
+        self.stdout.write(self.style.SUCCESS("Zakończono."))
@@ -0,0 +1,55 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from sensors import ingest_buffer
+
+try:
+    import fcntl
+except ImportError:  # Windows - brak blokady pliku, uruchamiaj tylko jedną instancję
+    fcntl = None
+
+
+class Command(BaseCommand):
+    help = 'Przenosi odczyty z bufora zapisu (INGEST_MODE=buffered) do bazy - jeden proces zapisujący'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Opróżnij bufor i zakończ')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Ile odczytów na transakcję')
+        parser.add_argument('--interval', type=float, default=0.5, help='Przerwa [s] gdy bufor jest pusty')
+        parser.add_argument('--stats', action='store_true', help='Tylko wypisz metryki bufora')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for key, value in ingest_buffer.stats().items():
+                self.stdout.write(f"{key}: {value}")
+            return
+
+        lock_file = open(f"{settings.INGEST_BUFFER_PATH}.lock", 'w')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                raise CommandError("Inny proces już opróżnia bufor zapisu.")
+
+        self.stdout.write("Opróżnianie bufora zapisu uruchomione.")
+        try:
+            while True:
+                moved = ingest_buffer.drain(limit=options['batch_size'])
+                if moved:
+                    stats = ingest_buffer.stats()
+                    self.stdout.write(
+                        f"Przeniesiono {moved} odczytów (w buforze: {stats['depth']}, "
+                        f"opóźnienie: {stats['lag_seconds']} s)"
+                    )
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            lock_file.close()
+
+        self.stdout.write(self.style.SUCCESS("Opróżnianie bufora zakończone."))
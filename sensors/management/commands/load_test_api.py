@@ -0,0 +1,114 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+async def _read_response(reader):
+    """Czyta jedną odpowiedź HTTP/1.1. Zwraca (status, czy połączenie zostaje otwarte)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Serwer zamknął połączenie")
+    status = int(status_line.split()[1])
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif status not in (204, 304):
+        await reader.read()  # treść do końca połączenia
+        return status, False
+
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+async def _client(host, port, request, deadline, timeout, results):
+    reader = writer = None
+    while time.monotonic() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await asyncio.wait_for(_read_response(reader), timeout)
+            if status == 200 or status == 304:
+                results['latencies'].append(time.perf_counter() - started)
+            else:
+                results['errors'] += 1
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (OSError, ValueError, IndexError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            results['errors'] += 1
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+
+async def _run_level(host, port, request, concurrency, duration, timeout):
+    results = {'latencies': [], 'errors': 0}
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(
+        _client(host, port, request, deadline, timeout, results) for _ in range(concurrency)
+    ))
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        'Test obciążenia endpointu GET: przepustowość i opóźnienia przy rosnącej liczbie '
+        'równoległych połączeń (np. porównanie WSGI i ASGI/uvicorn dla /api/async/...)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Pełny adres, np. http://127.0.0.1:8000/api/async/user/houses/live/')
+        parser.add_argument('--token', help='Token DRF (nagłówek Authorization: Token ...)')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50, 100, 200],
+                            help='Liczby równoległych połączeń')
+        parser.add_argument('--duration', type=float, default=10.0, help='Czas pomiaru na poziom [s]')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Limit czasu żądania [s]')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError("Obsługiwane są tylko adresy http://")
+        path = url.path + (f"?{url.query}" if url.query else '')
+        headers = [f"GET {path} HTTP/1.1", f"Host: {url.netloc}", "Accept: application/json"]
+        if options['token']:
+            headers.append(f"Authorization: Token {options['token']}")
+        request = ("\r\n".join(headers) + "\r\n\r\n").encode('latin-1')
+
+        self.stdout.write(f"{'Połączeń':>9}{'Żądań':>9}{'Żądań/s':>10}{'p50 [ms]':>10}"
+                          f"{'p95 [ms]':>10}{'p99 [ms]':>10}{'Błędy':>8}")
+        for concurrency in options['concurrency']:
+            results = asyncio.run(_run_level(
+                url.hostname, url.port or 80, request, concurrency, options['duration'], options['timeout']
+            ))
+            latencies = sorted(results['latencies'])
+            if len(latencies) >= 2:
+                cuts = statistics.quantiles(latencies, n=100)
+                p50, p95, p99 = (cuts[49] * 1000, cuts[94] * 1000, cuts[98] * 1000)
+            else:
+                p50 = p95 = p99 = latencies[0] * 1000 if latencies else 0.0
+            self.stdout.write(
+                f"{concurrency:>9}{len(latencies):>9}{len(latencies) / options['duration']:>10.1f}"
+                f"{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{results['errors']:>8}"
+            )
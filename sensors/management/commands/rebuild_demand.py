@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from sensors.demand import update_demand
+from sensors.models import Sensor
+
+
+class Command(BaseCommand):
+    help = 'Przelicza z surowych odczytów moc 15-minutową i szczyty miesięczne (np. dla historii sprzed wdrożenia)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=62, help='Ile ostatnich dni przeliczyć')
+        parser.add_argument('--sensor', type=int, action='append', help='ID czujnika (można podać kilka razy)')
+
+    def handle(self, *args, **options):
+        end = timezone.now()
+        start = end - timedelta(days=options['days'])
+        sensors = Sensor.objects.all()
+        if options['sensor']:
+            sensors = sensors.filter(id__in=options['sensor'])
+
+        for sensor in sensors:
+            changed = update_demand(sensor, start, end)
+            self.stdout.write(f"{sensor.name}: zmienione okresy: {changed}")
+        self.stdout.write(self.style.SUCCESS("Zakończono."))
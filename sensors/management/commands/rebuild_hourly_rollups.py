@@ -0,0 +1,49 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from sensors.models import Sensor, SensorData
+from sensors.rollups import refresh_hourly_rollups
+
+
+class Command(BaseCommand):
+    help = 'Przelicza z surowych odczytów agregaty godzinowe (np. dla historii sprzed wdrożenia lub po przerwie)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='Pierwszy dzień RRRR-MM-DD (domyślnie dzień pierwszego odczytu)')
+        parser.add_argument('--to', dest='date_to', help='Ostatni dzień RRRR-MM-DD (domyślnie dziś)')
+        parser.add_argument('--sensor', type=int, action='append', help='ID czujnika (można podać kilka razy)')
+
+    def _day(self, value, name):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Niepoprawna data {name} (oczekiwano RRRR-MM-DD): {value}")
+
+    def handle(self, *args, **options):
+        sensors = Sensor.objects.all()
+        if options['sensor']:
+            sensors = sensors.filter(id__in=options['sensor'])
+
+        date_to = self._day(options['date_to'], '--to') if options['date_to'] else timezone.localdate()
+        if options['date_from']:
+            date_from = self._day(options['date_from'], '--from')
+        else:
+            first = SensorData.objects.filter(sensor__in=sensors).order_by('timestamp').values_list(
+                'timestamp', flat=True
+            ).first()
+            if first is None:
+                self.stdout.write("Brak odczytów.")
+                return
+            date_from = timezone.localdate(first)
+        if date_from > date_to:
+            raise CommandError("--from nie może być późniejsze niż --to.")
+
+        # Koniec: ostatnia chwila dnia --to (refresh_hourly_rollups obejmuje godzinę końca)
+        end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min)) - timedelta(microseconds=1)
+        start = timezone.make_aware(datetime.combine(date_from, time.min))
+        for sensor in sensors:
+            saved = refresh_hourly_rollups(start, end, sensor_ids=[sensor.id])
+            self.stdout.write(f"{sensor.name}: agregatów: {saved}")
+        self.stdout.write(self.style.SUCCESS(f"Zakończono ({date_from} - {date_to})."))
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from sensors.models import Sensor
+from sensors.power_quality import rebuild_power_quality
+
+
+class Command(BaseCommand):
+    help = 'Przelicza z surowych odczytów dzienne podsumowania jakości zasilania (np. dla historii sprzed wdrożenia)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Ile ostatnich dni przeliczyć')
+        parser.add_argument('--sensor', type=int, action='append', help='ID czujnika (można podać kilka razy)')
+
+    def handle(self, *args, **options):
+        end = timezone.now()
+        start = end - timedelta(days=options['days'] - 1)
+        sensors = Sensor.objects.all()
+        if options['sensor']:
+            sensors = sensors.filter(id__in=options['sensor'])
+
+        for sensor in sensors:
+            rebuild_power_quality(sensor, start, end)
+            self.stdout.write(f"{sensor.name}: przeliczono {options['days']} dni")
+        self.stdout.write(self.style.SUCCESS("Zakończono."))
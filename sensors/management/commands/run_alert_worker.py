@@ -0,0 +1,73 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from sensors.ingest import process_pending_batches
+from sensors.notifications import dispatch_alert_emails
+from sensors.scheduler import hold_lease, instance_owner, release_lease
+
+# Nazwa dzierżawy w ScheduledJob - stan alertów (progi, anomalie, zdarzenia)
+# jest w pamięci procesu, więc kolejkę może przetwarzać tylko jedna instancja
+LEASE_NAME = 'run_alert_worker'
+
+
+class Command(BaseCommand):
+    help = (
+        'Przetwarza w tle kolejkę nowych odczytów: sprawdza alerty i wysyła powiadomienia. '
+        'Można uruchomić kilka instancji - pracuje ta, która ma dzierżawę, pozostałe czekają.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Opróżnij kolejkę i zakończ')
+        parser.add_argument('--batch-size', type=int, default=500, help='Ile paczek pobierać naraz')
+        parser.add_argument('--interval', type=float, default=1.0, help='Przerwa [s] gdy kolejka jest pusta')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        email_interval = settings.ALERT_EMAIL_DISPATCH_INTERVAL
+        lease_seconds = settings.ALERT_WORKER_LEASE_SECONDS
+        owner = instance_owner()
+        last_dispatch = 0.0
+        standby = False
+        self.stdout.write(f"Worker alertów uruchomiony ({owner}).")
+
+        try:
+            while True:
+                if not hold_lease(LEASE_NAME, owner, lease_seconds):
+                    if options['once']:
+                        raise CommandError("Kolejkę przetwarza teraz inna instancja workera.")
+                    if not standby:
+                        self.stdout.write("Kolejkę przetwarza inna instancja - czekam na dzierżawę.")
+                        standby = True
+                    time.sleep(min(lease_seconds / 4, 15))
+                    continue
+                if standby:
+                    self.stdout.write("Przejęto dzierżawę kolejki.")
+                    standby = False
+
+                # Jeden przebieg może trwać dłużej niż dzierżawa (np. zasilenie detektora
+                # anomalii historią) - przedłużamy ją przed każdym czujnikiem
+                processed = process_pending_batches(
+                    limit=batch_size, keep_lease=lambda: hold_lease(LEASE_NAME, owner, lease_seconds)
+                )
+                if processed:
+                    self.stdout.write(f"Przetworzono paczek: {processed}")
+
+                if options['once'] or time.monotonic() - last_dispatch >= email_interval:
+                    sent = dispatch_alert_emails()
+                    last_dispatch = time.monotonic()
+                    if sent:
+                        self.stdout.write(f"Wysłano maili: {sent}")
+
+                if processed:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            release_lease(LEASE_NAME, owner)
+
+        self.stdout.write(self.style.SUCCESS("Worker alertów zatrzymany."))
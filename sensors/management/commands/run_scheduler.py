@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from sensors.models import ScheduledJob
+from sensors.scheduler import Scheduler, claim, configured_jobs, run_job, sync_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Harmonogram zadań okresowych (sprawdzanie offline, agregaty, raport floty, '
+        'rozgrzewanie cache, retencja). Można uruchomić kilka instancji - zadanie '
+        'wykonuje tylko ta, która przejmie jego dzierżawę.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--list', action='store_true', help='Wypisz zadania i ich stan')
+        parser.add_argument('--run', metavar='ZADANIE', help='Wykonaj od razu jedno zadanie (z dzierżawą) i zakończ')
+        parser.add_argument('--once', action='store_true', help='Wykonaj zadania, których termin minął, i zakończ')
+
+    def handle(self, *args, **options):
+        jobs = configured_jobs()
+        sync_jobs(jobs)
+
+        if options['list']:
+            for state in ScheduledJob.objects.filter(name__in=[job.name for job in jobs]):
+                last_success = timezone.localtime(state.last_success_at).strftime('%Y-%m-%d %H:%M:%S') if state.last_success_at else '-'
+                self.stdout.write(
+                    f"{state.name:<26} {state.schedule:<32} następne: "
+                    f"{timezone.localtime(state.next_run_at):%Y-%m-%d %H:%M:%S}  sukces: {last_success}"
+                    f"{'  [WYŁĄCZONE]' if not state.is_enabled else ''}"
+                )
+            return
+
+        scheduler = Scheduler(jobs)
+        if options['run']:
+            job = scheduler.jobs.get(options['run'])
+            if job is None:
+                raise CommandError(f"Nieznane zadanie: {options['run']}")
+            if not claim(job, scheduler.owner, force=True):
+                raise CommandError(f"Zadanie '{job.name}' wykonuje teraz inna instancja.")
+            run_job(job, scheduler.owner)
+            state = ScheduledJob.objects.get(name=job.name)
+            if state.last_error:
+                raise CommandError(f"Zadanie '{job.name}' zakończyło się błędem:\n{state.last_error}")
+            self.stdout.write(self.style.SUCCESS(f"{job.name}: {state.last_result} ({state.last_duration_seconds:.2f} s)"))
+            return
+
+        if options['once']:
+            started = scheduler.run_pending()
+            scheduler.stop()
+            self.stdout.write(self.style.SUCCESS(f"Wykonane zadania: {', '.join(started) or 'brak'}"))
+            return
+
+        self.stdout.write(f"Harmonogram uruchomiony ({scheduler.owner}), zadania: {', '.join(scheduler.jobs)}")
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            scheduler.stop()
+        self.stdout.write(self.style.SUCCESS("Harmonogram zatrzymany."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from sensors.notifications import dispatch_alert_emails
+
+
+class Command(BaseCommand):
+    help = 'Wysyła oczekujące alerty email (natychmiastowe i zbiorcze wg ustawień użytkowników)'
+
+    def handle(self, *args, **options):
+        sent = dispatch_alert_emails()
+        self.stdout.write(self.style.SUCCESS(f"Wysłano maili: {sent}"))
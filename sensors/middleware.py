@@ -0,0 +1,172 @@
+"""
+Kompresja treści API w obu kierunkach.
+
+RequestDecompressionMiddleware - żądania z Content-Encoding: gzip/zstd są
+rozpakowywane strumieniowo (widok czyta już rozpakowane dane, także linia po
+linii jak przy NDJSON). Rozpakowana treść ponad limit kończy się 413 -
+zabezpieczenie przed "bombami" kompresji. Limit jest taki sam jak dla treści
+nieskompresowanej (DATA_UPLOAD_MAX_MEMORY_SIZE), bo widok i tak trzyma ją
+w pamięci. Wyjątkiem są widoki czytające żądanie strumieniowo
+(STREAMING_URL_NAMES) - dla nich limitem jest REQUEST_MAX_DECOMPRESSED_BYTES.
+
+ResponseCompressionMiddleware - odpowiedzi API większe niż
+RESPONSE_COMPRESSION_MIN_BYTES są kompresowane zgodnie z Accept-Encoding
+(zstd, jeśli klient go przyjmuje i pakiet jest zainstalowany, inaczej gzip).
+
+zstd wymaga opcjonalnego pakietu zstandard.
+"""
+import gzip
+import io
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+from django.utils.text import compress_string
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError
+
+try:
+    import zstandard
+except ImportError:  # zstd jest opcjonalny - bez pakietu obsługujemy tylko gzip
+    zstandard = None
+
+API_PREFIX = '/api/'
+# Widoki czytające treść żądania strumieniowo (bez wczytywania całości do pamięci)
+STREAMING_URL_NAMES = {'receive-sensor-readings-stream'}
+DECOMPRESSION_ERRORS = (OSError, EOFError, zlib.error) + ((zstandard.ZstdError,) if zstandard else ())
+
+_accepts_gzip = _lazy_re_compile(r'\bgzip\b')
+_accepts_zstd = _lazy_re_compile(r'\bzstd\b')
+
+
+class RequestBodyTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Rozpakowana treść żądania jest za duża."
+    default_code = 'request_too_large'
+
+
+class _DecompressingReader(io.RawIOBase):
+    """Strumień rozpakowanych danych z limitem rozmiaru."""
+
+    def __init__(self, reader, limit):
+        self._reader = reader
+        self._limit = limit
+        self._total = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        try:
+            data = self._reader.read(len(buffer))
+        except DECOMPRESSION_ERRORS as exc:
+            raise ParseError(f"Niepoprawne skompresowane dane: {exc}")
+        self._total += len(data)
+        if self._total > self._limit:
+            raise RequestBodyTooLarge()
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _decompressed_limit(request):
+    try:
+        url_name = resolve(request.path_info, getattr(request, 'urlconf', None)).url_name
+    except Resolver404:
+        url_name = None
+    if url_name in STREAMING_URL_NAMES:
+        return settings.REQUEST_MAX_DECOMPRESSED_BYTES
+    # None w DATA_UPLOAD_MAX_MEMORY_SIZE wyłącza limit Django - rozpakowaną treść i tak ograniczamy
+    return settings.DATA_UPLOAD_MAX_MEMORY_SIZE or settings.REQUEST_MAX_DECOMPRESSED_BYTES
+
+
+def _decompressing_stream(encoding, stream, limit):
+    if encoding == 'gzip':
+        reader = gzip.GzipFile(fileobj=stream, mode='rb')
+    else:
+        reader = zstandard.ZstdDecompressor().stream_reader(stream)
+    raw = _DecompressingReader(reader, limit)
+    return io.BufferedReader(raw, buffer_size=64 * 1024)
+
+
+class _SyncAndAsyncMiddleware:
+    """Baza middleware działającego bez przełączania wątków pod WSGI i ASGI."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.process_request(request)
+        if response is None:
+            response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        response = self.process_request(request)
+        if response is None:
+            response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_request(self, request):
+        return None
+
+    def process_response(self, request, response):
+        return response
+
+
+class RequestDecompressionMiddleware(_SyncAndAsyncMiddleware):
+    def process_request(self, request):
+        encoding = request.META.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if encoding and encoding != 'identity' and request.path.startswith(API_PREFIX):
+            if encoding not in ('gzip', 'zstd') or (encoding == 'zstd' and zstandard is None):
+                return JsonResponse(
+                    {"error": f"Nieobsługiwane Content-Encoding: {encoding}."},
+                    status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+                )
+            # CONTENT_LENGTH zostaje (rozmiar skompresowany) - limit rozpakowanej
+            # treści pilnuje _DecompressingReader
+            request._stream = _decompressing_stream(encoding, request._stream, _decompressed_limit(request))
+            del request.META['HTTP_CONTENT_ENCODING']
+        return None
+
+
+class ResponseCompressionMiddleware(_SyncAndAsyncMiddleware):
+    def process_response(self, request, response):
+        if not request.path.startswith(API_PREFIX) or response.streaming:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.has_header('Content-Encoding') or len(response.content) < settings.RESPONSE_COMPRESSION_MIN_BYTES:
+            return response
+
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if zstandard is not None and _accepts_zstd.search(accept_encoding):
+            encoding = 'zstd'
+            compressed = zstandard.ZstdCompressor(level=settings.RESPONSE_ZSTD_LEVEL).compress(response.content)
+        elif _accepts_gzip.search(accept_encoding):
+            encoding = 'gzip'
+            compressed = compress_string(response.content)
+        else:
+            return response
+
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # Skompresowana treść to inna reprezentacja - ETag staje się słaby (jak w GZipMiddleware)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0004_alter_alert_alert_type_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnergyPeriodCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateTimeField(verbose_name='Początek okresu')),
+                ('period_end', models.DateTimeField(verbose_name='Koniec okresu')),
+                ('kwh', models.FloatField(verbose_name='Energia [kWh]')),
+                ('computed_at', models.DateTimeField(auto_now=True, verbose_name='Obliczono')),
+                ('house', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='energy_cache', to='sensors.house')),
+                ('sensor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='energy_cache', to='sensors.sensor')),
+            ],
+            options={
+                'verbose_name': 'Zużycie okresu (cache)',
+                'verbose_name_plural': 'Zużycie okresów (cache)',
+                'constraints': [models.UniqueConstraint(condition=models.Q(('sensor__isnull', True)), fields=('house', 'period_start', 'period_end'), name='unique_house_energy_period'), models.UniqueConstraint(condition=models.Q(('sensor__isnull', False)), fields=('sensor', 'period_start', 'period_end'), name='unique_sensor_energy_period')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0005_energyperiodcache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingReadingBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ts_from', models.DateTimeField(verbose_name='Pierwszy odczyt')),
+                ('ts_to', models.DateTimeField(verbose_name='Ostatni odczyt')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Dodano')),
+                ('sensor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_batches', to='sensors.sensor')),
+            ],
+            options={
+                'verbose_name': 'Paczka odczytów w kolejce',
+                'verbose_name_plural': 'Paczki odczytów w kolejce',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0006_pendingreadingbatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='email_pending',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='Email w kolejce'),
+        ),
+        migrations.AddField(
+            model_name='usersettings',
+            name='last_alert_email_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Ostatni email z alertami'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:25
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_readings(apps, schema_editor):
+    """Usuwa zdublowane pomiary (ten sam czujnik i czas), zostawia najstarszy wiersz."""
+    SensorData = apps.get_model('sensors', 'SensorData')
+    duplicates = (
+        SensorData.objects.values('sensor_id', 'timestamp')
+        .annotate(count=Count('id'), keep_id=Min('id'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        SensorData.objects.filter(
+            sensor_id=duplicate['sensor_id'],
+            timestamp=duplicate['timestamp'],
+        ).exclude(id=duplicate['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0007_alert_email_pending'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_readings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='sensordata',
+            constraint=models.UniqueConstraint(fields=('sensor', 'timestamp'), name='unique_sensor_timestamp'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0008_sensordata_unique_sensor_timestamp'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackfillUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('upload_id', models.CharField(max_length=64, unique=True, verbose_name='ID wgrywania')),
+                ('received_count', models.PositiveIntegerField(default=0, verbose_name='Odebrane odczyty')),
+                ('created_count', models.PositiveIntegerField(default=0, verbose_name='Zapisane odczyty')),
+                ('duplicate_count', models.PositiveIntegerField(default=0, verbose_name='Duplikaty')),
+                ('ts_from', models.DateTimeField(blank=True, null=True, verbose_name='Najstarszy odczyt')),
+                ('ts_to', models.DateTimeField(blank=True, null=True, verbose_name='Najnowszy odczyt')),
+                ('is_complete', models.BooleanField(default=False, verbose_name='Zakończone')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Rozpoczęto')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Ostatni fragment')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='backfill_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Wgrywanie zaległych danych',
+                'verbose_name_plural': 'Wgrywania zaległych danych',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0009_backfillupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=40, unique=True, verbose_name='Klucz')),
+                ('name', models.CharField(max_length=100, verbose_name='Nazwa urządzenia')),
+                ('require_signature', models.BooleanField(default=False, help_text='Paczki bez poprawnego podpisu będą odrzucane', verbose_name='Wymagaj podpisu HMAC')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Aktywny')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Data utworzenia')),
+                ('revoked_at', models.DateTimeField(blank=True, null=True, verbose_name='Unieważniono')),
+                ('sensors', models.ManyToManyField(related_name='device_keys', to='sensors.sensor', verbose_name='Czujniki')),
+            ],
+            options={
+                'verbose_name': 'Klucz urządzenia',
+                'verbose_name_plural': 'Klucze urządzeń',
+                'ordering': ['name'],
+            },
+        ),
+    ]
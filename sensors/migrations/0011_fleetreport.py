@@ -0,0 +1,60 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0010_devicekey'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FleetReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateTimeField(verbose_name='Początek miesiąca')),
+                ('period_end', models.DateTimeField(verbose_name='Stan na')),
+                ('previous_period_start', models.DateTimeField(verbose_name='Początek poprzedniego miesiąca')),
+                ('total_houses', models.PositiveIntegerField(default=0, verbose_name='Domy')),
+                ('total_sensors', models.PositiveIntegerField(default=0, verbose_name='Czujniki')),
+                ('online_sensors', models.PositiveIntegerField(default=0, verbose_name='Czujniki online')),
+                ('total_kwh', models.FloatField(default=0, verbose_name='Energia w miesiącu [kWh]')),
+                ('total_cost', models.FloatField(default=0, verbose_name='Koszt w miesiącu [zł]')),
+                ('previous_kwh', models.FloatField(default=0, verbose_name='Energia w poprzednim miesiącu [kWh]')),
+                ('workers', models.PositiveSmallIntegerField(default=1, verbose_name='Procesy')),
+                ('duration_seconds', models.FloatField(default=0, verbose_name='Czas liczenia [s]')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Utworzono')),
+            ],
+            options={
+                'verbose_name': 'Raport floty',
+                'verbose_name_plural': 'Raporty floty',
+                'ordering': ['-period_end'],
+            },
+        ),
+        migrations.CreateModel(
+            name='FleetHouseStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sensors', models.PositiveIntegerField(default=0, verbose_name='Czujniki')),
+                ('online_sensors', models.PositiveIntegerField(default=0, verbose_name='Czujniki online')),
+                ('readings', models.PositiveIntegerField(default=0, verbose_name='Odczyty w miesiącu')),
+                ('kwh', models.FloatField(default=0, verbose_name='Energia w miesiącu [kWh]')),
+                ('cost', models.FloatField(default=0, verbose_name='Koszt w miesiącu [zł]')),
+                ('previous_kwh', models.FloatField(default=0, verbose_name='Energia w poprzednim miesiącu [kWh]')),
+                ('house', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fleet_stats', to='sensors.house')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fleet_stats', to=settings.AUTH_USER_MODEL)),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='houses', to='sensors.fleetreport')),
+            ],
+            options={
+                'verbose_name': 'Statystyka domu w raporcie floty',
+                'verbose_name_plural': 'Statystyki domów w raporcie floty',
+                'ordering': ['-kwh'],
+                'constraints': [models.UniqueConstraint(fields=('report', 'house'), name='unique_fleet_report_house')],
+            },
+        ),
+    ]
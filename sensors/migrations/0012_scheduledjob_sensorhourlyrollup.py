@@ -0,0 +1,61 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0011_fleetreport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Zadanie')),
+                ('schedule', models.CharField(blank=True, max_length=100, verbose_name='Harmonogram')),
+                ('is_enabled', models.BooleanField(default=True, verbose_name='Włączone')),
+                ('next_run_at', models.DateTimeField(blank=True, null=True, verbose_name='Następne uruchomienie')),
+                ('lease_owner', models.CharField(blank=True, max_length=200, verbose_name='Wykonuje')),
+                ('lease_expires_at', models.DateTimeField(blank=True, null=True, verbose_name='Dzierżawa do')),
+                ('last_started_at', models.DateTimeField(blank=True, null=True, verbose_name='Ostatni start')),
+                ('last_finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Ostatni koniec')),
+                ('last_success_at', models.DateTimeField(blank=True, null=True, verbose_name='Ostatni sukces')),
+                ('last_duration_seconds', models.FloatField(blank=True, null=True, verbose_name='Czas wykonania [s]')),
+                ('last_result', models.CharField(blank=True, max_length=255, verbose_name='Wynik')),
+                ('last_error', models.TextField(blank=True, verbose_name='Ostatni błąd')),
+                ('run_count', models.PositiveIntegerField(default=0, verbose_name='Wykonania')),
+                ('failure_count', models.PositiveIntegerField(default=0, verbose_name='Błędy')),
+            ],
+            options={
+                'verbose_name': 'Zadanie okresowe',
+                'verbose_name_plural': 'Zadania okresowe',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SensorHourlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour_start', models.DateTimeField(verbose_name='Początek godziny')),
+                ('readings', models.PositiveIntegerField(default=0, verbose_name='Odczyty')),
+                ('kwh', models.FloatField(default=0, verbose_name='Energia [kWh]')),
+                ('avg_power', models.FloatField(blank=True, null=True, verbose_name='Średnia moc [W]')),
+                ('max_power', models.FloatField(blank=True, null=True, verbose_name='Maks. moc [W]')),
+                ('min_voltage', models.FloatField(blank=True, null=True, verbose_name='Min. napięcie [V]')),
+                ('max_voltage', models.FloatField(blank=True, null=True, verbose_name='Maks. napięcie [V]')),
+                ('avg_pf', models.FloatField(blank=True, null=True, verbose_name='Średni współczynnik mocy')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Przeliczono')),
+                ('sensor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_rollups', to='sensors.sensor')),
+            ],
+            options={
+                'verbose_name': 'Agregat godzinowy',
+                'verbose_name_plural': 'Agregaty godzinowe',
+                'ordering': ['sensor', 'hour_start'],
+                'constraints': [models.UniqueConstraint(fields=('sensor', 'hour_start'), name='unique_sensor_hourly_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0012_scheduledjob_sensorhourlyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PowerQualityDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Dzień')),
+                ('readings', models.PositiveIntegerField(default=0, verbose_name='Odczyty')),
+                ('covered_seconds', models.FloatField(default=0, verbose_name='Czas pomiarów [s]')),
+                ('voltage_outside_seconds', models.FloatField(default=0, verbose_name='Napięcie poza pasmem [s]')),
+                ('frequency_outside_seconds', models.FloatField(default=0, verbose_name='Częstotliwość poza pasmem [s]')),
+                ('voltage_sketch', models.JSONField(default=dict, verbose_name='Szkic napięcia')),
+                ('frequency_sketch', models.JSONField(default=dict, verbose_name='Szkic częstotliwości')),
+                ('pf_histogram', models.JSONField(default=list, verbose_name='Histogram współczynnika mocy')),
+                ('last_timestamp', models.DateTimeField(blank=True, null=True, verbose_name='Ostatni uwzględniony odczyt')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Zaktualizowano')),
+                ('sensor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='power_quality_days', to='sensors.sensor')),
+            ],
+            options={
+                'verbose_name': 'Jakość zasilania (dzień)',
+                'verbose_name_plural': 'Jakość zasilania (dni)',
+                'ordering': ['sensor', 'day'],
+                'constraints': [models.UniqueConstraint(fields=('sensor', 'day'), name='unique_sensor_power_quality_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0013_powerqualitydaily'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplianceEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('on', 'Włączenie'), ('off', 'Wyłączenie')], max_length=3, verbose_name='Rodzaj')),
+                ('started_at', models.DateTimeField(verbose_name='Początek zmiany')),
+                ('ended_at', models.DateTimeField(verbose_name='Koniec zmiany')),
+                ('delta_power', models.FloatField(verbose_name='ΔP [W]')),
+                ('delta_reactive_power', models.FloatField(verbose_name='ΔQ [VAR]')),
+                ('power_before', models.FloatField(verbose_name='Moc przed [W]')),
+                ('power_after', models.FloatField(verbose_name='Moc po [W]')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Wykryto')),
+                ('sensor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='appliance_events', to='sensors.sensor')),
+            ],
+            options={
+                'verbose_name': 'Zdarzenie urządzenia',
+                'verbose_name_plural': 'Zdarzenia urządzeń',
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['sensor', 'started_at'], name='sensors_app_sensor__0da486_idx')],
+                'constraints': [models.UniqueConstraint(fields=('sensor', 'ended_at'), name='unique_sensor_appliance_event')],
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0014_applianceevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HouseDemandInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('interval_start', models.DateTimeField(verbose_name='Początek okresu')),
+                ('energy_wh', models.FloatField(default=0, verbose_name='Energia [Wh]')),
+                ('avg_power', models.FloatField(default=0, verbose_name='Średnia moc [W]')),
+                ('house', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='demand_intervals', to='sensors.house')),
+            ],
+            options={
+                'verbose_name': 'Moc 15-minutowa domu',
+                'verbose_name_plural': 'Moce 15-minutowe domów',
+                'constraints': [models.UniqueConstraint(fields=('house', 'interval_start'), name='unique_house_demand_interval')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyPeak',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Miesiąc')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Miejsce')),
+                ('interval_start', models.DateTimeField(verbose_name='Początek okresu')),
+                ('avg_power', models.FloatField(verbose_name='Średnia moc [W]')),
+                ('contributors', models.JSONField(blank=True, default=list, verbose_name='Udział czujników')),
+                ('house', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_peaks', to='sensors.house')),
+                ('sensor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='monthly_peaks', to='sensors.sensor')),
+            ],
+            options={
+                'verbose_name': 'Szczyt miesięczny',
+                'verbose_name_plural': 'Szczyty miesięczne',
+                'ordering': ['house', 'month', 'rank'],
+                'indexes': [models.Index(fields=['house', 'month', 'rank'], name='sensors_mon_house_i_554788_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SensorDemandInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('interval_start', models.DateTimeField(verbose_name='Początek okresu')),
+                ('energy_wh', models.FloatField(default=0, verbose_name='Energia [Wh]')),
+                ('avg_power', models.FloatField(default=0, verbose_name='Średnia moc [W]')),
+                ('sensor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='demand_intervals', to='sensors.sensor')),
+            ],
+            options={
+                'verbose_name': 'Moc 15-minutowa czujnika',
+                'verbose_name_plural': 'Moce 15-minutowe czujników',
+                'constraints': [models.UniqueConstraint(fields=('sensor', 'interval_start'), name='unique_sensor_demand_interval')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0015_demand_intervals_monthly_peaks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensor',
+            name='alert_cooldown_seconds',
+            field=models.PositiveIntegerField(default=600, help_text='Min. odstęp między kolejnymi alertami tej samej reguły', verbose_name='Przerwa między alertami [s]'),
+        ),
+        migrations.AddField(
+            model_name='sensor',
+            name='alert_duration_seconds',
+            field=models.PositiveIntegerField(default=0, help_text='Alert mocy/prądu dopiero gdy próg jest przekroczony przez tyle sekund (0 = od razu)', verbose_name='Czas trwania [s]'),
+        ),
+        migrations.AddField(
+            model_name='sensor',
+            name='current_clear_threshold',
+            field=models.FloatField(blank=True, help_text='Alert prądu kończy się, gdy prąd spadnie do tej wartości (puste = 90% progu)', null=True, verbose_name='Próg zwolnienia prądu [A]'),
+        ),
+        migrations.AddField(
+            model_name='sensor',
+            name='power_clear_threshold',
+            field=models.FloatField(blank=True, help_text='Alert mocy kończy się, gdy moc spadnie do tej wartości (puste = 90% progu)', null=True, verbose_name='Próg zwolnienia mocy [W]'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0016_sensor_alert_duration_hysteresis'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensorhourlyrollup',
+            name='max_current',
+            field=models.FloatField(blank=True, null=True, verbose_name='Maks. prąd [A]'),
+        ),
+    ]
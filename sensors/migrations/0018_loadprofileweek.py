@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0017_sensorhourlyrollup_max_current'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoadProfileWeek',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_start', models.DateField(verbose_name='Poniedziałek tygodnia')),
+                ('cells', models.JSONField(verbose_name='Komórki')),
+                ('computed_at', models.DateTimeField(auto_now=True, verbose_name='Obliczono')),
+                ('house', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='load_profile_weeks', to='sensors.house')),
+                ('sensor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='load_profile_weeks', to='sensors.sensor')),
+            ],
+            options={
+                'verbose_name': 'Tydzień profilu zużycia (cache)',
+                'verbose_name_plural': 'Tygodnie profilu zużycia (cache)',
+                'constraints': [models.UniqueConstraint(condition=models.Q(('sensor__isnull', True)), fields=('house', 'week_start'), name='unique_house_load_profile_week'), models.UniqueConstraint(condition=models.Q(('sensor__isnull', False)), fields=('sensor', 'week_start'), name='unique_sensor_load_profile_week')],
+            },
+        ),
+    ]
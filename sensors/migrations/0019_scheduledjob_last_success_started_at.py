@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:45
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def fill_last_success_started_at(apps, schema_editor):
+    """
+    Start ostatniego sukcesu z dotychczasowych pól. Gdy ostatni przebieg się
+    nie udał, last_duration_seconds dotyczy błędu - cofamy się wtedy co
+    najmniej o godzinę (przeliczenie godziny za dużo niczego nie psuje).
+    """
+    ScheduledJob = apps.get_model('sensors', 'ScheduledJob')
+    for job in ScheduledJob.objects.filter(last_success_at__isnull=False):
+        duration = job.last_duration_seconds or 0
+        if job.last_error:
+            duration = max(duration, 3600)
+        job.last_success_started_at = job.last_success_at - timedelta(seconds=duration)
+        job.save(update_fields=['last_success_started_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0018_loadprofileweek'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduledjob',
+            name='last_success_started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Start ostatniego sukcesu'),
+        ),
+        migrations.RunPython(fill_last_success_started_at, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,5 @@
+import secrets
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -97,6 +99,30 @@ class Sensor(models.Model):
         help_text="Alert gdy napięcie wzrośnie powyżej tej wartości"
     )
     
+    # Histereza i czas trwania dla progów mocy i prądu (sensors.alert_rules)
+    power_clear_threshold = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name="Próg zwolnienia mocy [W]",
+        help_text="Alert mocy kończy się, gdy moc spadnie do tej wartości (puste = 90% progu)"
+    )
+    current_clear_threshold = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name="Próg zwolnienia prądu [A]",
+        help_text="Alert prądu kończy się, gdy prąd spadnie do tej wartości (puste = 90% progu)"
+    )
+    alert_duration_seconds = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Czas trwania [s]",
+        help_text="Alert mocy/prądu dopiero gdy próg jest przekroczony przez tyle sekund (0 = od razu)"
+    )
+    alert_cooldown_seconds = models.PositiveIntegerField(
+        default=600,
+        verbose_name="Przerwa między alertami [s]",
+        help_text="Min. odstęp między kolejnymi alertami tej samej reguły"
+    )
+
     # Zmieniam domyślny czas na 30 sekund, zgodnie z Twoją prośbą o "5 sekund"
     offline_threshold_seconds = models.PositiveIntegerField(
         default=30, # Domyślnie 30 sekund
@@ -153,6 +179,10 @@ class SensorData(models.Model):
             models.Index(fields=['sensor', '-timestamp']),
             models.Index(fields=['timestamp']),
         ]
+        constraints = [
+            # Ponowione wysyłki z bramek nie mogą dublować pomiarów
+            models.UniqueConstraint(fields=['sensor', 'timestamp'], name='unique_sensor_timestamp'),
+        ]
 
     def __str__(self):
         return f"{self.sensor.name} @ {self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
@@ -165,6 +195,451 @@ class SensorData(models.Model):
         return 0
 
 
+class EnergyPeriodCache(models.Model):
+    """
+    Zapamiętane zużycie energii [kWh] dla zamkniętego okresu.
+
+    Wiersz z sensor=None dotyczy całego domu. Wpisy są ważne bezterminowo,
+    usuwane tylko gdy w okres trafią spóźnione odczyty.
+    """
+    house = models.ForeignKey(House, on_delete=models.CASCADE, related_name='energy_cache')
+    sensor = models.ForeignKey(
+        Sensor,
+        on_delete=models.CASCADE,
+        related_name='energy_cache',
+        null=True,
+        blank=True
+    )
+    period_start = models.DateTimeField(verbose_name="Początek okresu")
+    period_end = models.DateTimeField(verbose_name="Koniec okresu")
+    kwh = models.FloatField(verbose_name="Energia [kWh]")
+    computed_at = models.DateTimeField(auto_now=True, verbose_name="Obliczono")
+
+    class Meta:
+        verbose_name = "Zużycie okresu (cache)"
+        verbose_name_plural = "Zużycie okresów (cache)"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['house', 'period_start', 'period_end'],
+                condition=models.Q(sensor__isnull=True),
+                name='unique_house_energy_period'
+            ),
+            models.UniqueConstraint(
+                fields=['sensor', 'period_start', 'period_end'],
+                condition=models.Q(sensor__isnull=False),
+                name='unique_sensor_energy_period'
+            ),
+        ]
+
+    def __str__(self):
+        target = self.sensor.name if self.sensor else self.house.name
+        return f"{target}: {self.period_start:%Y-%m-%d %H:%M} - {self.period_end:%Y-%m-%d %H:%M} = {self.kwh:.2f} kWh"
+
+
+class PendingReadingBatch(models.Model):
+    """
+    Kolejka (w bazie) nowo zapisanych odczytów do przetworzenia w tle.
+
+    Jeden wiersz = zakres czasu odczytów jednego czujnika z jednego żądania.
+    Zapisywany w tej samej transakcji co odczyty, konsumowany przez
+    polecenie run_alert_worker.
+    """
+    sensor = models.ForeignKey(Sensor, on_delete=models.CASCADE, related_name='pending_batches')
+    ts_from = models.DateTimeField(verbose_name="Pierwszy odczyt")
+    ts_to = models.DateTimeField(verbose_name="Ostatni odczyt")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Dodano")
+
+    class Meta:
+        verbose_name = "Paczka odczytów w kolejce"
+        verbose_name_plural = "Paczki odczytów w kolejce"
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.sensor_id}: {self.ts_from:%Y-%m-%d %H:%M:%S} - {self.ts_to:%H:%M:%S}"
+
+
+class BackfillUpload(models.Model):
+    """
+    Wznawialne wgrywanie zaległych odczytów (po długim offline czujnika).
+
+    Klient wysyła kolejne fragmenty z offsetem; received_count to offset,
+    od którego należy kontynuować po przerwanym wgrywaniu.
+    """
+    upload_id = models.CharField(max_length=64, unique=True, verbose_name="ID wgrywania")
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='backfill_uploads')
+    received_count = models.PositiveIntegerField(default=0, verbose_name="Odebrane odczyty")
+    created_count = models.PositiveIntegerField(default=0, verbose_name="Zapisane odczyty")
+    duplicate_count = models.PositiveIntegerField(default=0, verbose_name="Duplikaty")
+    ts_from = models.DateTimeField(null=True, blank=True, verbose_name="Najstarszy odczyt")
+    ts_to = models.DateTimeField(null=True, blank=True, verbose_name="Najnowszy odczyt")
+    is_complete = models.BooleanField(default=False, verbose_name="Zakończone")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Rozpoczęto")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Ostatni fragment")
+
+    class Meta:
+        verbose_name = "Wgrywanie zaległych danych"
+        verbose_name_plural = "Wgrywania zaległych danych"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.upload_id} ({self.received_count} odczytów)"
+
+
+class DeviceKey(models.Model):
+    """
+    Klucz urządzenia (czujnika lub bramki) do wysyłania odczytów.
+
+    Uprawnia wyłącznie do przyjmowania odczytów przypisanych czujników.
+    Urządzenie wysyła nagłówek "Authorization: Device <klucz>"; może też
+    podpisywać paczki HMAC (nagłówki X-Signature-Timestamp, X-Signature).
+    """
+    key = models.CharField(max_length=40, unique=True, verbose_name="Klucz")
+    name = models.CharField(max_length=100, verbose_name="Nazwa urządzenia")
+    sensors = models.ManyToManyField(Sensor, related_name='device_keys', verbose_name="Czujniki")
+    require_signature = models.BooleanField(
+        default=False,
+        verbose_name="Wymagaj podpisu HMAC",
+        help_text="Paczki bez poprawnego podpisu będą odrzucane"
+    )
+    is_active = models.BooleanField(default=True, verbose_name="Aktywny")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Data utworzenia")
+    revoked_at = models.DateTimeField(null=True, blank=True, verbose_name="Unieważniono")
+
+    class Meta:
+        verbose_name = "Klucz urządzenia"
+        verbose_name_plural = "Klucze urządzeń"
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} ({self.key[:8]}…)"
+
+    @staticmethod
+    def generate_key():
+        return secrets.token_hex(20)
+
+    def save(self, *args, **kwargs):
+        if not self.key:
+            self.key = self.generate_key()
+        super().save(*args, **kwargs)
+        self.forget_cached()
+
+    def delete(self, *args, **kwargs):
+        self.forget_cached()
+        return super().delete(*args, **kwargs)
+
+    def revoke(self):
+        self.is_active = False
+        self.revoked_at = timezone.now()
+        self.save(update_fields=['is_active', 'revoked_at'])
+
+    def forget_cached(self):
+        """Usuwa klucz z cache uwierzytelniania tego procesu."""
+        from .authentication import forget_device_key
+        forget_device_key(self.key)
+
+
+class FleetReport(models.Model):
+    """
+    Statystyki całej floty domów liczone w tle (polecenie compute_fleet_report).
+
+    Wszystkie domy są liczone do tego samego momentu period_end, więc raport
+    jest spójny, choć domy liczą równolegle różne procesy.
+    """
+    period_start = models.DateTimeField(verbose_name="Początek miesiąca")
+    period_end = models.DateTimeField(verbose_name="Stan na")
+    previous_period_start = models.DateTimeField(verbose_name="Początek poprzedniego miesiąca")
+    total_houses = models.PositiveIntegerField(default=0, verbose_name="Domy")
+    total_sensors = models.PositiveIntegerField(default=0, verbose_name="Czujniki")
+    online_sensors = models.PositiveIntegerField(default=0, verbose_name="Czujniki online")
+    total_kwh = models.FloatField(default=0, verbose_name="Energia w miesiącu [kWh]")
+    total_cost = models.FloatField(default=0, verbose_name="Koszt w miesiącu [zł]")
+    previous_kwh = models.FloatField(default=0, verbose_name="Energia w poprzednim miesiącu [kWh]")
+    workers = models.PositiveSmallIntegerField(default=1, verbose_name="Procesy")
+    duration_seconds = models.FloatField(default=0, verbose_name="Czas liczenia [s]")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Utworzono")
+
+    class Meta:
+        verbose_name = "Raport floty"
+        verbose_name_plural = "Raporty floty"
+        ordering = ['-period_end']
+
+    def __str__(self):
+        return f"Raport floty {self.period_end:%Y-%m-%d %H:%M} ({self.total_houses} domów)"
+
+
+class FleetHouseStat(models.Model):
+    """Wiersz raportu floty: zużycie jednego domu w bieżącym i poprzednim miesiącu."""
+    report = models.ForeignKey(FleetReport, on_delete=models.CASCADE, related_name='houses')
+    house = models.ForeignKey(House, on_delete=models.CASCADE, related_name='fleet_stats')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='fleet_stats')
+    sensors = models.PositiveIntegerField(default=0, verbose_name="Czujniki")
+    online_sensors = models.PositiveIntegerField(default=0, verbose_name="Czujniki online")
+    readings = models.PositiveIntegerField(default=0, verbose_name="Odczyty w miesiącu")
+    kwh = models.FloatField(default=0, verbose_name="Energia w miesiącu [kWh]")
+    cost = models.FloatField(default=0, verbose_name="Koszt w miesiącu [zł]")
+    previous_kwh = models.FloatField(default=0, verbose_name="Energia w poprzednim miesiącu [kWh]")
+
+    class Meta:
+        verbose_name = "Statystyka domu w raporcie floty"
+        verbose_name_plural = "Statystyki domów w raporcie floty"
+        ordering = ['-kwh']
+        constraints = [
+            models.UniqueConstraint(fields=['report', 'house'], name='unique_fleet_report_house'),
+        ]
+
+    def __str__(self):
+        return f"{self.house_id}: {self.kwh:.2f} kWh"
+
+    @property
+    def change_percent(self):
+        if self.previous_kwh > 0:
+            return (self.kwh - self.previous_kwh) / self.previous_kwh * 100
+        return 100.0 if self.kwh > 0 else 0.0
+
+
+class SensorHourlyRollup(models.Model):
+    """
+    Godzinowe agregaty odczytów czujnika (zadanie refresh_hourly_rollups).
+
+    Energia przedziału między odczytami należy do godziny późniejszego
+    odczytu, z tymi samymi przerwami co w calculate_energy_for_period.
+    """
+    sensor = models.ForeignKey(Sensor, on_delete=models.CASCADE, related_name='hourly_rollups')
+    hour_start = models.DateTimeField(verbose_name="Początek godziny")
+    readings = models.PositiveIntegerField(default=0, verbose_name="Odczyty")
+    kwh = models.FloatField(default=0, verbose_name="Energia [kWh]")
+    avg_power = models.FloatField(null=True, blank=True, verbose_name="Średnia moc [W]")
+    max_power = models.FloatField(null=True, blank=True, verbose_name="Maks. moc [W]")
+    max_current = models.FloatField(null=True, blank=True, verbose_name="Maks. prąd [A]")
+    min_voltage = models.FloatField(null=True, blank=True, verbose_name="Min. napięcie [V]")
+    max_voltage = models.FloatField(null=True, blank=True, verbose_name="Maks. napięcie [V]")
+    avg_pf = models.FloatField(null=True, blank=True, verbose_name="Średni współczynnik mocy")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Przeliczono")
+
+    class Meta:
+        verbose_name = "Agregat godzinowy"
+        verbose_name_plural = "Agregaty godzinowe"
+        ordering = ['sensor', 'hour_start']
+        constraints = [
+            models.UniqueConstraint(fields=['sensor', 'hour_start'], name='unique_sensor_hourly_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.sensor_id} {self.hour_start:%Y-%m-%d %H:00}: {self.kwh:.3f} kWh"
+
+
+class LoadProfileWeek(models.Model):
+    """
+    Zapamiętany tydzień profilu zużycia (7 x 24 komórek [kWh, godziny z danymi]).
+
+    Wiersz z sensor=None dotyczy całego domu. Zapisywany tylko dla tygodni,
+    których agregaty godzinowe są już kompletne; usuwany, gdy agregaty
+    tygodnia zostaną przeliczone (spóźnione odczyty, rebuild_hourly_rollups).
+    """
+    house = models.ForeignKey(House, on_delete=models.CASCADE, related_name='load_profile_weeks')
+    sensor = models.ForeignKey(
+        Sensor,
+        on_delete=models.CASCADE,
+        related_name='load_profile_weeks',
+        null=True,
+        blank=True
+    )
+    week_start = models.DateField(verbose_name="Poniedziałek tygodnia")
+    cells = models.JSONField(verbose_name="Komórki")
+    computed_at = models.DateTimeField(auto_now=True, verbose_name="Obliczono")
+
+    class Meta:
+        verbose_name = "Tydzień profilu zużycia (cache)"
+        verbose_name_plural = "Tygodnie profilu zużycia (cache)"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['house', 'week_start'],
+                condition=models.Q(sensor__isnull=True),
+                name='unique_house_load_profile_week'
+            ),
+            models.UniqueConstraint(
+                fields=['sensor', 'week_start'],
+                condition=models.Q(sensor__isnull=False),
+                name='unique_sensor_load_profile_week'
+            ),
+        ]
+
+    def __str__(self):
+        target = self.sensor.name if self.sensor else self.house.name
+        return f"{target}: tydzień od {self.week_start:%Y-%m-%d}"
+
+
+class PowerQualityDaily(models.Model):
+    """
+    Dzienne podsumowanie jakości zasilania czujnika (dzień w TIME_ZONE).
+
+    Szkice kwantyli napięcia i częstotliwości (DDSketch) oraz histogram
+    współczynnika mocy są aktualizowane przez worker alertów i dają się
+    łączyć, więc zakres dni liczy się bez czytania surowych odczytów.
+    Czas poza pasmami EN 50160 to suma przedziałów między odczytami.
+    """
+    sensor = models.ForeignKey(Sensor, on_delete=models.CASCADE, related_name='power_quality_days')
+    day = models.DateField(verbose_name="Dzień")
+    readings = models.PositiveIntegerField(default=0, verbose_name="Odczyty")
+    covered_seconds = models.FloatField(default=0, verbose_name="Czas pomiarów [s]")
+    voltage_outside_seconds = models.FloatField(default=0, verbose_name="Napięcie poza pasmem [s]")
+    frequency_outside_seconds = models.FloatField(default=0, verbose_name="Częstotliwość poza pasmem [s]")
+    voltage_sketch = models.JSONField(default=dict, verbose_name="Szkic napięcia")
+    frequency_sketch = models.JSONField(default=dict, verbose_name="Szkic częstotliwości")
+    pf_histogram = models.JSONField(default=list, verbose_name="Histogram współczynnika mocy")
+    last_timestamp = models.DateTimeField(null=True, blank=True, verbose_name="Ostatni uwzględniony odczyt")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Zaktualizowano")
+
+    class Meta:
+        verbose_name = "Jakość zasilania (dzień)"
+        verbose_name_plural = "Jakość zasilania (dni)"
+        ordering = ['sensor', 'day']
+        constraints = [
+            models.UniqueConstraint(fields=['sensor', 'day'], name='unique_sensor_power_quality_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.sensor_id} {self.day}: {self.readings} odczytów"
+
+
+class ApplianceEvent(models.Model):
+    """
+    Skokowa zmiana poboru mocy czujnika - włączenie lub wyłączenie urządzenia
+    (sensors.events). started_at to ostatni odczyt na starym poziomie,
+    ended_at pierwszy na nowym.
+    """
+    KIND_CHOICES = [
+        ('on', 'Włączenie'),
+        ('off', 'Wyłączenie'),
+    ]
+
+    sensor = models.ForeignKey(Sensor, on_delete=models.CASCADE, related_name='appliance_events')
+    kind = models.CharField(max_length=3, choices=KIND_CHOICES, verbose_name="Rodzaj")
+    started_at = models.DateTimeField(verbose_name="Początek zmiany")
+    ended_at = models.DateTimeField(verbose_name="Koniec zmiany")
+    delta_power = models.FloatField(verbose_name="ΔP [W]")
+    delta_reactive_power = models.FloatField(verbose_name="ΔQ [VAR]")
+    power_before = models.FloatField(verbose_name="Moc przed [W]")
+    power_after = models.FloatField(verbose_name="Moc po [W]")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Wykryto")
+
+    class Meta:
+        verbose_name = "Zdarzenie urządzenia"
+        verbose_name_plural = "Zdarzenia urządzeń"
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['sensor', 'started_at']),
+        ]
+        constraints = [
+            # Ponowne przetworzenie tych samych odczytów nie dubluje zdarzeń
+            models.UniqueConstraint(fields=['sensor', 'ended_at'], name='unique_sensor_appliance_event'),
+        ]
+
+    def __str__(self):
+        return f"{self.sensor_id} {self.get_kind_display()} {self.delta_power:+.0f} W @ {self.started_at:%Y-%m-%d %H:%M:%S}"
+
+
+class SensorDemandInterval(models.Model):
+    """Energia czujnika w 15-minutowym okresie rozliczeniowym i średnia moc tego okresu."""
+    sensor = models.ForeignKey(Sensor, on_delete=models.CASCADE, related_name='demand_intervals')
+    interval_start = models.DateTimeField(verbose_name="Początek okresu")
+    energy_wh = models.FloatField(default=0, verbose_name="Energia [Wh]")
+    avg_power = models.FloatField(default=0, verbose_name="Średnia moc [W]")
+
+    class Meta:
+        verbose_name = "Moc 15-minutowa czujnika"
+        verbose_name_plural = "Moce 15-minutowe czujników"
+        constraints = [
+            models.UniqueConstraint(fields=['sensor', 'interval_start'], name='unique_sensor_demand_interval'),
+        ]
+
+    def __str__(self):
+        return f"{self.sensor_id} {self.interval_start:%Y-%m-%d %H:%M}: {self.avg_power:.0f} W"
+
+
+class HouseDemandInterval(models.Model):
+    """Suma SensorDemandInterval czujników domu w danym okresie rozliczeniowym."""
+    house = models.ForeignKey(House, on_delete=models.CASCADE, related_name='demand_intervals')
+    interval_start = models.DateTimeField(verbose_name="Początek okresu")
+    energy_wh = models.FloatField(default=0, verbose_name="Energia [Wh]")
+    avg_power = models.FloatField(default=0, verbose_name="Średnia moc [W]")
+
+    class Meta:
+        verbose_name = "Moc 15-minutowa domu"
+        verbose_name_plural = "Moce 15-minutowe domów"
+        constraints = [
+            models.UniqueConstraint(fields=['house', 'interval_start'], name='unique_house_demand_interval'),
+        ]
+
+    def __str__(self):
+        return f"{self.house_id} {self.interval_start:%Y-%m-%d %H:%M}: {self.avg_power:.0f} W"
+
+
+class MonthlyPeak(models.Model):
+    """
+    Najwyższe 15-minutowe średnie moce w miesiącu rozliczeniowym (rank 1 = szczyt).
+
+    Wiersz z sensor=None dotyczy całego domu i ma listę udziałów czujników
+    (contributors). Aktualizowane w miejscu przez sensors.demand.
+    """
+    house = models.ForeignKey(House, on_delete=models.CASCADE, related_name='monthly_peaks')
+    sensor = models.ForeignKey(Sensor, on_delete=models.CASCADE, related_name='monthly_peaks', null=True, blank=True)
+    month = models.DateField(verbose_name="Miesiąc")
+    rank = models.PositiveSmallIntegerField(verbose_name="Miejsce")
+    interval_start = models.DateTimeField(verbose_name="Początek okresu")
+    avg_power = models.FloatField(verbose_name="Średnia moc [W]")
+    contributors = models.JSONField(default=list, blank=True, verbose_name="Udział czujników")
+
+    class Meta:
+        verbose_name = "Szczyt miesięczny"
+        verbose_name_plural = "Szczyty miesięczne"
+        ordering = ['house', 'month', 'rank']
+        indexes = [
+            models.Index(fields=['house', 'month', 'rank']),
+        ]
+
+    def __str__(self):
+        target = f"czujnik {self.sensor_id}" if self.sensor_id else f"dom {self.house_id}"
+        return f"{target} {self.month:%Y-%m} #{self.rank}: {self.avg_power:.0f} W"
+
+
+class ScheduledJob(models.Model):
+    """
+    Stan zadania okresowego run_scheduler: termin, dzierżawa i wynik ostatniego wykonania.
+
+    Dzierżawa (lease_owner, lease_expires_at) zapewnia, że zadanie wykonuje
+    naraz tylko jedna instancja harmonogramu, także na różnych hostach.
+    """
+    name = models.CharField(max_length=100, unique=True, verbose_name="Zadanie")
+    schedule = models.CharField(max_length=100, blank=True, verbose_name="Harmonogram")
+    is_enabled = models.BooleanField(default=True, verbose_name="Włączone")
+    next_run_at = models.DateTimeField(null=True, blank=True, verbose_name="Następne uruchomienie")
+    lease_owner = models.CharField(max_length=200, blank=True, verbose_name="Wykonuje")
+    lease_expires_at = models.DateTimeField(null=True, blank=True, verbose_name="Dzierżawa do")
+    last_started_at = models.DateTimeField(null=True, blank=True, verbose_name="Ostatni start")
+    last_finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Ostatni koniec")
+    last_success_at = models.DateTimeField(null=True, blank=True, verbose_name="Ostatni sukces")
+    # Zapisywany tylko po udanym wykonaniu - błąd późniejszego przebiegu go nie zmienia
+    last_success_started_at = models.DateTimeField(null=True, blank=True, verbose_name="Start ostatniego sukcesu")
+    last_duration_seconds = models.FloatField(null=True, blank=True, verbose_name="Czas wykonania [s]")
+    last_result = models.CharField(max_length=255, blank=True, verbose_name="Wynik")
+    last_error = models.TextField(blank=True, verbose_name="Ostatni błąd")
+    run_count = models.PositiveIntegerField(default=0, verbose_name="Wykonania")
+    failure_count = models.PositiveIntegerField(default=0, verbose_name="Błędy")
+
+    class Meta:
+        verbose_name = "Zadanie okresowe"
+        verbose_name_plural = "Zadania okresowe"
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def is_running(self):
+        return bool(self.lease_expires_at and self.lease_expires_at > timezone.now())
+
+
 class Alert(models.Model):
     """Model alertów/powiadomień"""
     ALERT_TYPES = [
@@ -200,6 +675,7 @@ class Alert(models.Model):
     is_read = models.BooleanField(default=False, verbose_name="Przeczytane")
     is_resolved = models.BooleanField(default=False, verbose_name="Rozwiązane")
     email_sent = models.BooleanField(default=False, verbose_name="Email wysłany")
+    email_pending = models.BooleanField(default=False, db_index=True, verbose_name="Email w kolejce")
 
     class Meta:
         verbose_name = "Alert"
@@ -247,6 +723,11 @@ class UserSettings(models.Model):
         blank=True,
         verbose_name="Cel miesięczny [kWh]"
     )
+    last_alert_email_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Ostatni email z alertami"
+    )
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,125 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from .models import Alert, UserSettings
+
+logger = logging.getLogger(__name__)
+
+# Minimalny odstęp między mailami do jednego użytkownika (UserSettings.alert_frequency)
+FREQUENCY_INTERVALS = {
+    'immediate': timedelta(0),
+    'hourly': timedelta(hours=1),
+    'daily': timedelta(days=1),
+}
+
+
+def _user_settings(user):
+    try:
+        return user.settings
+    except UserSettings.DoesNotExist:
+        return None
+
+
+def build_alert_email(user, email, alerts):
+    """Składa jeden mail (EmailMessage) z listą alertów dla odbiorcy."""
+    houses = []
+    for alert in alerts:
+        if alert.house not in houses:
+            houses.append(alert.house)
+
+    if len(houses) == 1:
+        subject = f"⚠️ Alerty - {houses[0].name}"
+    else:
+        subject = f"⚠️ Alerty ({len(alerts)}) - {len(houses)} domy"
+
+    message_lines = [f"Witaj {user.username},", ""]
+    for house in houses:
+        message_lines.extend([f"Mamy nowe alerty dla domu '{house.name}':", ""])
+        for alert in alerts:
+            if alert.house != house:
+                continue
+            message_lines.append(
+                f"• {alert.get_severity_display()}: {alert.message} "
+                f"({timezone.localtime(alert.created_at):%Y-%m-%d %H:%M})"
+            )
+            if alert.value and alert.threshold:
+                message_lines.append(f"  Wartość: {alert.value:.1f}, Próg: {alert.threshold:.1f}")
+            message_lines.append("")
+
+    message_lines.extend([
+        "Zaloguj się do systemu aby zobaczyć szczegóły.", "",
+        "---", "Energy Monitor System"
+    ])
+    return EmailMessage(subject, "\n".join(message_lines), settings.DEFAULT_FROM_EMAIL, [email])
+
+
+def dispatch_alert_emails(now=None):
+    """
+    Wysyła oczekujące alerty (Alert.email_pending) zgodnie z ustawieniami.
+
+    Alerty są grupowane per odbiorca (email domu lub użytkownika) w jeden mail.
+    Użytkownik z alert_frequency 'hourly'/'daily' dostaje mail najwyżej raz
+    na godzinę/dzień - do tego czasu alerty czekają w kolejce. Przy wyłączonych
+    alertach email (email_alerts=False) alerty są zdejmowane z kolejki bez wysyłki.
+
+    Wszystkie maile idą przez jedno połączenie SMTP, a statusy alertów
+    aktualizowane są zbiorczo. Zwraca liczbę wysłanych maili.
+    """
+    now = now or timezone.now()
+    pending = Alert.objects.filter(email_pending=True).select_related(
+        'house', 'house__user', 'house__user__settings'
+    ).order_by('created_at')
+
+    groups = {}  # (user_id, email) -> (user, [alerty])
+    skipped_ids = []
+    for alert in pending:
+        user = alert.house.user
+        user_settings = _user_settings(user)
+        email = alert.house.alert_email or user.email
+        if not email or (user_settings and not user_settings.email_alerts):
+            skipped_ids.append(alert.id)
+            continue
+        groups.setdefault((user.id, email), (user, []))[1].append(alert)
+
+    messages_to_send = []  # (EmailMessage, [id alertów], user_id)
+    for (user_id, email), (user, alerts) in groups.items():
+        user_settings = _user_settings(user)
+        if user_settings and user_settings.last_alert_email_at:
+            interval = FREQUENCY_INTERVALS.get(user_settings.alert_frequency, timedelta(0))
+            if now - user_settings.last_alert_email_at < interval:
+                continue  # Zbiorczy mail jeszcze nie teraz
+        messages_to_send.append((build_alert_email(user, email, alerts), [a.id for a in alerts], user_id))
+
+    sent_ids = []
+    sent_count = 0
+    notified_users = set()
+    if messages_to_send:
+        connection = get_connection()
+        try:
+            connection.open()
+            for message, alert_ids, user_id in messages_to_send:
+                try:
+                    connection.send_messages([message])
+                except Exception as e:
+                    logger.error(f"Błąd wysyłania emaila do {message.to[0]}: {e}")
+                    continue
+                sent_count += 1
+                sent_ids.extend(alert_ids)
+                notified_users.add(user_id)
+        except Exception as e:
+            logger.error(f"Błąd połączenia z serwerem poczty: {e}")
+        finally:
+            connection.close()
+
+    if sent_ids:
+        Alert.objects.filter(id__in=sent_ids).update(email_sent=True, email_pending=False)
+    if skipped_ids:
+        Alert.objects.filter(id__in=skipped_ids).update(email_pending=False)
+    if notified_users:
+        UserSettings.objects.filter(user_id__in=notified_users).update(last_alert_email_at=now)
+
+    return sent_count
@@ -0,0 +1,101 @@
+import struct
+from datetime import datetime, timezone
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+try:
+    import msgpack
+except ImportError:  # msgpack jest opcjonalny - bez niego parser nie jest dostępny
+    msgpack = None
+
+
+# Rekord formatu spakowanego: epoch_ms, V, I, P, E, f, pf (little endian).
+# Energia jako float64 - licznik kWh rośnie i float32 traciłby dokładność.
+PACKED_RECORD = struct.Struct('<q3fd2f')
+PACKED_COUNT = struct.Struct('<I')
+PACKED_FIELDS = ('voltage', 'current', 'power', 'energy', 'frequency', 'pf')
+
+
+class MessagePackParser(BaseParser):
+    """
+    Parser MessagePack (application/msgpack).
+
+    Treść ma ten sam kształt co JSON (lista obiektów). Znacznik czasu może być
+    napisem ISO albo natywnym typem timestamp MessagePack.
+    """
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if msgpack is None:
+            raise ParseError("Format MessagePack nie jest dostępny na serwerze.")
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, timestamp=3)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError(f"Niepoprawne dane MessagePack: {exc}")
+
+
+class PackedReadingsParser(BaseParser):
+    """
+    Parser spakowanych tablic odczytów (application/vnd.energy-monitor.packed).
+
+    Treść to kolejne bloki czujników:
+        uint8  długość sensor_id, sensor_id (UTF-8),
+        uint32 liczba rekordów, rekordy PACKED_RECORD.
+
+    Format gwarantuje tylko typy pól - zakresy, NaN/inf, znacznik czasu
+    i sensor_id widok sprawdza jak dla JSON.
+    """
+    media_type = 'application/vnd.energy-monitor.packed'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        data = memoryview(stream.read())
+        readings = []
+        position = 0
+        try:
+            while position < len(data):
+                id_length = data[position]
+                position += 1
+                sensor_id = bytes(data[position:position + id_length]).decode('utf-8')
+                position += id_length
+                (count,) = PACKED_COUNT.unpack_from(data, position)
+                position += PACKED_COUNT.size
+                end = position + count * PACKED_RECORD.size
+                if end > len(data):
+                    raise ParseError("Niepełny blok odczytów.")
+
+                for epoch_ms, *values in PACKED_RECORD.iter_unpack(data[position:end]):
+                    reading = {
+                        'sensor_id': sensor_id,
+                        'timestamp': datetime.fromtimestamp(epoch_ms / 1000.0, tz=timezone.utc),
+                    }
+                    # float32 -> usuwamy szum ostatnich cyfr (230.1 zamiast 230.10000610...)
+                    for field, value in zip(PACKED_FIELDS, values):
+                        reading[field] = round(value, 4)
+                    readings.append(reading)
+                position = end
+        except (IndexError, UnicodeDecodeError, struct.error, OverflowError, ValueError) as exc:
+            raise ParseError(f"Niepoprawne dane spakowane: {exc}")
+        return readings
+
+
+def encode_packed_readings(readings):
+    """
+    Koduje listę odczytów (słowniki jak w JSON, timestamp jako datetime)
+    do formatu PackedReadingsParser. Używane przez bramki testowe i benchmark.
+    """
+    by_sensor = {}
+    for reading in readings:
+        by_sensor.setdefault(reading['sensor_id'], []).append(reading)
+
+    chunks = []
+    for sensor_id, sensor_readings in by_sensor.items():
+        encoded_id = sensor_id.encode('utf-8')
+        chunks.append(bytes([len(encoded_id)]) + encoded_id)
+        chunks.append(PACKED_COUNT.pack(len(sensor_readings)))
+        for reading in sensor_readings:
+            chunks.append(PACKED_RECORD.pack(
+                int(reading['timestamp'].timestamp() * 1000),
+                *(reading[field] for field in PACKED_FIELDS)
+            ))
+    return b''.join(chunks)
@@ -0,0 +1,12 @@
+from rest_framework.permissions import BasePermission
+
+from .authentication import DeviceIdentity
+
+
+class IsDeviceOrAdmin(BasePermission):
+    """Urządzenie z kluczem DeviceKey albo administrator (token)."""
+
+    def has_permission(self, request, view):
+        if isinstance(request.auth, DeviceIdentity):
+            return True
+        return bool(request.user and request.user.is_staff)
@@ -0,0 +1,184 @@
+"""
+Jakość zasilania: dzienne podsumowania (PowerQualityDaily) i ich łączenie.
+
+Worker alertów dopisuje nowe odczyty do podsumowań ich dni (czas lokalny).
+Odczyty starsze niż ostatni uwzględniony w danym dniu (spóźnione, wgrywanie
+zaległych danych) powodują przeliczenie całego dnia z surowych danych -
+szkice nie pozwalają usuwać wartości, a przeliczenie dnia zawsze daje
+poprawny stan.
+
+Pasma wg EN 50160 dla sieci niskiego napięcia: napięcie 230 V ±10%,
+częstotliwość 50 Hz ±1%.
+"""
+from bisect import bisect_right
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import PowerQualityDaily, SensorData
+from .sketches import DDSketch
+
+EN50160_VOLTAGE_BAND = (207.0, 253.0)
+EN50160_FREQUENCY_BAND = (49.5, 50.5)
+PF_BIN_EDGES = (0.0, 0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98, 1.0)
+QUANTILES = (('p1', 0.01), ('p50', 0.5), ('p99', 0.99))
+
+
+def day_bounds(day):
+    """[początek, koniec) dnia w czasie lokalnym jako aware datetime."""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+class _DayState:
+    """Szkice i liczniki jednego dnia w trakcie aktualizacji."""
+
+    def __init__(self, row):
+        accuracy = settings.POWER_QUALITY_SKETCH_ACCURACY
+        self.row = row
+        self.voltage = DDSketch.from_dict(row.voltage_sketch, accuracy)
+        self.frequency = DDSketch.from_dict(row.frequency_sketch, accuracy)
+        self.pf = list(row.pf_histogram) or [0] * (len(PF_BIN_EDGES) - 1)
+
+    def extend(self, readings, previous_ts, max_gap_seconds):
+        """Dopisuje uporządkowane odczyty (timestamp, voltage, frequency, pf)."""
+        row = self.row
+        for ts, voltage, frequency, pf in readings:
+            row.readings += 1
+            # Przedział od poprzedniego odczytu należy do późniejszego (jak przy energii)
+            dt_seconds = (ts - previous_ts).total_seconds() if previous_ts else 0
+            if not 0 < dt_seconds < max_gap_seconds:
+                dt_seconds = 0
+            row.covered_seconds += dt_seconds
+
+            if voltage is not None:
+                self.voltage.add(voltage)
+                if not EN50160_VOLTAGE_BAND[0] <= voltage <= EN50160_VOLTAGE_BAND[1]:
+                    row.voltage_outside_seconds += dt_seconds
+            if frequency is not None:
+                self.frequency.add(frequency)
+                if not EN50160_FREQUENCY_BAND[0] <= frequency <= EN50160_FREQUENCY_BAND[1]:
+                    row.frequency_outside_seconds += dt_seconds
+            if pf is not None:
+                index = min(max(bisect_right(PF_BIN_EDGES, pf) - 1, 0), len(self.pf) - 1)
+                self.pf[index] += 1
+            previous_ts = ts
+            row.last_timestamp = ts
+
+    def save(self):
+        self.row.voltage_sketch = self.voltage.to_dict()
+        self.row.frequency_sketch = self.frequency.to_dict()
+        self.row.pf_histogram = self.pf
+        self.row.save()
+
+
+def _previous_timestamp(sensor_id, before):
+    return SensorData.objects.filter(sensor_id=sensor_id, timestamp__lt=before).order_by(
+        '-timestamp'
+    ).values_list('timestamp', flat=True).first()
+
+
+def _rebuild_day(sensor, day):
+    start, end = day_bounds(day)
+    readings = SensorData.objects.filter(
+        sensor=sensor, timestamp__gte=start, timestamp__lt=end
+    ).order_by('timestamp').values_list('timestamp', 'voltage', 'frequency', 'pf')
+    rows = list(readings.iterator(chunk_size=5000))
+    PowerQualityDaily.objects.filter(sensor=sensor, day=day).delete()
+    if not rows:
+        return
+    state = _DayState(PowerQualityDaily(sensor=sensor, day=day))
+    state.extend(rows, _previous_timestamp(sensor.id, start), sensor.offline_threshold_seconds + 60)
+    state.save()
+
+
+def update_power_quality(sensor, readings):
+    """Dopisuje nowe odczyty czujnika (SensorData, rosnąco po czasie) do podsumowań dni."""
+    by_day = {}
+    for reading in readings:
+        by_day.setdefault(timezone.localdate(reading.timestamp), []).append(
+            (reading.timestamp, reading.voltage, reading.frequency, reading.pf)
+        )
+
+    with transaction.atomic():
+        for day, day_readings in sorted(by_day.items()):
+            row, _ = PowerQualityDaily.objects.select_for_update().get_or_create(sensor=sensor, day=day)
+            if row.last_timestamp and day_readings[0][0] <= row.last_timestamp:
+                _rebuild_day(sensor, day)
+                continue
+            previous_ts = row.last_timestamp or _previous_timestamp(sensor.id, day_readings[0][0])
+            state = _DayState(row)
+            state.extend(day_readings, previous_ts, sensor.offline_threshold_seconds + 60)
+            state.save()
+
+
+def rebuild_power_quality(sensor, start, end):
+    """Przelicza z surowych odczytów podsumowania dni od `start` do `end` (włącznie)."""
+    day, last_day = timezone.localdate(start), timezone.localdate(end)
+    with transaction.atomic():
+        while day <= last_day:
+            _rebuild_day(sensor, day)
+            day += timedelta(days=1)
+
+
+def _band_summary(sketch, outside_seconds, covered_seconds, band):
+    summary = {name: _round(sketch.quantile(q)) for name, q in QUANTILES}
+    summary.update(
+        min=_round(sketch.min),
+        max=_round(sketch.max),
+        band=list(band),
+        outside_seconds=round(outside_seconds, 1),
+        outside_percent=round(outside_seconds / covered_seconds * 100, 3) if covered_seconds else 0.0,
+    )
+    return summary
+
+
+def _round(value):
+    return round(value, 3) if value is not None else None
+
+
+def _summary(readings, covered, voltage_outside, frequency_outside, voltage, frequency, pf):
+    return {
+        'readings': readings,
+        'covered_seconds': round(covered, 1),
+        'voltage': _band_summary(voltage, voltage_outside, covered, EN50160_VOLTAGE_BAND),
+        'frequency': _band_summary(frequency, frequency_outside, covered, EN50160_FREQUENCY_BAND),
+        'pf_histogram': {'edges': list(PF_BIN_EDGES), 'counts': pf},
+    }
+
+
+def power_quality_summary(sensor, date_from, date_to, daily=False):
+    """
+    Jakość zasilania czujnika w dniach [date_from, date_to] - łączy dzienne
+    szkice. daily=True dodaje podsumowanie każdego dnia.
+    """
+    accuracy = settings.POWER_QUALITY_SKETCH_ACCURACY
+    voltage, frequency = DDSketch(accuracy), DDSketch(accuracy)
+    pf = [0] * (len(PF_BIN_EDGES) - 1)
+    totals = {'readings': 0, 'covered': 0.0, 'voltage_outside': 0.0, 'frequency_outside': 0.0}
+    days = []
+
+    for row in PowerQualityDaily.objects.filter(sensor=sensor, day__gte=date_from, day__lte=date_to).order_by('day'):
+        state = _DayState(row)
+        voltage.merge(state.voltage)
+        frequency.merge(state.frequency)
+        pf = [a + b for a, b in zip(pf, state.pf)]
+        totals['readings'] += row.readings
+        totals['covered'] += row.covered_seconds
+        totals['voltage_outside'] += row.voltage_outside_seconds
+        totals['frequency_outside'] += row.frequency_outside_seconds
+        if daily:
+            days.append({'day': row.day, **_summary(
+                row.readings, row.covered_seconds, row.voltage_outside_seconds,
+                row.frequency_outside_seconds, state.voltage, state.frequency, state.pf
+            )})
+
+    result = {'from': date_from, 'to': date_to, **_summary(
+        totals['readings'], totals['covered'], totals['voltage_outside'],
+        totals['frequency_outside'], voltage, frequency, pf
+    )}
+    if daily:
+        result['daily'] = days
+    return result
@@ -0,0 +1,132 @@
+"""
+Profil zużycia: macierz 7 dni tygodnia x 24 godziny (czas lokalny).
+
+Liczony z agregatów godzinowych (SensorHourlyRollup) jednym zapytaniem
+grupującym po tygodniu, dniu tygodnia ISO i godzinie w strefie TIME_ZONE.
+Przy zmianie czasu godzina 2:00 jesienią występuje dwa razy, a wiosną
+wcale - dlatego średnia komórki dzieli energię przez liczbę faktycznych
+godzin z danymi, a nie liczbę dni.
+
+Zamknięte tygodnie (pon-nd w całości w zakresie) są zapamiętywane
+w LoadProfileWeek osobno dla domu i czujnika - tylko gdy zadanie
+refresh_hourly_rollups przeliczyło już ich wszystkie godziny. Każde
+przeliczenie agregatów (spóźnione odczyty, rebuild_hourly_rollups) usuwa
+wpisy swoich tygodni, niezależnie od procesu, w którym się odbyło.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay, TruncWeek
+from django.utils import timezone
+
+from .models import LoadProfileWeek, SensorHourlyRollup
+from .rollups import rollups_complete_until
+from .utils import is_closed_period
+
+WEEKDAYS = ['pon', 'wt', 'śr', 'czw', 'pt', 'sob', 'nd']
+
+
+def _local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _empty():
+    # Komórka: [kWh, liczba godzin z danymi]
+    return [[0.0, 0] for _ in range(7 * 24)]
+
+
+def load_profile(house, date_from, date_to, sensor=None):
+    """
+    Profil domu (albo jednego jego czujnika `sensor`) w dniach [date_from, date_to].
+    """
+    start, end = _local_midnight(date_from), _local_midnight(date_to + timedelta(days=1))
+    sensors = [sensor] if sensor else house.sensors.all()
+
+    # Tygodnie w całości w zakresie, zamknięte i z kompletnymi agregatami
+    # (skończone przed startem ostatniego udanego refresh_hourly_rollups,
+    # który nadrobił wszystkie wcześniejsze godziny) mogą pochodzić z LoadProfileWeek
+    complete_until = rollups_complete_until()
+    cacheable = set()
+    monday = date_from - timedelta(days=date_from.weekday())
+    while complete_until and monday <= date_to:
+        sunday = monday + timedelta(days=6)
+        week_end = _local_midnight(sunday + timedelta(days=1))
+        if monday >= date_from and sunday <= date_to and week_end <= complete_until and is_closed_period(week_end):
+            cacheable.add(monday)
+        monday += timedelta(days=7)
+    stored = LoadProfileWeek.objects.filter(house=house, sensor=sensor, week_start__in=cacheable)
+    cached_weeks = dict(stored.values_list('week_start', 'cells'))
+
+    # Zakresy do policzenia = [start, end) bez tygodni z cache
+    ranges, cursor = [], start
+    for monday in sorted(cached_weeks):
+        week_start = _local_midnight(monday)
+        if cursor < week_start:
+            ranges.append((cursor, week_start))
+        cursor = _local_midnight(monday + timedelta(days=7))
+    if cursor < end:
+        ranges.append((cursor, end))
+
+    weeks = dict(cached_weeks)
+    if ranges:
+        condition = Q()
+        for low, high in ranges:
+            condition |= Q(hour_start__gte=low, hour_start__lt=high)
+        tz = timezone.get_current_timezone()
+        rows = SensorHourlyRollup.objects.filter(condition, sensor__in=sensors).annotate(
+            week=TruncWeek('hour_start', tzinfo=tz),
+            weekday=ExtractIsoWeekDay('hour_start', tzinfo=tz),
+            hour=ExtractHour('hour_start', tzinfo=tz),
+        ).values('week', 'weekday', 'hour').annotate(
+            kwh=Sum('kwh'), hours=Count('hour_start', distinct=True)
+        ).order_by()
+        computed = {}
+        for row in rows:
+            monday = timezone.localtime(row['week']).date()
+            cell = computed.setdefault(monday, _empty())[(row['weekday'] - 1) * 24 + row['hour']]
+            cell[0] += row['kwh'] or 0.0
+            cell[1] += row['hours']
+        weeks.update(computed)
+        LoadProfileWeek.objects.bulk_create([
+            LoadProfileWeek(house=house, sensor=sensor, week_start=monday, cells=computed.get(monday, _empty()))
+            for monday in sorted(cacheable - cached_weeks.keys())
+        ], ignore_conflicts=True)
+
+    total = _empty()
+    for cells in weeks.values():
+        for cell, (kwh, hours) in zip(total, cells):
+            cell[0] += kwh
+            cell[1] += hours
+
+    kwh = [[round(total[day * 24 + hour][0], 4) for hour in range(24)] for day in range(7)]
+    avg_power = [
+        [
+            round(total[day * 24 + hour][0] * 1000 / total[day * 24 + hour][1], 1) if total[day * 24 + hour][1] else None
+            for hour in range(24)
+        ]
+        for day in range(7)
+    ]
+    return {
+        'from': date_from,
+        'to': date_to,
+        'weekdays': WEEKDAYS,
+        'hours': list(range(24)),
+        'kwh': kwh,
+        'avg_power': avg_power,
+        'total_kwh': round(sum(cell[0] for cell in total), 3),
+        'cached_weeks': len(cached_weeks),
+    }
+
+
+def invalidate_load_profile(sensor_id, house_id, start_time, end_time):
+    """
+    Usuwa zapamiętane tygodnie profilu czujnika i jego domu, w które trafiły
+    godziny [start_time, end_time) przeliczonych agregatów.
+    """
+    first_monday = timezone.localdate(start_time)
+    first_monday -= timedelta(days=first_monday.weekday())
+    LoadProfileWeek.objects.filter(
+        Q(sensor_id=sensor_id) | Q(house_id=house_id, sensor__isnull=True),
+        week_start__gte=first_monday,
+        week_start__lte=timezone.localdate(end_time - timedelta(microseconds=1)),
+    ).delete()
@@ -0,0 +1,27 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+try:
+    import orjson
+except ImportError:  # orjson jest opcjonalny - bez niego używamy modułu json
+    orjson = None
+
+
+class ColumnarJSONRenderer(BaseRenderer):
+    """
+    Renderer dla formatu kolumnowego (?format=columnar).
+
+    Oczekuje gotowego słownika list (np. {'ts': [...], 'power': [...]})
+    i zapisuje go bez wcięć i bez przechodzenia przez pola serializera.
+    """
+    media_type = 'application/json'
+    format = 'columnar'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is not None:
+            return orjson.dumps(data)
+        return json.dumps(data, separators=(',', ':')).encode('utf-8')
@@ -0,0 +1,129 @@
+"""
+Godzinowe agregaty odczytów (SensorHourlyRollup).
+
+Zadanie refresh_hourly_rollups przelicza ostatnie ROLLUP_REFRESH_HOURS godzin,
+a po przerwie w działaniu harmonogramu - wszystkie godziny od startu
+ostatniego udanego przebiegu. Spóźnione odczyty (wgrywanie zaległych danych)
+przeliczają swoje godziny od razu w store_readings, historię sprzed
+wdrożenia przelicza polecenie rebuild_hourly_rollups.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ScheduledJob, Sensor, SensorData, SensorHourlyRollup
+
+ROLLUP_UPDATE_FIELDS = ['readings', 'kwh', 'avg_power', 'max_power', 'max_current', 'min_voltage', 'max_voltage', 'avg_pf']
+
+
+def floor_hour(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _rollup_rows(sensor_id, rows, previous_ts, max_gap_seconds):
+    """Agregaty godzin z uporządkowanych odczytów (timestamp, power, current, voltage, pf)."""
+    hours = {}
+    last_ts = previous_ts
+    for ts, power, current, voltage, pf in rows:
+        hour = floor_hour(ts)
+        acc = hours.get(hour)
+        if acc is None:
+            acc = hours[hour] = {'readings': 0, 'wh': 0.0, 'power': [], 'current': [], 'voltage': [], 'pf': []}
+        acc['readings'] += 1
+        if power is not None:
+            acc['power'].append(power)
+        if current is not None:
+            acc['current'].append(current)
+        if voltage is not None:
+            acc['voltage'].append(voltage)
+        if pf is not None:
+            acc['pf'].append(pf)
+        if last_ts is not None:
+            dt_seconds = (ts - last_ts).total_seconds()
+            if 0 < dt_seconds < max_gap_seconds:
+                acc['wh'] += (float(power) if power else 0) * (dt_seconds / 3600.0)
+        last_ts = ts
+
+    return [
+        SensorHourlyRollup(
+            sensor_id=sensor_id,
+            hour_start=hour,
+            readings=acc['readings'],
+            kwh=acc['wh'] / 1000.0,
+            avg_power=sum(acc['power']) / len(acc['power']) if acc['power'] else None,
+            max_power=max(acc['power'], default=None),
+            max_current=max(acc['current'], default=None),
+            min_voltage=min(acc['voltage'], default=None),
+            max_voltage=max(acc['voltage'], default=None),
+            avg_pf=sum(acc['pf']) / len(acc['pf']) if acc['pf'] else None,
+        )
+        for hour, acc in hours.items()
+    ]
+
+
+def rollups_complete_until():
+    """
+    Chwila, do której agregaty godzinowe są kompletne: start ostatniego
+    udanego przebiegu refresh_hourly_rollups (None - jeszcze żadnego).
+    Nieudane przebiegi po nim go nie zmieniają.
+    """
+    return ScheduledJob.objects.filter(name='refresh_hourly_rollups').values_list(
+        'last_success_started_at', flat=True
+    ).first()
+
+
+def refresh_hourly_rollups(start=None, end=None, sensor_ids=None):
+    """
+    Przelicza agregaty godzin od godziny zawierającej `start` do godziny
+    zawierającej `end`. Domyślnie ostatnie ROLLUP_REFRESH_HOURS godzin, a gdy
+    ostatni udany przebieg był wcześniej - od jego startu, żeby nie zostawić
+    luk. Zwraca liczbę zapisanych wierszy.
+    """
+    from .profiles import invalidate_load_profile
+
+    end = end or timezone.now()
+    if start is None:
+        start = end - timedelta(hours=settings.ROLLUP_REFRESH_HOURS)
+        complete_until = rollups_complete_until()
+        if complete_until is not None and complete_until < start:
+            start = complete_until
+    start = floor_hour(start)
+    range_end = floor_hour(end) + timedelta(hours=1)
+
+    sensors = Sensor.objects.all()
+    if sensor_ids is not None:
+        sensors = sensors.filter(id__in=sensor_ids)
+
+    saved = 0
+    for sensor_id, house_id, threshold in sensors.values_list('id', 'house_id', 'offline_threshold_seconds'):
+        readings = SensorData.objects.filter(sensor_id=sensor_id)
+        # Odczyt sprzed zakresu domyka pierwszy przedział pierwszej godziny
+        previous_ts = readings.filter(timestamp__lt=start).order_by('-timestamp').values_list(
+            'timestamp', flat=True
+        ).first()
+        rows = readings.filter(timestamp__gte=start, timestamp__lt=range_end).order_by('timestamp').values_list(
+            'timestamp', 'power', 'current', 'voltage', 'pf'
+        ).iterator(chunk_size=5000)
+        rollups = _rollup_rows(sensor_id, rows, previous_ts, threshold + 60)
+
+        SensorHourlyRollup.objects.bulk_create(
+            rollups, batch_size=1000, update_conflicts=True,
+            unique_fields=['sensor', 'hour_start'], update_fields=ROLLUP_UPDATE_FIELDS + ['updated_at'],
+        )
+        # Godziny, z których zniknęły odczyty, nie mają już agregatu
+        SensorHourlyRollup.objects.filter(
+            sensor_id=sensor_id, hour_start__gte=start, hour_start__lt=range_end
+        ).exclude(hour_start__in=[rollup.hour_start for rollup in rollups]).delete()
+        invalidate_load_profile(sensor_id, house_id, start, range_end)
+        saved += len(rollups)
+    return saved
+
+
+def refresh_rollups_for_range(sensor, low, high):
+    """
+    Przelicza godziny, które zmieniły spóźnione odczyty z [low, high] - także
+    godzinę następnego odczytu, bo zmienił się początek jego przedziału.
+    """
+    max_gap = timedelta(seconds=sensor.offline_threshold_seconds + 60)
+    return refresh_hourly_rollups(low, high + max_gap, sensor_ids=[sensor.id])
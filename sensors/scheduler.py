@@ -0,0 +1,295 @@
+"""
+Lekki harmonogram zadań okresowych (polecenie run_scheduler).
+
+Zadania rejestruje dekorator @scheduled_job (sensors.jobs), a ich harmonogram
+- interwał 'every' [s] albo wyrażenie 'cron' - i rozrzut 'jitter' [s]
+pochodzą z settings.SCHEDULER_JOBS. Zadanie bez wpisu w ustawieniach nie
+jest uruchamiane.
+
+Stan zadań trzyma tabela ScheduledJob. Uruchomienie wymaga przejęcia
+dzierżawy (lease) jednym warunkowym UPDATE, więc przy kilku instancjach
+run_scheduler (także na różnych hostach) dane zadanie wykonuje tylko jedna
+z nich, a kolejne uruchomienie nie zacznie się przed końcem poprzedniego.
+Dzierżawa trwającego zadania jest przedłużana; po awarii instancji wygasa
+po lease_seconds i zadanie przejmuje inna.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ScheduledJob
+
+logger = logging.getLogger(__name__)
+
+
+class CronSchedule:
+    """
+    Wyrażenie w stylu crona: "minuta godzina dzień miesiąc dzień-tygodnia"
+    (czas lokalny TIME_ZONE). Pola: *, liczba, zakres a-b, krok */n lub a-b/n,
+    listy po przecinku. Dzień tygodnia: 0-6 od niedzieli (7 też oznacza niedzielę).
+    """
+    FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression):
+        self.expression = expression
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Wyrażenie cron musi mieć 5 pól: '{expression}'")
+        values = [self._parse(part, low, high) for part, (low, high) in zip(parts, self.FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = values
+        self.weekdays = {day % 7 for day in weekdays}
+        # Jak w cronie: gdy ograniczone są oba pola dnia, wystarczy zgodność jednego
+        self.any_day = parts[2] == '*'
+        self.any_weekday = parts[4] == '*'
+
+    @staticmethod
+    def _parse(field, low, high):
+        values = set()
+        for item in field.split(','):
+            spec, _, step = item.partition('/')
+            step = int(step) if step else 1
+            if spec == '*':
+                start, end = low, high
+            elif '-' in spec:
+                start, end = (int(v) for v in spec.split('-', 1))
+            else:
+                start = int(spec)
+                end = high if step > 1 else start
+            if not (low <= start <= end <= high) or step < 1:
+                raise ValueError(f"Niepoprawne pole cron: '{field}'")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, day):
+        in_month = day.day in self.days
+        # datetime.weekday(): 0 = poniedziałek; w cronie 0 = niedziela
+        in_week = (day.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_month and in_week
+        return in_month or in_week
+
+    def next_after(self, moment):
+        """Pierwszy pasujący moment (pełna minuta) po `moment`."""
+        local = timezone.localtime(moment).replace(tzinfo=None, second=0, microsecond=0)
+        candidate = local + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                year, month = divmod(candidate.month, 12)
+                candidate = datetime(candidate.year + year, month + 1, 1)
+            elif not self._day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+            elif candidate.hour not in self.hours:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return timezone.make_aware(candidate)
+        raise ValueError(f"Wyrażenie cron nigdy nie pasuje: '{self.expression}'")
+
+    def __str__(self):
+        return f"cron {self.expression}"
+
+
+class Job:
+    """Zadanie okresowe: funkcja bez argumentów i jej harmonogram."""
+
+    def __init__(self, name, func, every=None, cron=None, jitter=0, lease_seconds=600):
+        if (every is None) == (cron is None):
+            raise ValueError(f"Zadanie '{name}': podaj dokładnie jedno z 'every' i 'cron'")
+        self.name = name
+        self.func = func
+        self.every = every
+        self.cron = CronSchedule(cron) if cron else None
+        self.jitter = jitter
+        self.lease_seconds = lease_seconds
+
+    @property
+    def schedule(self):
+        described = str(self.cron) if self.cron else f"co {self.every} s"
+        return f"{described} (+0-{self.jitter} s)" if self.jitter else described
+
+    def next_run(self, after):
+        """Termin następnego uruchomienia; rozrzut rozkłada zadania wielu instalacji w czasie."""
+        base = self.cron.next_after(after) if self.cron else after + timedelta(seconds=self.every)
+        return base + timedelta(seconds=random.uniform(0, self.jitter))
+
+
+_registry = {}
+
+
+def scheduled_job(name, lease_seconds=600):
+    """Rejestruje funkcję jako zadanie `name`; harmonogram bierze z SCHEDULER_JOBS."""
+    def decorator(func):
+        _registry[name] = (func, lease_seconds)
+        return func
+    return decorator
+
+
+def configured_jobs():
+    """Zarejestrowane zadania, które mają harmonogram w settings.SCHEDULER_JOBS."""
+    from . import jobs  # noqa: F401 - rejestracja zadań
+
+    configured = []
+    for name, options in settings.SCHEDULER_JOBS.items():
+        if name not in _registry:
+            raise ValueError(f"Nieznane zadanie w SCHEDULER_JOBS: '{name}'")
+        func, lease_seconds = _registry[name]
+        configured.append(Job(name, func, lease_seconds=options.get('lease_seconds', lease_seconds),
+                              every=options.get('every'), cron=options.get('cron'),
+                              jitter=options.get('jitter', 0)))
+    return configured
+
+
+def sync_jobs(jobs, now=None):
+    """Zakłada brakujące wiersze ScheduledJob; zmiana harmonogramu liczy termin od nowa."""
+    now = now or timezone.now()
+    for job in jobs:
+        state, created = ScheduledJob.objects.get_or_create(
+            name=job.name, defaults={'schedule': job.schedule, 'next_run_at': job.next_run(now)}
+        )
+        if not created and (state.schedule != job.schedule or state.next_run_at is None):
+            ScheduledJob.objects.filter(pk=state.pk).update(schedule=job.schedule, next_run_at=job.next_run(now))
+
+
+def claim(job, owner, now=None, force=False):
+    """
+    Przejmuje dzierżawę zadania (atomowy UPDATE). Bez force tylko gdy minął
+    termin; ustawia wtedy od razu kolejny termin. Zwraca True, gdy się udało.
+    """
+    now = now or timezone.now()
+    queryset = ScheduledJob.objects.filter(name=job.name).filter(
+        Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lte=now)
+    )
+    updates = {
+        'lease_owner': owner,
+        'lease_expires_at': now + timedelta(seconds=job.lease_seconds),
+        'last_started_at': now,
+    }
+    if not force:
+        queryset = queryset.filter(is_enabled=True, next_run_at__lte=now)
+        updates['next_run_at'] = job.next_run(now)
+    return queryset.update(**updates) == 1
+
+
+def instance_owner():
+    """Identyfikator instancji (host:pid:losowy sufiks) zapisywany jako lease_owner."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def hold_lease(name, owner, lease_seconds):
+    """
+    Dzierżawa na wyłączność dla procesu działającego stale (np. run_alert_worker):
+    przejmuje wolną lub wygasłą, a własną przedłuża. Zwraca True, gdy `owner` ją ma.
+    """
+    now = timezone.now()
+    queryset = ScheduledJob.objects.filter(name=name).filter(
+        Q(lease_owner=owner) | Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lte=now)
+    )
+    updates = {'lease_owner': owner, 'lease_expires_at': now + timedelta(seconds=lease_seconds)}
+    if queryset.update(**updates):
+        return True
+    # Pierwsze uruchomienie - wiersz dzierżawy jeszcze nie istnieje
+    _, created = ScheduledJob.objects.get_or_create(name=name, defaults={'schedule': 'stale działający proces'})
+    return created and queryset.update(**updates) == 1
+
+
+def release_lease(name, owner):
+    """Zwalnia dzierżawę z hold_lease (przy zatrzymaniu procesu)."""
+    ScheduledJob.objects.filter(name=name, lease_owner=owner).update(lease_owner='', lease_expires_at=None)
+
+
+def renew(job, owner):
+    """Przedłuża dzierżawę trwającego zadania. False - dzierżawę przejęła inna instancja."""
+    return ScheduledJob.objects.filter(name=job.name, lease_owner=owner).update(
+        lease_expires_at=timezone.now() + timedelta(seconds=job.lease_seconds)
+    ) == 1
+
+
+def run_job(job, owner):
+    """Wykonuje zadanie z przejętą dzierżawą i zapisuje wynik, czas i ewentualny błąd."""
+    started = time.perf_counter()
+    started_at = timezone.now()
+    updates = {'run_count': F('run_count') + 1}
+    try:
+        result = job.func()
+    except Exception:
+        logger.exception(f"Zadanie '{job.name}' zakończyło się błędem")
+        updates.update(failure_count=F('failure_count') + 1, last_error=traceback.format_exc()[-4000:])
+    else:
+        updates.update(last_success_at=timezone.now(), last_success_started_at=started_at,
+                       last_error='', last_result=str(result or '')[:255])
+    finally:
+        finished = timezone.now()
+        updates.update(
+            lease_owner='', lease_expires_at=None, last_finished_at=finished,
+            last_duration_seconds=time.perf_counter() - started,
+        )
+        if not ScheduledJob.objects.filter(name=job.name, lease_owner=owner).update(**updates):
+            logger.warning(f"Zadanie '{job.name}': dzierżawa wygasła przed końcem wykonania")
+        # Zadanie działało we własnym wątku - zamykamy jego połączenie z bazą
+        connection.close()
+
+
+class Scheduler:
+    """Pętla run_scheduler: przejmuje zadania, których termin minął, i wykonuje je w wątkach."""
+
+    def __init__(self, jobs, max_threads=None, poll_seconds=None):
+        self.jobs = {job.name: job for job in jobs}
+        self.owner = instance_owner()
+        self.poll_seconds = poll_seconds or settings.SCHEDULER_POLL_SECONDS
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_threads or settings.SCHEDULER_MAX_THREADS, thread_name_prefix='scheduler'
+        )
+        self.running = {}
+        self._stopping = threading.Event()
+
+    def run_pending(self):
+        """Uruchamia zadania, których termin minął. Zwraca nazwy uruchomionych."""
+        now = timezone.now()
+        self.running = {name: future for name, future in self.running.items() if not future.done()}
+        for name in self.running:
+            if not renew(self.jobs[name], self.owner):
+                logger.warning(f"Zadanie '{name}': dzierżawę przejęła inna instancja")
+
+        due = ScheduledJob.objects.filter(
+            name__in=self.jobs.keys(), is_enabled=True, next_run_at__lte=now
+        ).exclude(name__in=self.running.keys()).values_list('name', flat=True)
+        started = []
+        for name in due:
+            job = self.jobs[name]
+            if claim(job, self.owner, now):
+                self.running[name] = self.executor.submit(run_job, job, self.owner)
+                started.append(name)
+        return started
+
+    def seconds_to_next(self):
+        next_run = ScheduledJob.objects.filter(
+            name__in=self.jobs.keys(), is_enabled=True
+        ).order_by('next_run_at').values_list('next_run_at', flat=True).first()
+        if next_run is None:
+            return self.poll_seconds
+        wait = (next_run - timezone.now()).total_seconds()
+        return min(max(wait, 0.5), self.poll_seconds)
+
+    def run_forever(self):
+        while not self._stopping.is_set():
+            for name in self.run_pending():
+                logger.info(f"Uruchomiono zadanie '{name}'")
+            self._stopping.wait(self.seconds_to_next())
+
+    def stop(self, wait=True):
+        self._stopping.set()
+        self.executor.shutdown(wait=wait)
@@ -1,19 +1,38 @@
 from rest_framework import serializers
-from datetime import timezone
+from datetime import timedelta, timezone
+from django.conf import settings
 from django.contrib.auth.models import User
-from .models import House, Sensor, SensorData, Alert, UserSettings
+from django.utils import timezone as django_timezone
+from .models import House, Sensor, SensorData, Alert, UserSettings, ApplianceEvent
+
+
+# Dopuszczalne zakresy wartości odczytu (min, max) - wspólne dla serializera
+# i szybkiej walidacji paczek (sensors.validation)
+READING_LIMITS = {
+    'voltage': (0.0, 500.0),
+    'current': (0.0, 1000.0),
+    'power': (0.0, 250000.0),
+    'energy': (0.0, None),
+    'frequency': (0.0, 100.0),
+    'pf': (0.0, 1.0),
+}
 
 
 class SensorReadingSerializer(serializers.Serializer):
     """Serializer dla odczytów z czujnika"""
     sensor_id = serializers.CharField()
     timestamp = serializers.DateTimeField()
-    voltage = serializers.FloatField()
-    current = serializers.FloatField()
-    power = serializers.FloatField()
-    energy = serializers.FloatField()
-    frequency = serializers.FloatField()
-    pf = serializers.FloatField()
+    voltage = serializers.FloatField(min_value=READING_LIMITS['voltage'][0], max_value=READING_LIMITS['voltage'][1])
+    current = serializers.FloatField(min_value=READING_LIMITS['current'][0], max_value=READING_LIMITS['current'][1])
+    power = serializers.FloatField(min_value=READING_LIMITS['power'][0], max_value=READING_LIMITS['power'][1])
+    energy = serializers.FloatField(min_value=READING_LIMITS['energy'][0], max_value=READING_LIMITS['energy'][1])
+    frequency = serializers.FloatField(min_value=READING_LIMITS['frequency'][0], max_value=READING_LIMITS['frequency'][1])
+    pf = serializers.FloatField(min_value=READING_LIMITS['pf'][0], max_value=READING_LIMITS['pf'][1])
+
+    def validate_timestamp(self, value):
+        if value > django_timezone.now() + timedelta(seconds=settings.READING_MAX_FUTURE_SECONDS):
+            raise serializers.ValidationError("Znacznik czasu jest z przyszłości.")
+        return value
 
 
 # --- NOWY SERIALIZER ---
@@ -51,6 +70,8 @@ class SensorSerializer(serializers.ModelSerializer):
             'id', 'house', 'sensor_id', 'name', 'description',
             'location', 'icon', 'color', 'is_active', 'power_threshold',
             'current_max_threshold', 'voltage_min_threshold', 'voltage_max_threshold',
+            'power_clear_threshold', 'current_clear_threshold',
+            'alert_duration_seconds', 'alert_cooldown_seconds',
             'offline_threshold_seconds',
             'created_at', 'is_online', 'last_reading'
         ]
@@ -121,3 +142,29 @@ class AlertSerializer(serializers.ModelSerializer):
             'is_read', 'is_resolved', 'email_sent'
         ]
         read_only_fields = ['created_at']
+
+
+class ApplianceEventSerializer(serializers.ModelSerializer):
+    """Serializer dla zdarzeń urządzeń (włączenie/wyłączenie)"""
+    sensor_name = serializers.CharField(source='sensor.name', read_only=True)
+
+    class Meta:
+        model = ApplianceEvent
+        fields = [
+            'id', 'sensor', 'sensor_name', 'kind', 'started_at', 'ended_at',
+            'delta_power', 'delta_reactive_power', 'power_before', 'power_after'
+        ]
+        read_only_fields = fields
+
+
+class AlertBacktestSerializer(serializers.Serializer):
+    """Proponowane progi do symulacji alertów; pominięte pola biorą wartości czujnika"""
+    days = serializers.IntegerField(min_value=1, max_value=90, default=30)
+    power_threshold = serializers.FloatField(min_value=0, required=False, allow_null=True)
+    power_clear_threshold = serializers.FloatField(min_value=0, required=False, allow_null=True)
+    current_max_threshold = serializers.FloatField(min_value=0, required=False, allow_null=True)
+    current_clear_threshold = serializers.FloatField(min_value=0, required=False, allow_null=True)
+    voltage_min_threshold = serializers.FloatField(min_value=0, required=False, allow_null=True)
+    voltage_max_threshold = serializers.FloatField(min_value=0, required=False, allow_null=True)
+    alert_duration_seconds = serializers.IntegerField(min_value=0, required=False)
+    alert_cooldown_seconds = serializers.IntegerField(min_value=0, required=False)
@@ -0,0 +1,90 @@
+"""
+DDSketch - strumieniowy szkic kwantyli ze względnym błędem (Masson, Rim, Lee, 2019).
+
+Wartość v > 0 trafia do kubełka ceil(log_gamma(v)), gdzie
+gamma = (1 + a) / (1 - a); każdy kwantyl jest zwracany z błędem względnym
+najwyżej `a`. Szkice o tej samej dokładności łączy się przez dodanie
+liczników kubełków, więc kwantyle dowolnego zakresu dni liczy się ze
+szkiców dziennych bez czytania surowych odczytów.
+
+Stan (to_dict) jest zwykłym słownikiem do zapisu w JSONField.
+"""
+import math
+
+
+class DDSketch:
+    __slots__ = ('relative_accuracy', 'bins', 'zero_count', 'count', 'min', 'max', '_log_gamma')
+
+    def __init__(self, relative_accuracy):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy musi być z przedziału (0, 1)")
+        self.relative_accuracy = relative_accuracy
+        self._log_gamma = math.log((1 + relative_accuracy) / (1 - relative_accuracy))
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value, weight=1):
+        if value <= 0:
+            # Wartości niedodatnie (np. zanik napięcia) liczymy razem jako zero
+            self.zero_count += weight
+        else:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[key] = self.bins.get(key, 0) + weight
+        self.count += weight
+        self.min = value if self.min is None or value < self.min else self.min
+        self.max = value if self.max is None or value > self.max else self.max
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Można łączyć tylko szkice o tej samej dokładności")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        """Kwantyl q z [0, 1]; None dla pustego szkicu."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return min(0.0, self.max)
+        gamma = math.exp(self._log_gamma)
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if rank < seen:
+                # Środek kubełka (gamma^(k-1), gamma^k] w sensie błędu względnego
+                value = 2 * gamma ** key / (gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'accuracy': self.relative_accuracy,
+            'bins': {str(key): count for key, count in self.bins.items()},
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data, relative_accuracy=None):
+        """Odtwarza szkic; pusty/niezgodny stan daje pusty szkic o dokładności relative_accuracy."""
+        accuracy = (data or {}).get('accuracy', relative_accuracy)
+        sketch = cls(accuracy)
+        if data:
+            sketch.bins = {int(key): count for key, count in data['bins'].items()}
+            sketch.zero_count = data['zero_count']
+            sketch.count = data['count']
+            sketch.min = data['min']
+            sketch.max = data['max']
+        return sketch
@@ -1,3 +1,339 @@
-from django.test import TestCase
+from datetime import datetime, time, timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.db import connection
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .ingest import process_pending_batches
+from .jobs import refresh_hourly_rollups_job
+from .models import (
+    Alert, House, LoadProfileWeek, PendingReadingBatch, ScheduledJob, Sensor, SensorData, SensorHourlyRollup,
+    UserSettings,
+)
+from .notifications import dispatch_alert_emails
+from .profiles import load_profile
+from .rollups import floor_hour, refresh_hourly_rollups, rollups_complete_until
+from .scheduler import Job, claim, hold_lease, release_lease, renew, run_job, sync_jobs
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class DispatchAlertEmailsTests(TestCase):
+    """Wysyłka oczekujących alertów (dispatch_alert_emails) przez backend locmem."""
+
+    def setUp(self):
+        self.jan = User.objects.create_user('jan', email='jan@example.com', password='x')
+        self.anna = User.objects.create_user('anna', email='anna@example.com', password='x')
+        self.home = House.objects.create(user=self.jan, name='Dom')
+        self.cottage = House.objects.create(user=self.jan, name='Działka', alert_email='dzialka@example.com')
+        self.flat = House.objects.create(user=self.anna, name='Mieszkanie')
+
+    def _alert(self, house, message='Przekroczono próg mocy', **fields):
+        return Alert.objects.create(
+            house=house, alert_type='power_high', message=message, email_pending=True, **fields
+        )
+
+    def test_one_email_per_recipient(self):
+        self._alert(self.home, 'Dom 1')
+        self._alert(self.home, 'Dom 2')
+        self._alert(self.cottage, 'Działka 1')
+        self._alert(self.flat, 'Mieszkanie 1')
+
+        self.assertEqual(dispatch_alert_emails(), 3)
+
+        by_recipient = {message.to[0]: message for message in mail.outbox}
+        self.assertEqual(set(by_recipient), {'jan@example.com', 'dzialka@example.com', 'anna@example.com'})
+        # Alerty jednego odbiorcy trafiają do jednego maila, cudze - nie
+        self.assertIn('Dom 1', by_recipient['jan@example.com'].body)
+        self.assertIn('Dom 2', by_recipient['jan@example.com'].body)
+        self.assertNotIn('Działka 1', by_recipient['jan@example.com'].body)
+        self.assertIn('Działka 1', by_recipient['dzialka@example.com'].body)
+        self.assertEqual(by_recipient['anna@example.com'].subject, '⚠️ Alerty - Mieszkanie')
+
+    def test_sent_alerts_are_updated_in_bulk(self):
+        for number in range(5):
+            self._alert(self.home, f'Alert {number}')
+            self._alert(self.flat, f'Alert {number}')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(dispatch_alert_emails(), 2)
+
+        alert_updates = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE') and '"sensors_alert"' in query['sql']
+        ]
+        self.assertEqual(len(alert_updates), 1)
+        self.assertFalse(Alert.objects.filter(email_pending=True).exists())
+        self.assertEqual(Alert.objects.filter(email_sent=True).count(), 10)
+
+        # Kolejne wywołanie nie wysyła niczego ponownie
+        self.assertEqual(dispatch_alert_emails(), 0)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_hourly_frequency_limits_emails(self):
+        now = timezone.now()
+        UserSettings.objects.create(
+            user=self.jan, alert_frequency='hourly', last_alert_email_at=now - timedelta(minutes=30)
+        )
+        alert = self._alert(self.home)
+
+        # Mniej niż godzina od poprzedniego maila - alert czeka w kolejce
+        self.assertEqual(dispatch_alert_emails(now=now), 0)
+        self.assertEqual(mail.outbox, [])
+        alert.refresh_from_db()
+        self.assertTrue(alert.email_pending)
+        self.assertFalse(alert.email_sent)
+
+        later = now + timedelta(minutes=31)
+        self.assertEqual(dispatch_alert_emails(now=later), 1)
+        alert.refresh_from_db()
+        self.assertTrue(alert.email_sent)
+        self.assertFalse(alert.email_pending)
+        self.assertEqual(UserSettings.objects.get(user=self.jan).last_alert_email_at, later)
+
+        # Następny alert w tej samej godzinie znów czeka
+        self._alert(self.home)
+        self.assertEqual(dispatch_alert_emails(now=later + timedelta(minutes=5)), 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_disabled_email_alerts_are_dropped_from_queue(self):
+        UserSettings.objects.create(user=self.anna, email_alerts=False)
+        alert = self._alert(self.flat)
+
+        self.assertEqual(dispatch_alert_emails(), 0)
+        self.assertEqual(mail.outbox, [])
+        alert.refresh_from_db()
+        self.assertFalse(alert.email_pending)
+        self.assertFalse(alert.email_sent)
+
+
+class RollupCatchUpTests(TestCase):
+    """Nadrabianie agregatów godzinowych po przerwie w działaniu harmonogramu."""
+
+    def setUp(self):
+        user = User.objects.create_user('jan', password='x')
+        house = House.objects.create(user=user, name='Dom')
+        self.sensor = Sensor.objects.create(house=house, sensor_id='S1', name='Kuchnia')
+        self.now = timezone.now()
+        # Odczyt co 10 minut przez ostatnie 14 godzin
+        SensorData.objects.bulk_create([
+            SensorData(sensor=self.sensor, timestamp=self.now - timedelta(minutes=10 * i), voltage=230.0,
+                       current=1.0, power=230.0, energy=1.0, frequency=50.0, pf=1.0)
+            for i in range(14 * 6)
+        ])
+        self.job_state = ScheduledJob.objects.create(name='refresh_hourly_rollups')
+
+    def _run(self, func):
+        job = Job('refresh_hourly_rollups', func, every=3600)
+        self.assertTrue(claim(job, 'test', force=True))
+        run_job(job, 'test')
+
+    def _hours_since(self, moment):
+        return SensorHourlyRollup.objects.filter(
+            sensor=self.sensor, hour_start__gte=floor_hour(moment)
+        ).count()
+
+    def _set_watermark(self, moment):
+        ScheduledJob.objects.filter(pk=self.job_state.pk).update(
+            last_success_at=moment, last_success_started_at=moment
+        )
+
+    def test_without_watermark_refreshes_default_window(self):
+        refresh_hourly_rollups(end=self.now)
+        self.assertEqual(SensorHourlyRollup.objects.count(), settings.ROLLUP_REFRESH_HOURS + 1)
+
+    def test_recent_watermark_refreshes_default_window(self):
+        self._set_watermark(self.now - timedelta(minutes=5))
+        refresh_hourly_rollups(end=self.now)
+        self.assertEqual(SensorHourlyRollup.objects.count(), settings.ROLLUP_REFRESH_HOURS + 1)
+
+    def test_old_watermark_catches_up(self):
+        self._set_watermark(self.now - timedelta(hours=10))
+        refresh_hourly_rollups(end=self.now)
+        self.assertEqual(SensorHourlyRollup.objects.count(), 11)
+        self.assertEqual(
+            SensorHourlyRollup.objects.order_by('hour_start').first().hour_start,
+            floor_hour(self.now - timedelta(hours=10)),
+        )
+
+    def test_failed_run_does_not_skip_missing_hours(self):
+        last_success = self.now - timedelta(hours=12)
+        self._set_watermark(last_success)
+
+        def fail():
+            raise RuntimeError("awaria")
+
+        with self.assertLogs('sensors.scheduler', 'ERROR'):
+            self._run(fail)
+        self.assertEqual(rollups_complete_until(), last_success)
+
+        self._run(refresh_hourly_rollups_job)
+        # Wszystkie godziny od ostatniego sukcesu (12 pełnych + bieżąca)
+        self.assertEqual(self._hours_since(last_success), 13)
+        self.assertGreaterEqual(rollups_complete_until(), self.now)
+
+
+class LoadProfileCacheTests(TestCase):
+    """Zapamiętywanie tygodni profilu zużycia tylko przy kompletnych agregatach."""
+
+    def setUp(self):
+        user = User.objects.create_user('jan', password='x')
+        self.house = House.objects.create(user=user, name='Dom')
+        self.sensor = Sensor.objects.create(house=self.house, sensor_id='S1', name='Kuchnia')
+        # Tydzień sprzed dwóch tygodni - na pewno zamknięty
+        today = timezone.localdate()
+        self.monday = today - timedelta(days=today.weekday() + 14)
+        self.sunday = self.monday + timedelta(days=6)
+        week_start = timezone.make_aware(datetime.combine(self.monday, time.min))
+        self.week_end = week_start + timedelta(days=7)
+        now = timezone.now()
+        readings, moment = [], week_start - timedelta(minutes=10)
+        while moment < now:
+            readings.append(SensorData(sensor=self.sensor, timestamp=moment, voltage=230.0, current=1.0,
+                                       power=230.0, energy=1.0, frequency=50.0, pf=1.0))
+            moment += timedelta(minutes=10)
+        SensorData.objects.bulk_create(readings)
+        # Agregaty są policzone do środy; ostatni udany przebieg zaczął się wtedy
+        self.watermark = week_start + timedelta(days=2)
+        refresh_hourly_rollups(week_start - timedelta(hours=1), self.watermark - timedelta(seconds=1))
+        ScheduledJob.objects.create(
+            name='refresh_hourly_rollups', last_success_at=self.watermark, last_success_started_at=self.watermark
+        )
+
+    def _run(self, func):
+        job = Job('refresh_hourly_rollups', func, every=3600)
+        self.assertTrue(claim(job, 'test', force=True))
+        run_job(job, 'test')
+
+    def _profile(self):
+        return load_profile(self.house, self.monday, self.sunday)
+
+    def test_week_after_watermark_is_not_stored(self):
+        profile = self._profile()
+        self.assertEqual(profile['cached_weeks'], 0)
+        self.assertFalse(LoadProfileWeek.objects.exists())
+
+    def test_failed_run_keeps_incomplete_week_out_of_cache(self):
+        def fail():
+            raise RuntimeError("awaria")
+
+        with self.assertLogs('sensors.scheduler', 'ERROR'):
+            self._run(fail)
+        self._profile()
+        self.assertFalse(LoadProfileWeek.objects.exists())
+
+        # Udany przebieg nadrabia godziny od znacznika - tydzień jest kompletny
+        self._run(refresh_hourly_rollups_job)
+        profile = self._profile()
+        self.assertEqual(profile['cached_weeks'], 0)
+        stored = LoadProfileWeek.objects.get(house=self.house, sensor=None, week_start=self.monday)
+        week_hours = SensorHourlyRollup.objects.filter(
+            sensor=self.sensor, hour_start__gte=self.week_end - timedelta(days=7), hour_start__lt=self.week_end
+        ).count()
+        self.assertGreaterEqual(week_hours, 7 * 24)
+        self.assertEqual(sum(hours for _, hours in stored.cells), week_hours)
+
+        cached = self._profile()
+        self.assertEqual(cached['cached_weeks'], 1)
+        self.assertEqual(cached['kwh'], profile['kwh'])
+
+
+class AlertWorkerLeaseTests(TestCase):
+    """Dzierżawa run_alert_worker - kolejkę przetwarza tylko jedna instancja."""
+
+    def test_lease_is_exclusive_until_expired(self):
+        self.assertTrue(hold_lease('worker', 'a', 120))
+        self.assertFalse(hold_lease('worker', 'b', 120))
+        # Właściciel przedłuża swoją dzierżawę
+        self.assertTrue(hold_lease('worker', 'a', 120))
+
+        ScheduledJob.objects.filter(name='worker').update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(hold_lease('worker', 'b', 120))
+        self.assertFalse(hold_lease('worker', 'a', 120))
+
+    def test_released_lease_is_free(self):
+        self.assertTrue(hold_lease('worker', 'a', 120))
+        release_lease('worker', 'b')
+        self.assertFalse(hold_lease('worker', 'b', 120))
+        release_lease('worker', 'a')
+        self.assertTrue(hold_lease('worker', 'b', 120))
+
+    def test_batches_stop_when_lease_is_lost(self):
+        user = User.objects.create_user('jan', password='x')
+        house = House.objects.create(user=user, name='Dom')
+        now = timezone.now()
+        for sensor_id in ('S1', 'S2'):
+            sensor = Sensor.objects.create(house=house, sensor_id=sensor_id, name=sensor_id)
+            PendingReadingBatch.objects.create(sensor=sensor, ts_from=now - timedelta(minutes=1), ts_to=now)
+        self.assertTrue(hold_lease('run_alert_worker', 'a', 120))
+
+        calls = []
+
+        def keep_lease():
+            # W trakcie pierwszego czujnika dzierżawę przejmuje inna instancja
+            if calls:
+                ScheduledJob.objects.filter(name='run_alert_worker').update(lease_owner='b')
+            calls.append(1)
+            return hold_lease('run_alert_worker', 'a', 120)
+
+        with self.assertLogs('sensors.ingest', 'WARNING'):
+            self.assertEqual(process_pending_batches(keep_lease=keep_lease), 1)
+        # Paczka nieprzetworzonego czujnika zostaje dla nowego właściciela dzierżawy
+        self.assertEqual(PendingReadingBatch.objects.count(), 1)
+        self.assertEqual(len(calls), 2)
+
+
+class ScheduledJobClaimTests(TestCase):
+    """Przejmowanie zadań harmonogramu - w danej chwili wykonuje je jedna instancja."""
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.job = Job('test_job', lambda: 'ok', every=60, lease_seconds=600)
+        sync_jobs([self.job], now=self.now - timedelta(minutes=5))
+
+    def _state(self):
+        return ScheduledJob.objects.get(name='test_job')
+
+    def _expire_lease(self):
+        ScheduledJob.objects.filter(name='test_job').update(lease_expires_at=self.now - timedelta(seconds=1))
+
+    def test_claim_is_exclusive_while_lease_is_valid(self):
+        self.assertTrue(claim(self.job, 'a', self.now))
+        state = self._state()
+        self.assertEqual(state.lease_owner, 'a')
+        self.assertGreater(state.next_run_at, self.now)
+
+        # Również wymuszone uruchomienie czeka na wygaśnięcie dzierżawy
+        ScheduledJob.objects.filter(name='test_job').update(next_run_at=self.now)
+        self.assertFalse(claim(self.job, 'b', self.now))
+        self.assertFalse(claim(self.job, 'b', self.now, force=True))
+        self.assertEqual(self._state().lease_owner, 'a')
+
+    def test_expired_lease_is_taken_over(self):
+        self.assertTrue(claim(self.job, 'a', self.now))
+        self._expire_lease()
+        ScheduledJob.objects.filter(name='test_job').update(next_run_at=self.now)
+
+        self.assertTrue(claim(self.job, 'b', self.now))
+        self.assertEqual(self._state().lease_owner, 'b')
+        # Poprzedni właściciel nie przedłuży już cudzej dzierżawy
+        self.assertFalse(renew(self.job, 'a'))
+        self.assertTrue(renew(self.job, 'b'))
+
+    def test_force_ignores_schedule_but_not_lease(self):
+        self.assertTrue(claim(self.job, 'a', self.now))
+        self._expire_lease()
+        next_run_at = self._state().next_run_at
+
+        # Termin jeszcze nie minął - zwykłe przejęcie się nie uda, wymuszone tak
+        self.assertFalse(claim(self.job, 'b', self.now))
+        self.assertTrue(claim(self.job, 'b', self.now, force=True))
+        self.assertEqual(self._state().next_run_at, next_run_at)
+
+    def test_disabled_job_is_not_claimed(self):
+        ScheduledJob.objects.filter(name='test_job').update(is_enabled=False)
+        self.assertFalse(claim(self.job, 'a', self.now))
+        self.assertTrue(claim(self.job, 'a', self.now, force=True))
@@ -0,0 +1,174 @@
+"""
+Kontrola przyjmowania odczytów (admission control).
+
+Kubełki tokenów w pamięci procesu:
+- na czujnik - tokeny to odczyty (INGEST_SENSOR_RATE odczytów/s),
+- na poświadczenie (klucz urządzenia lub token admina) - tokeny to żądania.
+
+Paczka jest przyjmowana tylko wtedy, gdy wszystkie jej kubełki mają dość
+tokenów; inaczej dostaje 429 z Retry-After i nie zużywa niczego. Gdy przyjmowanie
+danych nie nadąża (opóźnienie > INGEST_LAG_READ_THRESHOLD), odczyty dashboardu
+są ograniczane (DashboardReadThrottle), żeby zostawić bazę zapisom.
+
+Liczniki (throttle_stats) pokazuje ingest_status_view. Przy wielu workerach
+każdy proces ma własne kubełki i liczniki.
+"""
+import math
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.throttling import BaseThrottle
+
+from . import ingest_buffer
+from .authentication import DeviceIdentity
+from .models import PendingReadingBatch
+
+
+class TokenBucket:
+    """Kubełek tokenów: `rate` tokenów na sekundę, najwyżej `capacity`."""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity, now=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def refill(self, now):
+        # `now` odczytany przed utworzeniem kubełka nie może zabierać tokenów
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = max(self.updated, now)
+
+    def wait_time(self, cost):
+        """Ile sekund trzeba poczekać na `cost` tokenów (0 - od razu)."""
+        # Paczka większa niż pojemność potrzebuje pełnego kubełka
+        missing = min(cost, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def consume(self, cost):
+        self.tokens -= min(cost, self.capacity)
+
+
+_buckets = {}
+_lock = threading.Lock()
+_counters = Counter()        # przyjęte/odrzucone paczki i odczyty dashboardu
+_throttled_by = Counter()    # klucz kubełka -> liczba odrzuconych paczek
+
+
+def _bucket(key, rate, capacity, now):
+    bucket = _buckets.get(key)
+    if bucket is None:
+        if len(_buckets) >= settings.INGEST_BUCKETS_MAX:
+            # Pełne kubełki niczym nie różnią się od nowych - można je zapomnieć
+            for stale_key, stale in list(_buckets.items()):
+                stale.refill(now)
+                if stale.tokens >= stale.capacity:
+                    del _buckets[stale_key]
+        bucket = _buckets[key] = TokenBucket(rate, capacity, now)
+    bucket.refill(now)
+    return bucket
+
+
+def credential_key(request):
+    """Klucz kubełka poświadczenia: urządzenie albo użytkownik (token admina)."""
+    if isinstance(request.auth, DeviceIdentity):
+        return f"device:{request.auth.id}"
+    return f"user:{request.user.id}"
+
+
+def admit_batch(credential, readings):
+    """
+    Sprawdza i zużywa tokeny dla paczki. Zwraca 0, gdy paczka jest przyjęta,
+    albo liczbę sekund, po której warto ponowić (Retry-After).
+    """
+    per_sensor = Counter(reading['sensor_id'] for reading in readings)
+    now = time.monotonic()
+    with _lock:
+        costs = [(_bucket(credential, settings.INGEST_CREDENTIAL_RATE,
+                          settings.INGEST_CREDENTIAL_BURST, now), credential, 1)]
+        for sensor_id, count in per_sensor.items():
+            key = f"sensor:{sensor_id}"
+            costs.append((_bucket(key, settings.INGEST_SENSOR_RATE,
+                                  settings.INGEST_SENSOR_BURST, now), key, count))
+
+        waits = [(bucket.wait_time(cost), key) for bucket, key, cost in costs]
+        wait = max(w for w, _ in waits)
+        if wait > 0:
+            _counters['throttled_batches'] += 1
+            for w, key in waits:
+                if w > 0:
+                    _throttled_by[key] += 1
+            return wait
+
+        for bucket, _, cost in costs:
+            bucket.consume(cost)
+        _counters['admitted_batches'] += 1
+    return 0
+
+
+def retry_after_header(wait):
+    return str(max(1, math.ceil(wait)))
+
+
+_lag = {'value': 0.0, 'checked': 0.0}
+
+
+def ingest_lag_seconds():
+    """
+    Opóźnienie przetwarzania odczytów: wiek najstarszego odczytu w buforze
+    zapisu lub najstarszej paczki w kolejce alertów. Sprawdzane co
+    INGEST_LAG_CHECK_INTERVAL sekund.
+    """
+    now = time.monotonic()
+    if now - _lag['checked'] >= settings.INGEST_LAG_CHECK_INTERVAL:
+        oldest_batch = PendingReadingBatch.objects.order_by('id').values_list('created_at', flat=True).first()
+        queue_lag = (timezone.now() - oldest_batch).total_seconds() if oldest_batch else 0.0
+        _lag['value'] = max(ingest_buffer.stats()['lag_seconds'], queue_lag)
+        _lag['checked'] = now
+    return _lag['value']
+
+
+class DashboardReadThrottle(BaseThrottle):
+    """
+    Ogranicza odczyty dashboardu, gdy przyjmowanie danych nie nadąża.
+    Przy normalnym opóźnieniu przepuszcza wszystko.
+    """
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        if ingest_lag_seconds() <= settings.INGEST_LAG_READ_THRESHOLD:
+            return True
+
+        now = time.monotonic()
+        key = f"read:{self.get_ident(request) if request.user.is_anonymous else request.user.id}"
+        with _lock:
+            bucket = _bucket(key, settings.DASHBOARD_DEGRADED_READ_RATE,
+                             settings.DASHBOARD_DEGRADED_READ_BURST, now)
+            wait = bucket.wait_time(1)
+            if wait > 0:
+                _counters['throttled_reads'] += 1
+                self.wait_seconds = wait
+                return False
+            bucket.consume(1)
+        return True
+
+    def wait(self):
+        return self.wait_seconds
+
+
+def throttle_stats(top=10):
+    """Liczniki kontroli przyjmowania dla ingest_status_view."""
+    with _lock:
+        return {
+            'admitted_batches': _counters['admitted_batches'],
+            'throttled_batches': _counters['throttled_batches'],
+            'throttled_reads': _counters['throttled_reads'],
+            'top_throttled': [
+                {'key': key, 'count': count} for key, count in _throttled_by.most_common(top)
+            ],
+            'ingest_lag_seconds': round(_lag['value'], 3),
+        }
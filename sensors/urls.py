@@ -1,4 +1,4 @@
-from django.urls import path, include
+from django.urls import path, include, register_converter
 from rest_framework.routers import DefaultRouter
 from .views import (
     # API ViewSets
@@ -6,8 +6,9 @@ from .views import (
     UserHouseViewSet, UserSensorViewSet, AlertViewSet,
     UserSettingsViewSet, # NOWY IMPORT
     # API Functions
-    sensor_data_view, add_sensor_data, receive_sensor_readings, 
+    sensor_data_view, add_sensor_data, receive_sensor_readings, receive_sensor_readings_stream, 
     live_data_view, user_me_view, # NOWY IMPORT
+    ingest_status_view, backfill_upload_view, backfill_complete_view,
     # HTML Views
     dashboard, sensor_detail, register, profile, settings_view,
     alerts_view, create_alert, comparison_view, 
@@ -15,6 +16,14 @@ from .views import (
     admin_sensor_list_view,
 )
 
+from .async_views import (
+    async_sensor_data_view, async_live_data_view,
+    async_house_live_view, async_houses_live_view
+)
+from .converters import UploadIdConverter
+
+register_converter(UploadIdConverter, 'upload_id')
+
 # --- ŚCIEŻKI API ---
 router = DefaultRouter()
 router.register(r'admin/houses', AdminHouseViewSet, basename='admin-houses')
@@ -35,6 +44,15 @@ api_urlpatterns = [
     path('user/sensor/<int:sensor_id>/live/', live_data_view, name='live-data'),
     path('admin/sensor/data/', add_sensor_data, name='add-sensor-data'), # Ten URL wydaje się nieużywany, ale zostawiam
     path('admin/sensor/readings/', receive_sensor_readings, name='receive-sensor-readings'),
+    path('admin/sensor/readings/stream/', receive_sensor_readings_stream, name='receive-sensor-readings-stream'),
+    path('admin/ingest/status/', ingest_status_view, name='ingest-status'),
+    # Wersje async (pod ASGI) najczęściej odpytywanych endpointów
+    path('async/user/sensor/<int:sensor_id>/data/', async_sensor_data_view, name='async-sensor-data'),
+    path('async/user/sensor/<int:sensor_id>/live/', async_live_data_view, name='async-live-data'),
+    path('async/user/houses/live/', async_houses_live_view, name='async-houses-live'),
+    path('async/user/houses/<int:house_id>/live/', async_house_live_view, name='async-house-live'),
+    path('admin/sensor/backfill/<upload_id:upload_id>/', backfill_upload_view, name='backfill-upload'),
+    path('admin/sensor/backfill/<upload_id:upload_id>/complete/', backfill_complete_view, name='backfill-complete'),
 ]
 
 # --- ŚCIEŻKI HTML (WEB) ---
@@ -1,29 +1,34 @@
 import hmac
 import hashlib
+import json
 import math
 from datetime import timedelta
 from calendar import monthrange
 
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.cache import cache
+from django.db.models import OuterRef, Q, Subquery
 from django.utils import timezone
-from .models import Alert, ActivityLog, SensorData, Sensor # Importuj Sensor
+from django.utils.cache import parse_etags, quote_etag
+from .models import Alert, ActivityLog, SensorData, Sensor, EnergyPeriodCache
+from .alert_rules import check_threshold_rules
+from .anomaly import detect_power_anomaly
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-def sign_data(value, timestamp):
-    """Podpisuje dane HMAC"""
+def sign_data(value, timestamp, secret=None):
+    """Podpisuje dane HMAC (domyślnie kluczem SENSOR_DATA_SECRET)"""
     message = f"{value}-{timestamp}".encode('utf-8')
-    secret = settings.SENSOR_DATA_SECRET.encode('utf-8')
+    secret = (secret or settings.SENSOR_DATA_SECRET).encode('utf-8')
     signature = hmac.new(secret, message, digestmod=hashlib.sha256).hexdigest()
     return signature
 
 
-def verify_signature(value, timestamp, signature):
+def verify_signature(value, timestamp, signature, secret=None):
     """Weryfikuje podpis HMAC"""
-    expected = sign_data(value, timestamp)
+    expected = sign_data(value, timestamp, secret)
     return hmac.compare_digest(expected, signature)
 
 
@@ -48,40 +53,173 @@ def calculate_reactive_power(power, pf):
         return 0.0
 
 
-def check_alerts(sensor, sensor_data):
+# Pola SensorData, które można pobrać w formacie kolumnowym (?format=columnar)
+COLUMNAR_FIELDS = ('voltage', 'current', 'power', 'energy', 'frequency', 'pf', 'reactive_power')
+
+
+def parse_columnar_fields(param):
+    """
+    Pola z ?fields=power,voltage bez powtórzeń, w kolejności podania
+    (brak parametru - wszystkie). Zwraca (pola, nieznane pola).
+    """
+    if not param:
+        return COLUMNAR_FIELDS, []
+    fields = tuple(dict.fromkeys(f.strip() for f in param.split(',') if f.strip()))
+    return fields, [f for f in fields if f not in COLUMNAR_FIELDS]
+
+
+def sensor_data_columns(queryset, fields=COLUMNAR_FIELDS):
+    """
+    Buduje odpowiedź kolumnową {'ts': [...], 'power': [...], ...}.
+
+    Wiersze pobierane są przez values_list (bez tworzenia instancji modelu
+    ani serializera). 'ts' to czas epoch w milisekundach.
+    """
+    return columns_from_rows(queryset.values_list('timestamp', *fields), fields)
+
+
+def columns_from_rows(rows, fields):
+    """Składa kolumny z wierszy (timestamp, *fields) - wspólne dla widoków sync i async."""
+    columns = {'ts': []}
+    for field in fields:
+        columns[field] = []
+
+    ts_column = columns['ts']
+    value_columns = [columns[field] for field in fields]
+
+    for row in rows:
+        ts_column.append(int(row[0].timestamp() * 1000))
+        for column, value in zip(value_columns, row[1:]):
+            column.append(value)
+
+    return columns
+
+
+# Pola ostatniego odczytu dołączane do czujnika przez with_latest_reading()
+LIVE_FIELDS = ('timestamp', 'power', 'voltage', 'current', 'pf')
+
+
+def with_latest_reading(sensors_queryset):
     """
-    Sprawdza alerty czasu rzeczywistego (dla przychodzących danych).
+    Dołącza do zapytania o czujniki pola ostatniego odczytu (latest_power itd.).
+
+    Wszystko trafia do jednego zapytania SQL (podzapytania skorelowane),
+    więc lista czujników z danymi live to jedno zapytanie, a nie N.
+    """
+    latest = SensorData.objects.filter(sensor=OuterRef('pk')).order_by('-timestamp')
+    annotations = {
+        f'latest_{field}': Subquery(latest.values(field)[:1])
+        for field in LIVE_FIELDS
+    }
+    return sensors_queryset.select_related('house').annotate(**annotations)
+
+
+def payload_etag(payload):
+    """Silny ETag treści odpowiedzi (skrót JSON-a)."""
+    digest = hashlib.md5(
+        json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+    return quote_etag(digest)
+
+
+def etag_matches(if_none_match, etag):
+    """Czy nagłówek If-None-Match obejmuje ETag (także słabą wersję W/)."""
+    if not if_none_match:
+        return False
+    client_etags = parse_etags(if_none_match)
+    return '*' in client_etags or etag in client_etags or f'W/{etag}' in client_etags
+
+
+def build_live_summary(sensors, now=None):
+    """
+    Grupuje czujniki (z with_latest_reading) po domach i liczy moc oraz koszt/h.
+
+    Zwraca listę słowników domów. Moc całkowita to suma mocy czujników online.
+    """
+    now = now or timezone.now()
+    houses = {}
+
+    for sensor in sensors:
+        house = sensor.house
+        entry = houses.get(house.id)
+        if entry is None:
+            entry = houses[house.id] = {
+                'house_id': house.id,
+                'name': house.name,
+                'price_per_kwh': house.price_per_kwh,
+                'total_power': 0.0,
+                'cost_per_hour': 0.0,
+                'online_count': 0,
+                'sensors': [],
+            }
+
+        timestamp = sensor.latest_timestamp
+        is_online = bool(
+            timestamp and (now - timestamp) < timedelta(seconds=sensor.offline_threshold_seconds)
+        )
+        power = sensor.latest_power or 0
+        cost_per_hour = (power / 1000.0) * house.price_per_kwh if power else 0
+
+        entry['sensors'].append({
+            'id': sensor.id,
+            'name': sensor.name,
+            'timestamp': timestamp,
+            'power': sensor.latest_power,
+            'voltage': sensor.latest_voltage,
+            'current': sensor.latest_current,
+            'pf': sensor.latest_pf,
+            'is_online': is_online,
+            'cost_per_hour': cost_per_hour,
+        })
+        if is_online:
+            entry['online_count'] += 1
+            entry['total_power'] += power
+            entry['cost_per_hour'] += cost_per_hour
+
+    return list(houses.values())
+
+
+def _extreme_reading(readings, field, pick):
+    """Odczyt z największą/najmniejszą (pick=max/min) niepustą wartością pola."""
+    return pick(
+        (r for r in readings if getattr(r, field)),
+        key=lambda r: getattr(r, field),
+        default=None
+    )
+
+
+def check_alerts(sensor, readings):
+    """
+    Sprawdza alerty czasu rzeczywistego dla paczki nowych odczytów czujnika.
+
+    readings - odczyty (SensorData) jednego czujnika posortowane po czasie.
+    Progi mocy i prądu oraz anomalie zużycia są liczone odczyt po odczycie
+    (sensors.alert_rules, sensors.anomaly); pozostałe reguły są sprawdzane
+    raz na paczkę, na najgorszym odczycie.
     """
     alerts_created = []
+    if not readings:
+        return alerts_created
     now = timezone.now()
 
-    # 1. Alert przekroczenia mocy (z progu w modelu)
-    if sensor.power_threshold and sensor_data.power and sensor_data.power > sensor.power_threshold:
-        if not Alert.objects.filter(
-            sensor=sensor,
-            alert_type='power_high',
-            is_resolved=False, # Szukamy nierozwiązanego
-            created_at__gte=now - timedelta(minutes=10)
-        ).exists():
-            alert = Alert.objects.create(
-                house=sensor.house, sensor=sensor,
-                alert_type='power_high', severity='warning',
-                message=f"Czujnik '{sensor.name}' przekroczył próg mocy!",
-                value=sensor_data.power, threshold=sensor.power_threshold
-            )
-            alerts_created.append(alert)
-    
+    # 1. Alerty przekroczenia mocy i prądu (progi, czas trwania i histereza z modelu)
+    alerts_created.extend(check_threshold_rules(sensor, readings))
+
     # 2. Alert anomalii napięcia (z progów w modelu)
     voltage_alert_message = None
     threshold = None
-    
-    if sensor.voltage_min_threshold and sensor_data.voltage and sensor_data.voltage < sensor.voltage_min_threshold:
+
+    sensor_data = _extreme_reading(readings, 'voltage', min)
+    if sensor.voltage_min_threshold and sensor_data and sensor_data.voltage < sensor.voltage_min_threshold:
         voltage_alert_message = f"Napięcie spadło poniżej progu: {sensor_data.voltage:.1f} V"
         threshold = sensor.voltage_min_threshold
-        
-    if sensor.voltage_max_threshold and sensor_data.voltage and sensor_data.voltage > sensor.voltage_max_threshold:
+        voltage_reading = sensor_data
+
+    sensor_data = _extreme_reading(readings, 'voltage', max)
+    if sensor.voltage_max_threshold and sensor_data and sensor_data.voltage > sensor.voltage_max_threshold:
         voltage_alert_message = f"Napięcie przekroczyło próg: {sensor_data.voltage:.1f} V"
         threshold = sensor.voltage_max_threshold
+        voltage_reading = sensor_data
 
     if voltage_alert_message:
         if not Alert.objects.filter(
@@ -94,37 +232,20 @@ def check_alerts(sensor, sensor_data):
                 house=sensor.house, sensor=sensor,
                 alert_type='voltage_anomaly', severity='critical',
                 message=f"Anomalia napięcia na '{sensor.name}': {voltage_alert_message}",
-                value=sensor_data.voltage, threshold=threshold
-            )
-            alerts_created.append(alert)
-
-    #
-    #  Alert przekroczenia prądu
-    #
-    if sensor.current_max_threshold and sensor_data.current and sensor_data.current > sensor.current_max_threshold:
-        if not Alert.objects.filter(
-            sensor=sensor,
-            alert_type='current_high',
-            is_resolved=False,
-            created_at__gte=now - timedelta(minutes=10) # Co 10 minut
-        ).exists():
-            alert = Alert.objects.create(
-                house=sensor.house, sensor=sensor,
-                alert_type='current_high',
-                severity='critical', # Tak jak prosiłeś
-                message=f"KRYTYCZNE: Czujnik '{sensor.name}' przekroczył próg prądu!",
-                value=sensor_data.current,
-                threshold=sensor.current_max_threshold
+                value=voltage_reading.voltage, threshold=threshold
             )
             alerts_created.append(alert)
 
+    # 3. Alert "Czujnik Wrócił Online" - przerwa przed paczką lub wewnątrz niej
+    previous_timestamp = sensor.data.filter(
+        timestamp__lt=readings[0].timestamp
+    ).order_by('-timestamp').values_list('timestamp', flat=True).first()
+    timestamps = [r.timestamp for r in readings]
+    if previous_timestamp:
+        timestamps.insert(0, previous_timestamp)
+    if len(timestamps) >= 2:
+        time_diff = max(b - a for a, b in zip(timestamps, timestamps[1:]))
 
-
-    # 4. Alert "Czujnik Wrócił Online"
-    last_two = sensor.data.order_by('-timestamp')[:2]
-    if len(last_two) == 2:
-        time_diff = last_two[0].timestamp - last_two[1].timestamp
-        
         if time_diff.total_seconds() > sensor.offline_threshold_seconds:
             # Rozwiąż stary alert "offline", jeśli istniał
             Alert.objects.filter(
@@ -147,7 +268,7 @@ def check_alerts(sensor, sensor_data):
                 alerts_created.append(alert)
 
 
-    # 5. Alert limitu miesięcznego
+    # 4. Alert limitu miesięcznego
     if sensor.house.monthly_limit_kwh:
         start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         
@@ -166,55 +287,25 @@ def check_alerts(sensor, sensor_data):
                     value=monthly_energy, threshold=sensor.house.monthly_limit_kwh
                 )
                 alerts_created.append(alert)
+
+    # 5. Nietypowe zużycie względem wzorca dla tej godziny tygodnia
+    alerts_created.extend(detect_power_anomaly(sensor, readings))
     
     if alerts_created:
-        send_alert_email(alerts_created)
+        queue_alert_emails(alerts_created)
 
     return alerts_created
 
 
-def send_alert_email(alerts):
+def queue_alert_emails(alerts):
     """
-    Wysyła email z alertami
+    Oznacza alerty jako oczekujące na email. Wysyłką (natychmiast lub
+    w zbiorczym mailu, wg UserSettings.alert_frequency) zajmuje się
+    notifications.dispatch_alert_emails.
     """
     if not alerts:
         return
-
-    house = alerts[0].house
-    email = house.alert_email or house.user.email
-
-    if not email:
-        return
-
-    subject = f"⚠️ Alerty - {house.name}"
-    message_lines = [
-        f"Witaj {house.user.username},", "",
-        f"Mamy nowe alerty dla domu '{house.name}':", ""
-    ]
-
-    for alert in alerts:
-        message_lines.append(f"• {alert.get_severity_display()}: {alert.message}")
-        if alert.value and alert.threshold:
-            message_lines.append(f"  Wartość: {alert.value:.1f}, Próg: {alert.threshold:.1f}")
-        message_lines.append("")
-
-    message_lines.extend([
-        "Zaloguj się do systemu aby zobaczyć szczegóły.", "",
-        "---", "Energy Monitor System"
-    ])
-    message = "\n".join(message_lines)
-
-    try:
-        send_mail(
-            subject, message,
-            settings.DEFAULT_FROM_EMAIL, [email],
-            fail_silently=False,
-        )
-        for alert in alerts:
-            alert.email_sent = True
-            alert.save(update_fields=['email_sent'])
-    except Exception as e:
-        logger.error(f"Błąd wysyłania emaila: {e}")
+    Alert.objects.filter(pk__in=[alert.pk for alert in alerts]).update(email_pending=True)
 
 
 def log_activity(user, action, model_name, object_id, description, request=None):
@@ -239,10 +330,46 @@ def log_activity(user, action, model_name, object_id, description, request=None)
     )
 
 
+def is_closed_period(end_time, now=None):
+    """
+    Czy okres jest zamknięty - skończył się dawniej niż ENERGY_CACHE_GRACE_SECONDS
+    temu, więc zwykłe (nie spóźnione) odczyty już go nie zmienią.
+    """
+    now = now or timezone.now()
+    return end_time <= now - timedelta(seconds=settings.ENERGY_CACHE_GRACE_SECONDS)
+
+
+def invalidate_energy_cache(sensor, start_time, end_time):
+    """
+    Usuwa zapamiętane zużycie okresów (czujnika i jego domu), w które trafiły
+    spóźnione odczyty z zakresu [start_time, end_time].
+    """
+    deleted, _ = EnergyPeriodCache.objects.filter(
+        Q(sensor=sensor) | Q(house_id=sensor.house_id, sensor__isnull=True),
+        period_start__lte=end_time,
+        period_end__gt=start_time,
+    ).delete()
+    if deleted:
+        logger.info(f"Spóźnione odczyty czujnika {sensor.sensor_id}: usunięto {deleted} wpisów cache energii")
+    return deleted
+
+
 def calculate_energy_for_period(house, start_time, end_time, sensor_id=None):
     """
     Oblicza całkowitą energię (kWh) dla domu w danym okresie.
+
+    Wynik dla zamkniętego okresu jest zapamiętywany w EnergyPeriodCache,
+    więc kolejne wywołania to jedno zapytanie po indeksie.
     """
+    closed = is_closed_period(end_time)
+    if closed:
+        cached_kwh = EnergyPeriodCache.objects.filter(
+            house=house, sensor_id=sensor_id,
+            period_start=start_time, period_end=end_time
+        ).values_list('kwh', flat=True).first()
+        if cached_kwh is not None:
+            return cached_kwh
+
     total_kwh = 0
     
     if sensor_id:
@@ -270,15 +397,19 @@ def calculate_energy_for_period(house, start_time, end_time, sensor_id=None):
         
         total_kwh += sensor_wh / 1000.0
 
-    return total_kwh
+    if closed:
+        EnergyPeriodCache.objects.bulk_create([
+            EnergyPeriodCache(
+                house=house, sensor_id=sensor_id,
+                period_start=start_time, period_end=end_time, kwh=total_kwh
+            )
+        ], ignore_conflicts=True)
 
+    return total_kwh
 
-def get_comparison_data(house, period='month'):
-    """
-    Porównuje zużycie energii między okresami
-    """
-    now = timezone.now()
 
+def comparison_bounds(period, now):
+    """Początek bieżącego okresu oraz [początek, koniec) poprzedniego dla get_comparison_data."""
     if period == 'day':
         current_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
         previous_start = current_start - timedelta(days=1)
@@ -292,6 +423,27 @@ def get_comparison_data(house, period='month'):
         prev_month_day = current_start - timedelta(days=1)
         previous_start = prev_month_day.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         previous_end = current_start
+    return current_start, previous_start, previous_end
+
+
+def monthly_periods(now, count=12):
+    """Ostatnie `count` miesięcy [(początek, koniec)] od najnowszego; bieżący kończy się na `now`."""
+    periods = []
+    month_end = now
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    for _ in range(count):
+        periods.append((month_start, month_end))
+        month_end = month_start
+        month_start = (month_end - timedelta(days=1)).replace(day=1)
+    return periods
+
+
+def get_comparison_data(house, period='month'):
+    """
+    Porównuje zużycie energii między okresami
+    """
+    now = timezone.now()
+    current_start, previous_start, previous_end = comparison_bounds(period, now)
 
     current_kwh = calculate_energy_for_period(house, current_start, now)
     previous_kwh = calculate_energy_for_period(house, previous_start, previous_end)
@@ -343,3 +495,59 @@ def predict_monthly_cost(house):
         'days_remaining': days_in_month - days_passed,
         'daily_average': daily_avg
     }
+
+
+def compute_house_statistics(house):
+    """
+    Liczy komplet statystyk domu: porównania dzień/tydzień/miesiąc,
+    predykcję kosztów i ranking czujników w bieżącym miesiącu.
+    """
+    now = timezone.now()
+    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    sensor_rankings = []
+    for sensor in house.sensors.all():
+        total_kwh = calculate_energy_for_period(house, start_of_month, now, sensor_id=sensor.id)
+        sensor_rankings.append({
+            'sensor_id': sensor.id,
+            'sensor_name': sensor.name,
+            'location': sensor.location,
+            'kwh': round(total_kwh, 2),
+            'cost': round(total_kwh * house.price_per_kwh, 2)
+        })
+    sensor_rankings.sort(key=lambda x: x['kwh'], reverse=True)
+
+    return {
+        'day_comparison': get_comparison_data(house, 'day'),
+        'week_comparison': get_comparison_data(house, 'week'),
+        'month_comparison': get_comparison_data(house, 'month'),
+        'prediction': predict_monthly_cost(house),
+        'sensor_rankings': sensor_rankings,
+    }
+
+
+def _house_statistics_key(house_id):
+    return f"house-statistics:{house_id}:{timezone.localdate().isoformat()}"
+
+
+def invalidate_house_statistics(house_id):
+    """Usuwa statystyki domu z cache (np. po wgraniu zaległych danych)."""
+    cache.delete(_house_statistics_key(house_id))
+
+
+def get_house_statistics(house):
+    """
+    Statystyki domu z cache (klucz: dom + bieżący dzień).
+
+    Wpis jest świeży przez STATISTICS_CACHE_TTL sekund, potem jeszcze przez
+    STATISTICS_CACHE_STALE_TTL zwracany od razu i odświeżany w tle.
+    Równoległe żądania o ten sam dom liczą statystyki tylko raz.
+    """
+    from .cache import get_or_compute
+
+    return get_or_compute(
+        _house_statistics_key(house.id),
+        lambda: compute_house_statistics(house),
+        ttl=settings.STATISTICS_CACHE_TTL,
+        stale_ttl=settings.STATISTICS_CACHE_STALE_TTL,
+    )
@@ -0,0 +1,137 @@
+"""
+Szybka walidacja paczek odczytów.
+
+SensorReadingSerializer(many=True) buduje dla każdego odczytu osobny
+potok walidacji pól, co przy paczkach po tysiące odczytów dominuje czas
+żądania. Tutaj paczka sprawdzana jest kolumnami (jedna pętla na pole,
+bez obiektów pól DRF). Odczyty, których szybka ścieżka nie przepuści,
+sprawdza serializer - dzięki temu komunikaty błędów i kształt odpowiedzi 400
+są identyczne jak przy walidacji samym serializerem.
+"""
+import math
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.settings import api_settings
+
+from .serializers import READING_LIMITS, SensorReadingSerializer
+
+READING_FIELDS = ('sensor_id', 'timestamp', 'voltage', 'current', 'power', 'energy', 'frequency', 'pf')
+_REQUIRED = frozenset(READING_FIELDS)
+
+
+def _check_sensor_ids(column, invalid):
+    values = []
+    for index, value in column:
+        if type(value) is str:
+            value = value.strip()
+            if value:
+                values.append(value)
+                continue
+        invalid.add(index)
+        values.append(None)
+    return values
+
+
+def _check_timestamps(column, invalid):
+    tz = timezone.get_current_timezone()
+    latest = timezone.now() + timedelta(seconds=settings.READING_MAX_FUTURE_SECONDS)
+    values = []
+    for index, value in column:
+        if type(value) is str:
+            try:
+                value = parse_datetime(value)
+            except ValueError:
+                value = None
+        # Czas bez strefy (make_aware) i nietypowe wartości sprawdza serializer
+        if isinstance(value, datetime) and value.tzinfo is not None:
+            value = value.astimezone(tz)
+            if value <= latest:
+                values.append(value)
+                continue
+        invalid.add(index)
+        values.append(None)
+    return values
+
+
+def _check_numbers(column, limits, invalid):
+    low, high = limits
+    if high is None:
+        high = math.inf
+    values = []
+    for index, value in column:
+        # type() zamiast isinstance() - bool nie jest liczbą odczytu;
+        # NaN nie spełnia porównania, inf odpada na górnej granicy
+        if (type(value) is float or type(value) is int) and low <= value < math.inf and value <= high:
+            values.append(float(value))
+        else:
+            invalid.add(index)
+            values.append(None)
+    return values
+
+
+def validate_readings(data):
+    """
+    Waliduje paczkę odczytów (jak SensorReadingSerializer(data=data, many=True)).
+
+    Zwraca (validated, errors): przy poprawnej paczce errors jest None, a validated
+    to lista słowników z polami READING_FIELDS. Przy błędach validated jest None,
+    a errors ma kształt serializer.errors - słownik {indeks: błędy pól}
+    dla niepoprawnych odczytów.
+    """
+    if not isinstance(data, list):
+        serializer = SensorReadingSerializer(data=data, many=True)
+        serializer.is_valid()
+        return None, serializer.errors
+
+    validated, errors = split_valid_readings(data)
+    if not errors:
+        return [reading for _, reading in validated], None
+    if not api_settings.LIST_SERIALIZER_ERRORS_AS_DICT:
+        # Starszy format DRF: lista z {} dla poprawnych odczytów
+        return None, [errors.get(index, {}) for index in range(len(data))]
+    return None, errors
+
+
+def split_valid_readings(data):
+    """
+    Waliduje listę odczytów, nie odrzucając całości przy błędach.
+    Zwraca (validated, errors): lista par (indeks, odczyt) poprawnych odczytów
+    i słownik {indeks: błędy pól} dla niepoprawnych.
+    """
+    invalid = set()
+    rows = []
+    for index, item in enumerate(data):
+        if type(item) is dict and _REQUIRED <= item.keys():
+            rows.append((index, item))
+        else:
+            invalid.add(index)
+
+    columns = {
+        'sensor_id': _check_sensor_ids(((i, item['sensor_id']) for i, item in rows), invalid),
+        'timestamp': _check_timestamps(((i, item['timestamp']) for i, item in rows), invalid),
+    }
+    for field, limits in READING_LIMITS.items():
+        columns[field] = _check_numbers(((i, item[field]) for i, item in rows), limits, invalid)
+
+    validated = [dict(zip(READING_FIELDS, values)) for values in zip(*(columns[f] for f in READING_FIELDS))]
+    if not invalid:
+        return list(zip((i for i, _ in rows), validated)), {}
+
+    # Odrzucone przez szybką ścieżkę: rozstrzyga serializer (np. liczba jako
+    # napis "230.1" jest poprawna, ale przechodzi tylko wolną ścieżką)
+    by_index = dict(zip((i for i, _ in rows), validated))
+    result = []
+    errors = {}
+    for index, item in enumerate(data):
+        if index in invalid:
+            serializer = SensorReadingSerializer(data=item)
+            if serializer.is_valid():
+                result.append((index, dict(serializer.validated_data)))
+            else:
+                errors[index] = serializer.errors
+        else:
+            result.append((index, by_index[index]))
+    return result, errors
@@ -1,15 +1,18 @@
+import json
 import logging
-from datetime import timedelta
-from django.http import HttpResponseForbidden, JsonResponse
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.http import Http404, HttpResponseForbidden, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.models import User
 from django.contrib import messages
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Avg, Max, Min, Count
-from django.db import models
+from django.db.models import Avg, Max, Min, Count, Sum
+from django.db import models, transaction
 
 try:
     from .forms import CustomUserCreationForm
@@ -23,28 +26,62 @@ from rest_framework.decorators import (
     api_view,
     authentication_classes,
     permission_classes,
+    parser_classes,
+    renderer_classes,
+    throttle_classes,
     action
 )
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.renderers import JSONRenderer, BrowsableAPIRenderer
+from rest_framework.parsers import JSONParser
 
-from .models import House, Sensor, SensorData, Alert, UserSettings, ActivityLog
+from .models import (
+    House, Sensor, SensorData, Alert, UserSettings, ActivityLog,
+    PendingReadingBatch, BackfillUpload, ApplianceEvent
+)
 from .serializers import (
     HouseSerializer,
     SensorSerializer,
     SensorDataSerializer,
-    SensorReadingSerializer,
     AlertSerializer,
     UserSettingsSerializer,
-    UserSerializer
+    UserSerializer,
+    ApplianceEventSerializer,
+    AlertBacktestSerializer
+)
+from .renderers import ColumnarJSONRenderer
+from .parsers import MessagePackParser, PackedReadingsParser
+from .ingest import store_readings
+from .validation import validate_readings, split_valid_readings
+from .authentication import DeviceKeyAuthentication, DeviceIdentity, StreamingDeviceKeyAuthentication
+from .permissions import IsDeviceOrAdmin
+from .throttling import (
+    DashboardReadThrottle,
+    admit_batch,
+    credential_key,
+    retry_after_header,
+    throttle_stats
 )
+from . import ingest_buffer
+from .backtest import backtest_alert_rules
+from .demand import billing_month, monthly_peak_summary
+from .fleet import latest_fleet_report
+from .power_quality import power_quality_summary
+from .profiles import load_profile
 from .utils import (
-    calculate_reactive_power,
-    check_alerts,
     log_activity,
     get_comparison_data,
     predict_monthly_cost,
-    calculate_energy_for_period
+    calculate_energy_for_period,
+    monthly_periods,
+    sensor_data_columns,
+    with_latest_reading,
+    build_live_summary,
+    get_house_statistics,
+    payload_etag,
+    etag_matches,
+    parse_columnar_fields
 )
 
 logger = logging.getLogger(__name__)
@@ -122,27 +159,315 @@ def settings_view(request):
 
 #API ENDPOINTS
 
+def ingest_readings(readings):
+    """
+    Zapisuje zwalidowane odczyty zgodnie z INGEST_MODE (bezpośrednio
+    albo przez bufor zapisu) i zwraca odpowiedź HTTP.
+    """
+    if settings.INGEST_MODE == 'buffered':
+        try:
+            queued = ingest_buffer.enqueue(readings)
+        except ingest_buffer.IngestBufferFull:
+            return Response(
+                {"error": "Bufor zapisu jest pełny, spróbuj ponownie później."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '5'}
+            )
+        return Response({"status": "queued", "queued": queued}, status=status.HTTP_202_ACCEPTED)
+
+    result = store_readings(readings)
+    return Response({"status": "ok", **result}, status=status.HTTP_201_CREATED)
+
+
+def _outside_device_scope(request, readings):
+    """Czujniki z paczki, do których klucz urządzenia nie ma uprawnień."""
+    if not isinstance(request.auth, DeviceIdentity):
+        return []
+    return sorted({reading['sensor_id'] for reading in readings} - request.auth.sensor_ids)
+
+
+@csrf_exempt
+@api_view(['POST'])
+@authentication_classes([DeviceKeyAuthentication, TokenAuthentication])
+@permission_classes([IsDeviceOrAdmin])
+@parser_classes([JSONParser, MessagePackParser, PackedReadingsParser])
+def receive_sensor_readings(request):
+    """
+    Przyjmuje paczkę odczytów. Alerty liczone są w tle (run_alert_worker),
+    więc odpowiedź wraca zaraz po zapisaniu danych.
+
+    Formaty: JSON, MessagePack (application/msgpack) oraz spakowane
+    tablice binarne (application/vnd.energy-monitor.packed).
+
+    Uwierzytelnianie: klucz urządzenia (tylko własne czujniki) albo token admina.
+    """
+    # Każdy format (także binarny) przechodzi te same sprawdzenia zakresów i czasu
+    readings, errors = validate_readings(request.data)
+    if errors is not None:
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+    foreign = _outside_device_scope(request, readings)
+    if foreign:
+        return Response(
+            {"error": "Klucz urządzenia nie obejmuje tych czujników.", "sensor_ids": foreign},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    wait = admit_batch(credential_key(request), readings)
+    if wait:
+        return Response(
+            {"error": "Przekroczono limit wysyłania odczytów.", "retry_after": round(wait, 1)},
+            status=status.HTTP_429_TOO_MANY_REQUESTS,
+            headers={'Retry-After': retry_after_header(wait)}
+        )
+    return ingest_readings(readings)
+
+
+def _stream_lines(stream, max_line_bytes):
+    """
+    Czyta treść żądania linia po linii (bez wczytywania całości do pamięci).
+    Zwraca pary (numer linii, bajty); zbyt długa linia daje None zamiast bajtów.
+    """
+    line_number = 0
+    while True:
+        line = stream.readline(max_line_bytes + 1)
+        if not line:
+            return
+        line_number += 1
+        if len(line) > max_line_bytes and not line.endswith(b'\n'):
+            # Pomijamy resztę zbyt długiej linii
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(max_line_bytes + 1)
+            yield line_number, None
+            continue
+        yield line_number, line
+
+
 @csrf_exempt
 @api_view(['POST'])
+@authentication_classes([StreamingDeviceKeyAuthentication, TokenAuthentication])
+@permission_classes([IsDeviceOrAdmin])
+def receive_sensor_readings_stream(request):
+    """
+    Przyjmuje odczyty jako NDJSON (application/x-ndjson) - jeden obiekt JSON
+    w linii, pola jak w receive_sensor_readings.
+
+    Treść czytana jest przyrostowo: co NDJSON_CHUNK_SIZE linii odczyty są
+    walidowane i zapisywane, więc pamięć nie rośnie z rozmiarem wysyłki,
+    a zapis zaczyna się przed końcem wysyłania. Błędne linie są pomijane
+    i zgłaszane w odpowiedzi (numer linii + błędy). Podpisane wysyłki nie są
+    obsługiwane (StreamingDeviceKeyAuthentication).
+
+    Limit wysyłania (admit_batch) jest sprawdzany raz na żądanie - przy
+    pierwszym fragmencie z poprawnymi odczytami, jak dla paczki JSON (koszt
+    ograniczony pojemnością kubełka). Przy pełnym buforze zapisu przetwarzanie
+    kończy się na ostatnim zapisanym fragmencie - `accepted_lines` mówi, od
+    której linii wznowić wysyłkę.
+    """
+    if request.content_type.split(';')[0].strip().lower() != 'application/x-ndjson':
+        return Response({"error": "Wymagany Content-Type: application/x-ndjson."},
+                        status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    summary = {'lines': 0, 'accepted_lines': 0, 'created': 0, 'duplicates': 0, 'queued': 0, 'errors_total': 0}
+    unknown_sensors = set()
+    line_errors = []
+    credential = credential_key(request)
+    admitted = False
+
+    def add_error(line_number, errors):
+        if len(line_errors) < settings.NDJSON_MAX_ERRORS:
+            line_errors.append({'line': line_number, 'errors': errors})
+        summary['errors_total'] += 1
+
+    def flush(line_numbers, items):
+        """Waliduje i zapisuje fragment. Zwraca Response, gdy trzeba przerwać."""
+        nonlocal admitted
+        validated, errors = split_valid_readings(items)
+        for index, item_errors in errors.items():
+            add_error(line_numbers[index], item_errors)
+
+        readings = []
+        scope = request.auth.sensor_ids if isinstance(request.auth, DeviceIdentity) else None
+        for index, reading in validated:
+            if scope is not None and reading['sensor_id'] not in scope:
+                add_error(line_numbers[index], {'sensor_id': ["Klucz urządzenia nie obejmuje tego czujnika."]})
+            else:
+                readings.append(reading)
+
+        if readings and not admitted:
+            wait = admit_batch(credential, readings)
+            if wait:
+                return Response(
+                    {"error": "Przekroczono limit wysyłania odczytów.", "retry_after": round(wait, 1),
+                     **summary, 'unknown_sensors': sorted(unknown_sensors), 'errors': line_errors},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS,
+                    headers={'Retry-After': retry_after_header(wait)}
+                )
+            admitted = True
+        if readings:
+            if settings.INGEST_MODE == 'buffered':
+                try:
+                    summary['queued'] += ingest_buffer.enqueue(readings)
+                except ingest_buffer.IngestBufferFull:
+                    return Response(
+                        {"error": "Bufor zapisu jest pełny, spróbuj ponownie później.",
+                         **summary, 'errors': line_errors},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        headers={'Retry-After': '5'}
+                    )
+            else:
+                result = store_readings(readings)
+                summary['created'] += result['created']
+                summary['duplicates'] += result['duplicates']
+                unknown_sensors.update(result['unknown_sensors'])
+        summary['accepted_lines'] = line_numbers[-1]
+        return None
+
+    line_numbers, items = [], []
+    stream = request.stream
+    for line_number, line in (_stream_lines(stream, settings.NDJSON_MAX_LINE_BYTES) if stream else ()):
+        summary['lines'] = line_number
+        if line is None:
+            add_error(line_number, {'non_field_errors': ["Linia jest za długa."]})
+            continue
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as exc:
+            add_error(line_number, {'non_field_errors': [f"Niepoprawny JSON: {exc}"]})
+            continue
+        line_numbers.append(line_number)
+        items.append(item)
+        if len(items) >= settings.NDJSON_CHUNK_SIZE:
+            stop = flush(line_numbers, items)
+            if stop is not None:
+                return stop
+            line_numbers, items = [], []
+
+    if items:
+        stop = flush(line_numbers, items)
+        if stop is not None:
+            return stop
+    summary['accepted_lines'] = summary['lines']
+
+    accepted = summary['created'] + summary['duplicates'] + summary['queued']
+    if summary['errors_total'] and not accepted:
+        result_status, response_status = "rejected", status.HTTP_400_BAD_REQUEST
+    elif settings.INGEST_MODE == 'buffered':
+        result_status, response_status = "queued", status.HTTP_202_ACCEPTED
+    else:
+        result_status, response_status = "ok", status.HTTP_201_CREATED
+    return Response(
+        {"status": result_status, **summary, 'unknown_sensors': sorted(unknown_sensors), 'errors': line_errors},
+        status=response_status
+    )
+
+
+def _backfill_status(upload):
+    return {
+        'upload_id': upload.upload_id,
+        'offset': upload.received_count,
+        'created': upload.created_count,
+        'duplicates': upload.duplicate_count,
+        'ts_from': upload.ts_from,
+        'ts_to': upload.ts_to,
+        'is_complete': upload.is_complete,
+    }
+
+
+@csrf_exempt
+@api_view(['GET', 'POST'])
 @authentication_classes([TokenAuthentication])
 @permission_classes([IsAdminUser])
-def receive_sensor_readings(request):
-    serializer = SensorReadingSerializer(data=request.data, many=True)
-    if serializer.is_valid():
-        for reading in serializer.validated_data:
-            try: sensor = Sensor.objects.get(sensor_id=reading['sensor_id'])
-            except Sensor.DoesNotExist:
-                logger.warning(f"Sensor {reading['sensor_id']} nie istnieje.")
-                continue
-            reactive_power = calculate_reactive_power(reading['power'], reading['pf'])
-            sensor_data = SensorData.objects.create(
-                sensor=sensor, timestamp=reading['timestamp'], voltage=reading['voltage'],
-                current=reading['current'], power=reading['power'], energy=reading['energy'],
-                frequency=reading['frequency'], pf=reading['pf'], reactive_power=reactive_power
-            )
-            check_alerts(sensor, sensor_data)
-        return Response({"status": "ok"}, status=status.HTTP_201_CREATED)
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+def backfill_upload_view(request, upload_id):
+    """
+    Wznawialne wgrywanie zaległych odczytów.
+
+    GET  - stan wgrywania (offset, od którego kontynuować).
+    POST ?offset=N - kolejny fragment (lista odczytów jak w receive_sensor_readings).
+         Fragment już odebrany jest potwierdzany bez zapisu, a offset większy
+         niż odebrana liczba odczytów kończy się 409 z poprawnym offsetem.
+    Odczyty zapisywane są hurtowo, bez alertów czasu rzeczywistego.
+    """
+    if request.method == 'GET':
+        upload = get_object_or_404(BackfillUpload, upload_id=upload_id)
+        return Response(_backfill_status(upload))
+
+    try:
+        offset = int(request.query_params.get('offset', ''))
+        if offset < 0:
+            raise ValueError
+    except ValueError:
+        return Response({"error": "Wymagany parametr offset (liczba >= 0)."}, status=status.HTTP_400_BAD_REQUEST)
+
+    if isinstance(request.data, list) and len(request.data) > settings.BACKFILL_MAX_CHUNK:
+        return Response(
+            {"error": f"Fragment może mieć najwyżej {settings.BACKFILL_MAX_CHUNK} odczytów."},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+
+    readings, errors = validate_readings(request.data)
+    if errors is not None:
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+    with transaction.atomic():
+        upload, _ = BackfillUpload.objects.select_for_update().get_or_create(
+            upload_id=upload_id, defaults={'created_by': request.user}
+        )
+        if upload.is_complete:
+            return Response({"error": "Wgrywanie zostało już zakończone.", **_backfill_status(upload)},
+                            status=status.HTTP_409_CONFLICT)
+        if offset > upload.received_count:
+            return Response({"error": "Brakuje wcześniejszych fragmentów.", **_backfill_status(upload)},
+                            status=status.HTTP_409_CONFLICT)
+
+        # Pomijamy początek fragmentu, który już dotarł (ponowiona wysyłka)
+        new_readings = readings[upload.received_count - offset:]
+        if new_readings:
+            result = store_readings(new_readings, realtime=False)
+            timestamps = [reading['timestamp'] for reading in new_readings]
+            upload.received_count += len(new_readings)
+            upload.created_count += result['created']
+            upload.duplicate_count += result['duplicates']
+            upload.ts_from = min([upload.ts_from or min(timestamps), *timestamps])
+            upload.ts_to = max([upload.ts_to or max(timestamps), *timestamps])
+            upload.save()
+
+    return Response(_backfill_status(upload), status=status.HTTP_200_OK)
+
+
+@csrf_exempt
+@api_view(['POST'])
+@authentication_classes([TokenAuthentication])
+@permission_classes([IsAdminUser])
+def backfill_complete_view(request, upload_id):
+    """Kończy wgrywanie zaległych odczytów - kolejne fragmenty będą odrzucane."""
+    upload = get_object_or_404(BackfillUpload, upload_id=upload_id)
+    if not upload.is_complete:
+        upload.is_complete = True
+        upload.save(update_fields=['is_complete', 'updated_at'])
+        log_activity(
+            user=request.user, action='create', model_name='BackfillUpload', object_id=upload.id,
+            description=f"Wgrano zaległe dane '{upload.upload_id}': {upload.created_count} odczytów",
+            request=request
+        )
+    return Response(_backfill_status(upload))
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def ingest_status_view(request):
+    """Metryki przyjmowania danych: bufor zapisu, kolejka alertów i limity (kto jest odrzucany)."""
+    oldest_batch = PendingReadingBatch.objects.order_by('id').values_list('created_at', flat=True).first()
+    return Response({
+        'buffer': ingest_buffer.stats(),
+        'alert_queue': {
+            'depth': PendingReadingBatch.objects.count(),
+            'lag_seconds': (timezone.now() - oldest_batch).total_seconds() if oldest_batch else 0.0,
+        },
+        'throttling': throttle_stats(),
+    })
 
 @api_view(['POST'])
 @authentication_classes([TokenAuthentication])
@@ -186,9 +511,50 @@ class AdminSensorViewSet(viewsets.ModelViewSet):
     serializer_class = SensorSerializer
     permission_classes = [IsAdminUser]
 
+def _query_datetime(value):
+    """Data/czas z parametru zapytania (ISO 8601 albo RRRR-MM-DD); bez strefy - czas lokalny."""
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            moment = datetime.combine(day, datetime.min.time()) if day else None
+    except ValueError:
+        return None
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _query_date_range(request, default_days, max_days=None):
+    """
+    Zakres dni z ?from=RRRR-MM-DD&to=RRRR-MM-DD (domyślnie ostatnie
+    `default_days` dni). Zwraca (od, do, None) albo (None, None, odpowiedź 400).
+    """
+    dates = {}
+    for param in ('from', 'to'):
+        value = request.query_params.get(param)
+        try:
+            dates[param] = parse_date(value) if value else None
+        except ValueError:  # poprawny format, ale nieistniejący dzień
+            dates[param] = None
+        if value and dates[param] is None:
+            return None, None, Response({"error": f"Niepoprawna data '{param}' (oczekiwano RRRR-MM-DD)."},
+                                        status=status.HTTP_400_BAD_REQUEST)
+    date_to = dates['to'] or timezone.localdate()
+    date_from = dates['from'] or date_to - timedelta(days=default_days - 1)
+    if date_from > date_to:
+        return None, None, Response({"error": "Data 'from' jest późniejsza niż 'to'."},
+                                    status=status.HTTP_400_BAD_REQUEST)
+    if max_days and (date_to - date_from).days >= max_days:
+        return None, None, Response({"error": f"Zakres może mieć najwyżej {max_days} dni."},
+                                    status=status.HTTP_400_BAD_REQUEST)
+    return date_from, date_to, None
+
+
 class UserHouseViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = HouseSerializer
     permission_classes = [IsAuthenticated]
+    throttle_classes = [DashboardReadThrottle]
 
     def get_queryset(self):
         # Prefetch_related, aby pobrać czujniki jednym zapytaniem
@@ -198,34 +564,106 @@ class UserHouseViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=True, methods=['get'], url_path='statistics')
     def statistics(self, request, pk=None):
         house = self.get_object()
-        
-        day_comparison = get_comparison_data(house, 'day')
-        week_comparison = get_comparison_data(house, 'week')
-        month_comparison = get_comparison_data(house, 'month')
-        prediction = predict_monthly_cost(house)
-        
-        now = timezone.now()
-        start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-        sensor_rankings = []
-        for sensor in house.sensors.all():
-            total_kwh = calculate_energy_for_period(house, start_of_month, now, sensor_id=sensor.id)
-            sensor_rankings.append({
-                'sensor_id': sensor.id,
-                'sensor_name': sensor.name,
-                'location': sensor.location,
-                'kwh': round(total_kwh, 2),
-                'cost': round(total_kwh * house.price_per_kwh, 2)
-            })
-        sensor_rankings.sort(key=lambda x: x['kwh'], reverse=True)
-
+        return Response(get_house_statistics(house), status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'], url_path='events')
+    def events(self, request, pk=None):
+        """
+        Włączenia/wyłączenia urządzeń domu w zakresie ?from=&to= (ISO 8601,
+        domyślnie ostatnia doba); opcjonalnie ?sensor=<id>&kind=on|off.
+        """
+        house = self.get_object()
+        bounds = {}
+        for param in ('from', 'to'):
+            value = request.query_params.get(param)
+            bounds[param] = _query_datetime(value) if value else None
+            if value and bounds[param] is None:
+                return Response({"error": f"Niepoprawna data '{param}' (oczekiwano ISO 8601)."},
+                                status=status.HTTP_400_BAD_REQUEST)
+        end = bounds['to'] or timezone.now()
+        start = bounds['from'] or end - timedelta(days=1)
+
+        events = ApplianceEvent.objects.filter(
+            sensor__house=house, started_at__gte=start, started_at__lt=end
+        ).select_related('sensor').order_by('started_at')
+        sensor_id = request.query_params.get('sensor')
+        if sensor_id:
+            if not sensor_id.isdigit():
+                return Response({"error": "Parametr 'sensor' musi być ID czujnika."}, status=status.HTTP_400_BAD_REQUEST)
+            events = events.filter(sensor_id=sensor_id)
+        kind = request.query_params.get('kind')
+        if kind:
+            events = events.filter(kind=kind)
+
+        limit = settings.APPLIANCE_EVENTS_MAX_RESULTS
+        page = list(events[:limit + 1])
         return Response({
-            'day_comparison': day_comparison,
-            'week_comparison': week_comparison,
-            'month_comparison': month_comparison,
-            'prediction': prediction,
-            'sensor_rankings': sensor_rankings,
-        }, status=status.HTTP_200_OK)
+            'from': start,
+            'to': end,
+            'truncated': len(page) > limit,
+            'events': ApplianceEventSerializer(page[:limit], many=True).data,
+        })
+
+    @action(detail=True, methods=['get'], url_path='profile')
+    def profile(self, request, pk=None):
+        """
+        Profil zużycia domu ?from=&to= (RRRR-MM-DD, domyślnie ostatnie 4 tygodnie):
+        kWh i średnia moc dla każdego dnia tygodnia i godziny (czas lokalny).
+        """
+        house = self.get_object()
+        date_from, date_to, error = _query_date_range(request, default_days=28, max_days=settings.LOAD_PROFILE_MAX_DAYS)
+        if error:
+            return error
+        return Response({'house_id': house.id, **load_profile(house, date_from, date_to)})
+
+    @action(detail=True, methods=['get'], url_path='peaks')
+    def peaks(self, request, pk=None):
+        """
+        Moc szczytowa domu w miesiącu rozliczeniowym ?month=RRRR-MM (domyślnie
+        bieżący): najwyższe średnie 15-minutowe, udział czujników, szczyty czujników.
+        """
+        house = self.get_object()
+        value = request.query_params.get('month')
+        if value:
+            try:
+                month = datetime.strptime(value, '%Y-%m').date()
+            except ValueError:
+                return Response({"error": "Niepoprawny miesiąc (oczekiwano RRRR-MM)."},
+                                status=status.HTTP_400_BAD_REQUEST)
+        else:
+            month = billing_month(timezone.now())
+        return Response(monthly_peak_summary(house, month))
+
+    @action(detail=True, methods=['get'], url_path='live')
+    def live(self, request, pk=None):
+        """Dane live wszystkich czujników domu w jednej odpowiedzi (jedno zapytanie)."""
+        try:
+            house_id = int(pk)
+        except ValueError:
+            raise Http404
+        sensors = with_latest_reading(
+            Sensor.objects.filter(house_id=house_id, house__user=request.user)
+        )
+        houses = build_live_summary(sensors)
+        if not houses:
+            # Dom bez czujników (lub cudzy dom -> 404)
+            house = self.get_object()
+            houses = [{
+                'house_id': house.id, 'name': house.name, 'price_per_kwh': house.price_per_kwh,
+                'total_power': 0.0, 'cost_per_hour': 0.0, 'online_count': 0, 'sensors': [],
+            }]
+        return live_response(request, houses[0])
+
+    @action(detail=False, methods=['get'], url_path='live', url_name='live-all')
+    def live_all(self, request):
+        """Dane live wszystkich czujników użytkownika, pogrupowane po domach."""
+        sensors = with_latest_reading(Sensor.objects.filter(house__user=request.user))
+        houses = build_live_summary(sensors)
+        return live_response(request, {
+            'total_power': sum(h['total_power'] for h in houses),
+            'cost_per_hour': sum(h['cost_per_hour'] for h in houses),
+            'houses': houses,
+        })
 
 
 class UserSensorViewSet(viewsets.ModelViewSet): # Zmieniono na ModelViewSet
@@ -247,6 +685,8 @@ class UserSensorViewSet(viewsets.ModelViewSet): # Zmieniono na ModelViewSet
             'name', 'description', 'location', 'icon', 'color', 
             'power_threshold', 'current_max_threshold', 
             'voltage_min_threshold', 'voltage_max_threshold', 
+            'power_clear_threshold', 'current_clear_threshold',
+            'alert_duration_seconds', 'alert_cooldown_seconds',
             'offline_threshold_seconds'
         ]
         
@@ -262,6 +702,44 @@ class UserSensorViewSet(viewsets.ModelViewSet): # Zmieniono na ModelViewSet
         self.perform_update(serializer)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'], url_path='power-quality')
+    def power_quality(self, request, pk=None):
+        """
+        Jakość zasilania w dniach ?from=RRRR-MM-DD&to=RRRR-MM-DD (domyślnie ostatnie
+        7 dni): kwantyle napięcia i częstotliwości, czas poza pasmami EN 50160,
+        histogram współczynnika mocy; ?daily=1 dodaje podsumowania dni.
+        """
+        sensor = self.get_object()
+        date_from, date_to, error = _query_date_range(request, default_days=7)
+        if error:
+            return error
+
+        daily = request.query_params.get('daily') in ('1', 'true')
+        return Response({'sensor_id': sensor.id, **power_quality_summary(sensor, date_from, date_to, daily=daily)})
+
+    @action(detail=True, methods=['get'], url_path='profile')
+    def profile(self, request, pk=None):
+        """Profil zużycia czujnika 7x24 - jak UserHouseViewSet.profile."""
+        sensor = self.get_object()
+        date_from, date_to, error = _query_date_range(request, default_days=28, max_days=settings.LOAD_PROFILE_MAX_DAYS)
+        if error:
+            return error
+        return Response({'sensor_id': sensor.id, **load_profile(sensor.house, date_from, date_to, sensor=sensor)})
+
+    @action(detail=True, methods=['post'], url_path='backtest')
+    def backtest(self, request, pk=None):
+        """
+        Ile alertów mocy, prądu i napięcia dałyby proponowane progi (jak przy
+        edycji czujnika, plus alert_duration/cooldown i 'days', domyślnie 30)
+        w historii czujnika - bez zapisywania zmian.
+        """
+        sensor = self.get_object()
+        serializer = AlertBacktestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = dict(serializer.validated_data)
+        days = params.pop('days')
+        return Response({'sensor_id': sensor.id, **backtest_alert_rules(sensor, params, days=days)})
+
 
 class AlertViewSet(viewsets.ModelViewSet):
     serializer_class = AlertSerializer
@@ -336,22 +814,46 @@ class UserSettingsViewSet(viewsets.ModelViewSet):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([DashboardReadThrottle])
+@renderer_classes([JSONRenderer, BrowsableAPIRenderer, ColumnarJSONRenderer])
 def sensor_data_view(request, sensor_id):
     sensor = get_object_or_404(Sensor, id=sensor_id)
     if sensor.house.user != request.user:
         return Response({'error': 'Brak dostępu'}, status=status.HTTP_403_FORBIDDEN)
-    
+
     # TODO: Dodać filtrowanie po zakresie dat z query params
     start_date = timezone.now() - timedelta(days=1)
     qs = SensorData.objects.filter(
-        sensor=sensor, 
+        sensor=sensor,
         timestamp__gte=start_date
     ).order_by('timestamp')
-    
+
+    # Format kolumnowy dla wykresów: ?format=columnar&fields=power,voltage
+    if request.accepted_renderer.format == 'columnar':
+        fields, unknown = parse_columnar_fields(request.query_params.get('fields'))
+        if unknown:
+            return Response(
+                {'error': f"Nieznane pola: {', '.join(unknown)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(sensor_data_columns(qs, fields))
+
     return Response(SensorDataSerializer(qs, many=True).data)
 
+def live_response(request, payload):
+    """
+    Zwraca payload z nagłówkiem ETag; gdy klient ma aktualną wersję
+    (If-None-Match), odpowiada 304 bez treści.
+    """
+    etag = payload_etag(payload)
+    if etag_matches(request.META.get('HTTP_IF_NONE_MATCH'), etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    return Response(payload, headers={'ETag': etag})
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([DashboardReadThrottle])
 def live_data_view(request, sensor_id):
     sensor = get_object_or_404(Sensor, id=sensor_id)
     if sensor.house.user != request.user:
@@ -488,33 +990,22 @@ def alerts_view(request):
 @login_required
 def comparison_view(request, house_id):
     house = get_object_or_404(House, id=house_id, user=request.user)
-    day_comparison = get_comparison_data(house, 'day')
-    week_comparison = get_comparison_data(house, 'week')
-    month_comparison = get_comparison_data(house, 'month')
-    prediction = predict_monthly_cost(house)
+    stats = get_house_statistics(house)
     now = timezone.now()
-    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    sensor_rankings = []
-    for sensor in house.sensors.all():
-        total_kwh = calculate_energy_for_period(house, start_of_month, now, sensor_id=sensor.id)
-        sensor_rankings.append({'sensor': sensor, 'kwh': round(total_kwh, 2), 'cost': round(total_kwh * house.price_per_kwh, 2)})
-    sensor_rankings.sort(key=lambda x: x['kwh'], reverse=True)
+    # Ranking z cache zawiera ID czujników - szablon potrzebuje obiektów
+    sensors_by_id = {sensor.id: sensor for sensor in house.sensors.all()}
+    sensor_rankings = [
+        {'sensor': sensors_by_id[item['sensor_id']], 'kwh': item['kwh'], 'cost': item['cost']}
+        for item in stats['sensor_rankings'] if item['sensor_id'] in sensors_by_id
+    ]
     monthly_history = []
-    current_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    for i in range(12):
-        if i == 0:
-            month_start = current_month_start
-            month_end = now
-        else:
-            month_end = current_month_start
-            month_start = (month_end - timedelta(days=1)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            current_month_start = month_start
+    for month_start, month_end in monthly_periods(now):
         month_kwh = calculate_energy_for_period(house, month_start, month_end)
         monthly_history.append({'month': month_start.strftime('%b %Y'), 'kwh': round(month_kwh, 2), 'cost': round(month_kwh * house.price_per_kwh, 2)})
     monthly_history.reverse()
     context = {
-        'house': house, 'day_comparison': day_comparison, 'week_comparison': week_comparison,
-        'month_comparison': month_comparison, 'prediction': prediction,
+        'house': house, 'day_comparison': stats['day_comparison'], 'week_comparison': stats['week_comparison'],
+        'month_comparison': stats['month_comparison'], 'prediction': stats['prediction'],
         'sensor_rankings': sensor_rankings, 'monthly_history': monthly_history,
     }
     return render(request, 'comparison.html', context)
@@ -529,22 +1020,24 @@ def admin_dashboard(request):
     unread_alerts = Alert.objects.filter(is_read=False).count()
     critical_alerts = Alert.objects.filter(severity='critical', is_resolved=False).count()
     recent_activity = ActivityLog.objects.all().order_by('-created_at')[:20]
-    now = timezone.now()
-    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    user_consumptions = []
-    for user in User.objects.filter(is_active=True):
-        houses = House.objects.filter(user=user)
-        total_kwh = 0
-        for house in houses:
-            total_kwh += calculate_energy_for_period(house, start_of_month, now)
-        if total_kwh > 0:
-            user_consumptions.append({'user': user, 'kwh': round(total_kwh, 2), 'houses': houses.count()})
-    user_consumptions.sort(key=lambda x: x['kwh'], reverse=True)
+    # Zużycie użytkowników z raportu floty (compute_fleet_report) zamiast liczenia wszystkich domów tutaj
+    fleet_report = latest_fleet_report()
+    top_users = []
+    if fleet_report:
+        usage = list(
+            fleet_report.houses.filter(user__is_active=True).values('user_id')
+            .annotate(kwh=Sum('kwh'), houses=Count('id')).filter(kwh__gt=0).order_by('-kwh')[:10]
+        )
+        users = User.objects.in_bulk([item['user_id'] for item in usage])
+        top_users = [
+            {'user': users[item['user_id']], 'kwh': round(item['kwh'], 2), 'houses': item['houses']}
+            for item in usage
+        ]
     context = {
         'total_users': total_users, 'total_houses': total_houses, 'total_sensors': total_sensors,
         'online_sensors': online_sensors, 'offline_sensors': total_sensors - online_sensors,
         'unread_alerts': unread_alerts, 'critical_alerts': critical_alerts,
-        'recent_activity': recent_activity, 'top_users': user_consumptions[:10],
+        'recent_activity': recent_activity, 'top_users': top_users, 'fleet_report': fleet_report,
     }
     return render(request, 'admin_dashboard.html', context)
 
@@ -1,27 +1,30 @@
+import hashlib
+import hmac
+import json
 import requests
 import random
 import time
 from datetime import datetime, timezone
 
 # 1) Konfiguracja
-USERNAME    = "admin"                 # Twój superużytkownik
-PASSWORD    = "admin"    # Hasło admina
-TOKEN_URL   = "http://localhost:8000/api-token-auth/"
+DEVICE_KEY   = "wklej-klucz-z-panelu-admina"  # Klucz urządzenia (admin -> Klucze urządzeń)
+SIGN_BATCHES = False                          # Podpisywanie paczek HMAC
 READINGS_URL = "http://localhost:8000/api/admin/sensor/readings/"
-SENSOR_ID   = "2"               # Musi istnieć w bazie
+SENSOR_ID   = "2"               # Musi istnieć w bazie i być przypisany do klucza
 
-# 2) Pobierz token
-resp = requests.post(TOKEN_URL, json={
-    "username": USERNAME,
-    "password": PASSWORD
-})
-resp.raise_for_status()
-token = resp.json().get("token")
-print("Uzyskany token:", token)
-
-HEADERS = {
-    "Authorization": f"Token {token}"
-}
+# 2) Nagłówki uwierzytelniania
+def auth_headers(body):
+    headers = {
+        "Authorization": f"Device {DEVICE_KEY}",
+        "Content-Type": "application/json",
+    }
+    if SIGN_BATCHES:
+        # Jak sign_data(): HMAC-SHA256 z "<sha256 treści>-<timestamp>", kluczem urządzenia
+        timestamp = str(int(time.time()))
+        message = f"{hashlib.sha256(body).hexdigest()}-{timestamp}".encode("utf-8")
+        headers["X-Signature-Timestamp"] = timestamp
+        headers["X-Signature"] = hmac.new(DEVICE_KEY.encode("utf-8"), message, hashlib.sha256).hexdigest()
+    return headers
 
 # 3) Generator fałszywych odczytów
 def generate_fake_reading(sensor_id):
@@ -41,7 +44,8 @@ def send_readings():
     while True:
         reading = generate_fake_reading(SENSOR_ID)
         print("Wysyłanie:", reading)
-        r = requests.post(READINGS_URL, json=[reading], headers=HEADERS)
+        body = json.dumps([reading]).encode("utf-8")
+        r = requests.post(READINGS_URL, data=body, headers=auth_headers(body))
         if r.status_code == 201:
             print("✅ OK")
         else: